@@ -0,0 +1,124 @@
+"""Headless core of the image annotator: dataset indexing, annotation storage,
+statistics, QA, import/export and pre-annotation, usable without Tk.
+
+Submodules are imported on first attribute access, so ``import annotator_core``
+costs almost nothing and NumPy is only loaded by the features that need it.
+"""
+
+import importlib
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    "PROXY_MAX_DIM": "images",
+    "proxy_size": "images",
+    "read_proxy_size": "images",
+    "read_proxy_sizes": "images",
+    "load_frame": "images",
+    "open_frame": "images",
+    "count_frames": "images",
+    "decode_proxy": "images",
+    "IMAGE_EXTENSIONS": "dataset",
+    "MULTI_FRAME_EXTENSIONS": "dataset",
+    "frame_key": "dataset",
+    "export_file_name": "dataset",
+    "assign_split": "dataset",
+    "split_dataset": "dataset",
+    "DatasetIndex": "dataset",
+    "NavigationIndex": "dataset",
+    "AtomicCounter": "cache",
+    "image_nbytes": "cache",
+    "ImageCache": "cache",
+    "PrefetchScheduler": "prefetch",
+    "CSV_FIELDS": "store",
+    "atomic_write": "store",
+    "write_annotations_csv": "store",
+    "write_project_json": "store",
+    "read_project_json": "store",
+    "read_project_settings": "store",
+    "iter_project_annotations": "store",
+    "read_annotations_csv": "store",
+    "AnnotationWriter": "store",
+    "apply_splices": "history",
+    "EditHistory": "history",
+    "edit_nbytes": "history",
+    "replay_journal": "history",
+    "WorkQueue": "workqueue",
+    "MERGE_POLICIES": "merge",
+    "box_iou": "merge",
+    "resolve_boxes": "merge",
+    "reconcile_labels": "merge",
+    "merge_projects": "merge",
+    "normalized_box": "boxes",
+    "BoxGrid": "boxes",
+    "DatasetStats": "stats",
+    "write_stats_json": "stats",
+    "write_stats_csv": "stats",
+    "bin_label": "stats",
+    "QA_CHECKS": "qa",
+    "ValidationReport": "qa",
+    "validate_annotations": "qa",
+    "apply_fixes": "qa",
+    "wh_iou": "anchors",
+    "best_anchor_iou": "anchors",
+    "kmeans_anchors": "anchors",
+    "anchor_fitness": "anchors",
+    "format_anchors_yaml": "anchors",
+    "materialize_file": "yolo",
+    "materialize_files": "yolo",
+    "remove_stale_files": "yolo",
+    "find_yolo_labels": "yolo",
+    "read_class_names": "yolo",
+    "parse_yolo_label_file": "yolo",
+    "import_yolo_labels": "yolo",
+    "RESIZE_MODES": "letterbox",
+    "IMAGE_FORMATS": "letterbox",
+    "letterbox_geometry": "letterbox",
+    "letterbox_annotations": "letterbox",
+    "letterbox_file": "letterbox",
+    "letterbox_files": "letterbox",
+    "dataset_hash": "labelcache",
+    "write_label_cache": "labelcache",
+    "LabelCache": "labelcache",
+    "label_rows": "yolo",
+    "write_label_file": "yolo",
+    "export_yolo": "yolo",
+    "update_yolo_labels": "yolo",
+    "TaxonomyEdit": "taxonomy",
+    "edit_taxonomy": "taxonomy",
+    "write_shard": "shards",
+    "pack_shards": "shards",
+    "read_shard_index": "shards",
+    "read_member": "shards",
+    "dhash_file": "duplicates",
+    "hamming_distance": "duplicates",
+    "BKTree": "duplicates",
+    "DuplicateIndex": "duplicates",
+    "ThumbnailCache": "thumbnails",
+    "DETECTORS": "detection",
+    "register_detector": "detection",
+    "resolve_detector": "detection",
+    "test_detector": "detection",
+    "PreAnnotationEngine": "detection",
+    "ncc_map": "propagate",
+    "propagate_boxes": "propagate",
+    "render_box_overlay": "render",
+}
+
+__all__ = sorted(_EXPORTS)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # Never runs; lets type checkers and PyInstaller's import scan see the submodules
+    from . import (anchors, boxes, cache, dataset, detection, duplicates, history, images,  # noqa: F401
+                   labelcache, letterbox, merge, prefetch, propagate, qa, render, shards, stats, store, taxonomy,
+                   thumbnails, workqueue, yolo)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module_name}"), name)
+    globals()[name] = value  # Later lookups skip __getattr__
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,171 @@
+"""Command-line access to the core without starting the GUI.
+
+    python -m annotator_core stats PROJECT [--json PATH] [--csv PATH]
+    python -m annotator_core validate PROJECT
+    python -m annotator_core export-yolo PROJECT [--output DIR] [--imgsz N [--resize-mode M] [--format F]]
+                                         [--shards [--shard-samples N] [--shard-mb MB]]
+    python -m annotator_core queue PROJECT [--merge]
+    python -m annotator_core merge OUTPUT SOURCE... [--policy union|majority|prefer] [--iou T]
+
+PROJECT is the project.json written by the annotator. A merge SOURCE is a
+project folder, an annotations CSV or a project.json, listed in priority order.
+"""
+
+import argparse
+import os
+import sys
+
+from . import dataset, store
+
+def _load(project_path):
+    project = store.read_project_json(project_path)
+    image_files = dataset.DatasetIndex.scan(project.get("input_path", ""))
+    return project, image_files
+
+def cmd_stats(args):
+    from .stats import DatasetStats, write_stats_csv, write_stats_json
+
+    project, image_files = _load(args.project)
+    stats = DatasetStats()
+    stats.rebuild(project.get("annotations", {}), image_files)
+    report = stats.report(project.get("labels", []))
+    if args.json:
+        write_stats_json(args.json, report)
+    if args.csv:
+        write_stats_csv(args.csv, report)
+    print(f"{report['images']} images, {report['annotated_images']} annotated ({report['coverage']:.1%}), "
+          f"{report['boxes']} boxes")
+    for label, count in report["classes"].items():
+        print(f"  {label}: {count}")
+    return 0
+
+def cmd_validate(args):
+    from .images import read_proxy_sizes
+    from .qa import QA_CHECKS, validate_annotations
+
+    project, image_files = _load(args.project)
+    annotations = project.get("annotations", {})
+    indices = {name: image_files.index_of(name) for name, anns in annotations.items() if anns}
+    sizes = read_proxy_sizes(image_files, [idx for idx in indices.values() if idx is not None])
+    unreadable = {name for name, idx in indices.items() if idx is not None and sizes[idx] is None}
+    report = validate_annotations(annotations, project.get("labels", []),
+                                  {name: None if idx is None else sizes[idx] for name, idx in indices.items()},
+                                  unreadable=unreadable)
+    for check, description in QA_CHECKS.items():
+        if report.issues[check]:
+            print(f"{description}: {len(report.issues[check])}")
+    if report.unknown_labels:
+        print(f"Unknown labels: {', '.join(sorted(report.unknown_labels))}")
+    print(f"Checked {report.boxes} boxes")
+    return 1 if report else 0
+
+def cmd_export_yolo(args):
+    from .images import read_proxy_size
+    from .yolo import export_yolo
+
+    project, image_files = _load(args.project)
+    o_path = args.output or project.get("output_path", "")
+    summary = export_yolo(o_path, image_files, project.get("annotations", {}), project.get("labels", []),
+                          lambda idx: read_proxy_size(*image_files.source(idx)),
+                          val_split=project.get("val_split", 0.2),
+                          anchor_count=project.get("anchor_count", 9),
+                          anchor_imgsz=project.get("anchor_imgsz", 640),
+                          train_imgsz=project.get("train_imgsz", 0) if args.imgsz is None else args.imgsz,
+                          resize_mode=args.resize_mode or project.get("resize_mode", "letterbox"),
+                          image_format=args.format or project.get("export_image_format", "jpg"))
+    print(f"Exported {summary['train']} train and {summary['val']} val images to {o_path}")
+    if summary["methods"]["resized"] or summary["methods"]["failed"]:
+        print(f"Resized {summary['methods']['resized']} images ({summary['methods']['failed']} failed, "
+              f"{summary['methods']['existing']} up to date)")
+    if summary["skipped_labels"]:
+        print("Left out boxes with labels not in the label list: "
+              + ", ".join(f"{label} ({count})" for label, count in summary["skipped_labels"].most_common()))
+    if summary["anchors"]:
+        print(f"Anchors: {summary['anchors']['count']}, avg IoU {summary['anchors']['avg_iou']:.3f}")
+    if args.shards:
+        from .shards import pack_shards
+
+        packed = pack_shards(o_path, shard_samples=args.shard_samples, shard_bytes=args.shard_mb * 1024 * 1024)
+        print(f"Packed {packed['samples']} samples into {packed['shards']} tar shards under {o_path}/shards")
+    return 0
+
+def cmd_queue(args):
+    from .store import write_annotations_csv, write_project_json
+    from .workqueue import WorkQueue
+
+    project = store.read_project_json(args.project)
+    project_dir = os.path.dirname(os.path.abspath(args.project))
+    if not os.path.exists(os.path.join(project_dir, "queue.sqlite")):
+        print("This project has no work queue")
+        return 1
+    queue = WorkQueue(project_dir, "cli", offsets=project.get("queue_offsets", {}))
+    counts = queue.progress()
+    print(f"{counts['done']} done, {counts['leased']} leased, {counts['todo']} to do")
+    if args.merge:
+        annotations = project.get("annotations", {})
+        colors = project.get("label_colors", {})
+        changed = queue.merge(annotations, lambda label: colors.get(label, "#FF0000"))
+        project["annotations"] = annotations
+        project["queue_offsets"] = queue.offsets
+        write_annotations_csv(os.path.join(project_dir, "annotations.csv"), annotations)
+        write_project_json(args.project, project)
+        print(f"Merged {len(changed)} finished images into {args.project}")
+    queue.close()
+    return 0
+
+def cmd_merge(args):
+    from .merge import merge_projects
+
+    summary = merge_projects(args.sources, args.output, policy=args.policy, iou_threshold=args.iou)
+    print(f"Merged {summary['boxes_in']} boxes from {summary['sources']} sources into {summary['boxes_out']} "
+          f"on {summary['images']} images ({summary['overlaps']} overlapping across sources, "
+          f"{summary['backgrounds']} background images)")
+    if summary["color_conflicts"]:
+        print(f"Label colors differed for: {', '.join(summary['color_conflicts'])} (kept the first source's)")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="annotator_core", description="Headless annotation project tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stats = commands.add_parser("stats", help="Print dataset statistics")
+    stats.add_argument("project")
+    stats.add_argument("--json", help="Also write the report as JSON")
+    stats.add_argument("--csv", help="Also write the report as CSV")
+    stats.set_defaults(func=cmd_stats)
+
+    validate = commands.add_parser("validate", help="Check annotations for broken boxes")
+    validate.add_argument("project")
+    validate.set_defaults(func=cmd_validate)
+
+    export = commands.add_parser("export-yolo", help="Write the YOLO dataset tree")
+    export.add_argument("project")
+    export.add_argument("--output", help="Output folder (defaults to the project's)")
+    export.add_argument("--imgsz", type=int, help="Resize images to this training size (0 links the originals)")
+    export.add_argument("--resize-mode", choices=["letterbox", "resize"])
+    export.add_argument("--format", choices=["jpg", "png", "bmp"], help="Image format of resized images")
+    export.add_argument("--shards", action="store_true", help="Also pack the export into tar shards")
+    export.add_argument("--shard-samples", type=int, default=1000, help="Max samples per shard")
+    export.add_argument("--shard-mb", type=int, default=256, help="Approximate max shard size in MB")
+    export.set_defaults(func=cmd_export_yolo)
+
+    queue = commands.add_parser("queue", help="Show work queue progress")
+    queue.add_argument("project")
+    queue.add_argument("--merge", action="store_true", help="Merge every annotator's finished images into the project")
+    queue.set_defaults(func=cmd_queue)
+
+    merge = commands.add_parser("merge", help="Merge several annotation outputs into one project")
+    merge.add_argument("output", help="Folder to write the merged annotations.csv and project.json to")
+    merge.add_argument("sources", nargs="+")
+    merge.add_argument("--policy", choices=["union", "majority", "prefer"], default="union")
+    merge.add_argument("--iou", type=float, default=0.5, help="IoU at which boxes from different sources match")
+    merge.set_defaults(func=cmd_merge)
+
+    args = parser.parse_args(argv)
+    for path in getattr(args, "sources", [getattr(args, "project", None)]):
+        if not os.path.exists(path):
+            parser.error(f"not found: {path}")
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
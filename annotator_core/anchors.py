@@ -0,0 +1,82 @@
+"""YOLO anchor computation with IoU k-means"""
+
+import math
+
+import numpy as np
+
+def wh_iou(wh, anchors):
+    """IoU of every (w, h) against every anchor with both boxes centred, shape (n, k)"""
+    inter = np.minimum(wh[:, None, 0], anchors[None, :, 0]) * np.minimum(wh[:, None, 1], anchors[None, :, 1])
+    union = (wh[:, 0] * wh[:, 1])[:, None] + (anchors[:, 0] * anchors[:, 1])[None, :] - inter
+    return inter / union
+
+def best_anchor_iou(wh, anchors, chunk=1 << 20):
+    """Each box's IoU with its closest anchor, computed in chunks to bound memory"""
+    return np.concatenate([wh_iou(wh[i:i + chunk], anchors).max(1) for i in range(0, len(wh), chunk)] or [np.zeros(0)])
+
+def kmeans_anchors(wh, k=9, batch_size=4096, iterations=300, n_init=4, tol=1e-4, seed=0):
+    """Cluster box sizes into k anchors with mini-batch k-means under a 1 - IoU distance.
+
+    Each of n_init runs is seeded with k-means++ on a sample. Each batch then moves
+    its centres towards the batch means, with per-centre learning rates of
+    1 / (boxes assigned so far). The run with the best mean IoU on the sample wins.
+    Returns the anchors as a (k, 2) array sorted by area, or None without boxes.
+    """
+    wh = np.asarray(wh, np.float64).reshape(-1, 2)
+    wh = wh[(wh > 0).all(1)]
+    if not len(wh):
+        return None
+    rng = np.random.default_rng(seed)
+    sample = wh[rng.choice(len(wh), min(len(wh), 20000), replace=False)]
+    k = min(k, len(np.unique(sample, axis=0)))
+    best, best_fit = None, -1.0
+    for _ in range(n_init):
+        centers = _kmeans_pp(sample, k, rng)
+        counts = np.zeros(k)
+        for _ in range(iterations):
+            batch = wh[rng.integers(0, len(wh), min(batch_size, len(wh)))]
+            nearest = wh_iou(batch, centers).argmax(1)
+            n = np.bincount(nearest, minlength=k)
+            sums = np.stack([np.bincount(nearest, weights=batch[:, d], minlength=k) for d in (0, 1)], axis=1)
+            counts += n
+            hit = n > 0
+            step = (sums[hit] - n[hit, None] * centers[hit]) / counts[hit, None]
+            centers[hit] += step
+            if np.abs(step).max() < tol * centers.max():
+                break
+        fit = wh_iou(sample, centers).max(1).mean()
+        if fit > best_fit:
+            best, best_fit = centers, fit
+    return best[np.argsort(best.prod(1))]
+
+def _kmeans_pp(sample, k, rng):
+    """Greedy k-means++: of a few candidates drawn per step, keep the one that helps most"""
+    centers = sample[[rng.integers(len(sample))]]
+    best = wh_iou(sample, centers).max(1)
+    trials = 2 + int(math.log(k))
+    for _ in range(1, k):
+        weights = (1 - best) ** 2
+        candidates = sample[rng.choice(len(sample), trials, p=weights / weights.sum())]
+        merged = np.maximum(best[:, None], wh_iou(sample, candidates))
+        pick = merged.mean(0).argmax()
+        centers = np.vstack([centers, candidates[pick]])
+        best = merged[:, pick]
+    return centers
+
+def anchor_fitness(wh, anchors, threshold=0.5):
+    """Mean best-anchor IoU over all boxes and the fraction matched above threshold"""
+    best = best_anchor_iou(np.asarray(wh, np.float32).reshape(-1, 2), np.asarray(anchors, np.float32))
+    if not len(best):
+        return 0.0, 0.0
+    return float(best.mean()), float((best > threshold).mean())
+
+def format_anchors_yaml(anchors, avg_iou, recall, imgsz):
+    """config.yaml lines for the anchors, split over three detection levels when k allows"""
+    values = [[int(round(v)) for v in anchor] for anchor in anchors]
+    levels = 3 if len(values) % 3 == 0 else 1
+    per_level = len(values) // levels
+    lines = [f"# Anchors at {imgsz}px: avg IoU {avg_iou:.3f}, {recall:.1%} of boxes above 0.5 IoU\n", "anchors:\n"]
+    for i in range(levels):
+        row = values[i * per_level:(i + 1) * per_level]
+        lines.append("  - [" + ", ".join(f"{w},{h}" for w, h in row) + "]\n")
+    return lines
@@ -0,0 +1,78 @@
+"""Box geometry and the spatial index used for hit testing"""
+
+def normalized_box(ann):
+    """(x1, y1, x2, y2) of an annotation with x1 <= x2 and y1 <= y2"""
+    (x1, y1), (x2, y2) = ann["points"]
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+class BoxGrid:
+    """Uniform-grid spatial index over the boxes of one image.
+
+    Boxes are bucketed into square cells keyed by annotation identity, so inserts
+    and removals are incremental. Boxes covering more than max_cells cells are kept
+    in a short list that every query scans instead.
+    """
+
+    def __init__(self, cell_size=64, max_cells=256):
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self.cells = {}  # (col, row) -> set of ids
+        self.large = set()
+        self.boxes = {}  # id(ann) -> (ann, x1, y1, x2, y2)
+
+    @classmethod
+    def build(cls, anns):
+        """Index anns with a cell size of about twice the median box side"""
+        sides = sorted(max(b[2] - b[0], b[3] - b[1]) for b in map(normalized_box, anns))
+        cell_size = min(512, max(16, 2 * sides[len(sides) // 2])) if sides else 64
+        grid = cls(cell_size)
+        for ann in anns:
+            grid.insert(ann)
+        return grid
+
+    def insert(self, ann):
+        x1, y1, x2, y2 = normalized_box(ann)
+        key = id(ann)
+        self.boxes[key] = (ann, x1, y1, x2, y2)
+        cols, rows = self._span(x1, x2), self._span(y1, y2)
+        if len(cols) * len(rows) > self.max_cells:
+            self.large.add(key)
+            return
+        for col in cols:
+            for row in rows:
+                self.cells.setdefault((col, row), set()).add(key)
+
+    def remove(self, ann):
+        key = id(ann)
+        entry = self.boxes.pop(key, None)
+        if entry is None:
+            return
+        if key in self.large:
+            self.large.discard(key)
+            return
+        _, x1, y1, x2, y2 = entry
+        for col in self._span(x1, x2):
+            for row in self._span(y1, y2):
+                cell = self.cells.get((col, row))
+                if cell is not None:
+                    cell.discard(key)
+                    if not cell:
+                        del self.cells[(col, row)]
+
+    def hit(self, x, y, tolerance=0.0):
+        """Annotations whose box contains (x, y), grown by tolerance, smallest first"""
+        keys = set(self.large)
+        for col in self._span(x - tolerance, x + tolerance):
+            for row in self._span(y - tolerance, y + tolerance):
+                keys.update(self.cells.get((col, row), ()))
+        hits = []
+        for key in keys:
+            ann, x1, y1, x2, y2 = self.boxes[key]
+            if x1 - tolerance <= x <= x2 + tolerance and y1 - tolerance <= y <= y2 + tolerance:
+                hits.append(((x2 - x1) * (y2 - y1), ann))
+        hits.sort(key=lambda hit: hit[0])
+        return [ann for _, ann in hits]
+
+    def _span(self, lo, hi):
+        size = self.cell_size
+        return range(int(lo // size), int(hi // size) + 1)
@@ -0,0 +1,174 @@
+"""Thread-safe decoded image cache shared by the viewer and its loader threads"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+class AtomicCounter:
+    """Integer counter that any thread can update"""
+
+    def __init__(self, value=0):
+        self._value = value
+        self._lock = threading.Lock()
+
+    def add(self, n=1):
+        with self._lock:
+            self._value += n
+            return self._value
+
+    @property
+    def value(self):
+        return self._value
+
+class _Flight:
+    """A load in progress that other threads asking for the same index wait on"""
+
+    __slots__ = ("done", "image", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.image = None
+        self.error = None
+
+def image_nbytes(img):
+    """Approximate in-memory size of a decoded PIL image"""
+    return img.width * img.height * len(img.getbands())
+
+class ImageCache:
+    """index -> decoded image map that many loader threads can fill at once.
+
+    Entries are spread over lock stripes by index, so threads working on different
+    images rarely contend and the Tk thread never waits on a decode. Loads are
+    single-flight: if several threads ask for the same missing index, one runs
+    loader(index) and the rest wait for its result. loader can hand the decode to a
+    process pool and block on the future; the cache only sees the returned image.
+    Byte usage and load counts are kept in atomic counters, so reading them is O(1).
+    """
+
+    def __init__(self, loader, stripes=16, workers=None):
+        self.loader = loader
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._entries = [{} for _ in range(stripes)]
+        self._flights = [{} for _ in range(stripes)]
+        self._workers = workers or min(8, (os.cpu_count() or 1) + 2)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.loaded = AtomicCounter()  # Successful decodes
+        self.hits = AtomicCounter()
+        self.misses = AtomicCounter()
+        self._nbytes = AtomicCounter()
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries)
+
+    def __contains__(self, index):
+        stripe = index % len(self._locks)
+        with self._locks[stripe]:
+            return index in self._entries[stripe]
+
+    def __getitem__(self, index):
+        img = self.get(index)
+        if img is None:
+            raise KeyError(index)
+        return img
+
+    @property
+    def nbytes(self):
+        return self._nbytes.value
+
+    def get(self, index, default=None):
+        """Cached image for index, without loading it"""
+        stripe = index % len(self._locks)
+        with self._locks[stripe]:
+            return self._entries[stripe].get(index, default)
+
+    def keys(self):
+        """Snapshot of the cached indices"""
+        keys = []
+        for lock, entries in zip(self._locks, self._entries):
+            with lock:
+                keys.extend(entries)
+        return keys
+
+    def load(self, index):
+        """Cached image for index, decoding it (at most once across threads) if missing.
+
+        Exceptions from loader propagate to every thread waiting on that index.
+        """
+        stripe = index % len(self._locks)
+        lock = self._locks[stripe]
+        with lock:
+            img = self._entries[stripe].get(index)
+            if img is not None:
+                self.hits.add()
+                return img
+            flight = self._flights[stripe].get(index)
+            leader = flight is None
+            if leader:
+                flight = self._flights[stripe][index] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.image
+
+        self.misses.add()
+        try:
+            img = flight.image = self.loader(index)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with lock:
+                if flight.error is None:
+                    self._entries[stripe][index] = flight.image
+                del self._flights[stripe][index]
+            flight.done.set()
+        self._nbytes.add(image_nbytes(img))
+        self.loaded.add()
+        return img
+
+    def load_many(self, indices):
+        """Load indices on the cache's I/O threads. Returns {index: image, or None on error}"""
+        def load(index):
+            try:
+                return self.load(index)
+            except Exception as e:
+                print(f"Error loading image {index}: {e}")
+                return None
+        indices = list(indices)
+        return dict(zip(indices, self._executor().map(load, indices)))
+
+    def discard(self, index):
+        stripe = index % len(self._locks)
+        with self._locks[stripe]:
+            img = self._entries[stripe].pop(index, None)
+        if img is not None:
+            self._nbytes.add(-image_nbytes(img))
+
+    def evict_outside(self, start, end):
+        """Drop every cached image whose index is outside [start, end]. Returns the count"""
+        freed = removed = 0
+        for lock, entries in zip(self._locks, self._entries):
+            with lock:
+                distant = [idx for idx in entries if idx < start or idx > end]
+                for idx in distant:
+                    freed += image_nbytes(entries.pop(idx))
+            removed += len(distant)
+        self._nbytes.add(-freed)
+        return removed
+
+    def clear(self):
+        self.evict_outside(0, -1)
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="image-loader")
+            return self._pool
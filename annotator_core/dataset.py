@@ -0,0 +1,253 @@
+"""Dataset tables: the compact image path index, navigation lookups and train/val splits"""
+
+from collections import Counter
+from bisect import bisect_left, bisect_right, insort
+from array import array
+import hashlib
+import os
+import sys
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff")
+MULTI_FRAME_EXTENSIONS = (".gif", ".tif", ".tiff")
+
+def frame_key(name, frame):
+    """Annotation key of a frame; the first frame keeps the plain file name"""
+    return name if frame == 0 else f"{name}#{frame}"
+
+def export_file_name(name, frame):
+    """File name an image is exported under; later frames are written out as PNGs"""
+    return name if frame == 0 else f"{name}.frame{frame:05d}.png"
+
+def assign_split(key, val_ratio):
+    """Deterministically assign a key to 'train' or 'val' from a hash of its name"""
+    return "val" if _split_bucket(key) < val_ratio else "train"
+
+def _split_bucket(key):
+    digest = hashlib.md5(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+def split_dataset(keys, val_ratio):
+    """Map each key to a split, making sure val is never empty when it could be used"""
+    splits = {key: assign_split(key, val_ratio) for key in keys}
+    if val_ratio > 0 and len(splits) > 1 and "val" not in splits.values():
+        splits[min(splits, key=_split_bucket)] = "val"
+    return splits
+
+class DatasetIndex:
+    """Compact, ordered table of image paths.
+
+    Each path is stored as a directory ID plus an interned basename, with a dict for
+    O(1) name-to-index lookup. Full paths are only built on access, so the index can
+    stand in for a list of path strings.
+
+    Every frame of a multi-frame GIF or TIFF gets its own entry. Entries of one file
+    share its path and differ in frame number, and their names come from frame_key.
+    """
+
+    def __init__(self, paths=()):
+        self.dirs = []
+        self._dir_ids = {}
+        self.dir_of = array("I")
+        self.frames = array("I")
+        self.names = []
+        self.name_to_index = {}
+        for path in paths:
+            self.append(path)
+
+    @classmethod
+    def scan(cls, directory, extensions=IMAGE_EXTENSIONS, progress=None):
+        """Index the image files directly inside directory, sorted by name"""
+        from .images import count_frames  # Pulls in PIL, which the index itself does not need
+
+        names = []
+        with os.scandir(directory) as entries:
+            for i, entry in enumerate(entries):
+                if entry.name.lower().endswith(extensions) and entry.is_file():
+                    names.append(entry.name)
+                if progress and i % 1000 == 0:
+                    progress(i)
+        names.sort()
+        index = cls()
+        dir_id = index._add_dir(directory)
+        keys, frames = [], array("I")
+        for name in names:
+            # Only multi-frame formats need their header read to count frames
+            n_frames = 1
+            if name.lower().endswith(MULTI_FRAME_EXTENSIONS):
+                n_frames = count_frames(os.path.join(directory, name))
+            for frame in range(n_frames):
+                keys.append(sys.intern(frame_key(name, frame)))
+                frames.append(frame)
+        index.names = keys
+        index.frames = frames
+        index.dir_of = array("I", [dir_id]) * len(keys)
+        index.name_to_index = {name: i for i, name in enumerate(keys)}
+        return index
+
+    def append(self, path, frame=0):
+        directory, name = os.path.split(path)
+        name = sys.intern(frame_key(name, frame))
+        self.name_to_index.setdefault(name, len(self.names))
+        self.names.append(name)
+        self.frames.append(frame)
+        self.dir_of.append(self._add_dir(directory))
+
+    def name(self, index):
+        """Annotation key of the image at index (its basename, plus '#frame' for later frames)"""
+        return self.names[index]
+
+    def frame(self, index):
+        return self.frames[index]
+
+    def source(self, index):
+        """(path, frame) to decode the image at index from"""
+        return self[index], self.frames[index]
+
+    def export_name(self, index):
+        """File name the image at index is exported under"""
+        return export_file_name(os.path.basename(self[index]), self.frames[index])
+
+    def index_of(self, name, default=None):
+        """Position of the image with the given basename"""
+        return self.name_to_index.get(name, default)
+
+    def _add_dir(self, directory):
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = self._dir_ids[directory] = len(self.dirs)
+            self.dirs.append(directory)
+        return dir_id
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        name = self.names[index]
+        if self.frames[index]:
+            name = name.rpartition("#")[0]
+        return os.path.join(self.dirs[self.dir_of[index]], name)
+
+    def __iter__(self):
+        for i in range(len(self.names)):
+            yield self[i]
+
+def _next_in(sorted_indices, start, step):
+    """Next element of a sorted index list after start in the direction of step, wrapping around"""
+    if not sorted_indices:
+        return None
+    if step > 0:
+        return sorted_indices[bisect_right(sorted_indices, start) % len(sorted_indices)]
+    return sorted_indices[bisect_left(sorted_indices, start) - 1]
+
+class NavigationIndex:
+    """Lookup tables for jumping through a DatasetIndex, updated incrementally.
+
+    Tracks per-image box counts, the sorted indices of images without boxes,
+    the sorted indices of the images with each nonzero box count and, for every
+    label, the sorted indices of images containing it.
+    """
+
+    def __init__(self, image_files):
+        self.image_files = image_files
+        self.box_counts = array("I", [0]) * len(image_files)
+        self.unannotated = list(range(len(image_files)))
+        self.count_images = {}  # box count -> sorted indices of the images with that many boxes
+        self.label_images = {}
+        self._image_labels = {}  # index -> Counter of labels on that image
+        names = image_files.names
+        if all(names[i] <= names[i + 1] for i in range(len(names) - 1)):
+            self._name_order = None  # Already sorted, search names directly
+        else:
+            self._name_order = sorted(range(len(names)), key=names.__getitem__)
+
+    def rebuild(self, annotations_per_image):
+        """Recompute every table from scratch in one pass"""
+        self.box_counts = array("I", [0]) * len(self.image_files)
+        self._image_labels = {}
+        label_images = {}
+        count_images = {}
+        for img_name, anns in annotations_per_image.items():
+            idx = self.image_files.index_of(img_name)
+            if idx is None or not anns:
+                continue
+            labels = Counter(ann["label"] for ann in anns)
+            self.box_counts[idx] = len(anns)
+            self._image_labels[idx] = labels
+            count_images.setdefault(len(anns), []).append(idx)
+            for label in labels:
+                label_images.setdefault(label, []).append(idx)
+        for indices in label_images.values():
+            indices.sort()
+        for indices in count_images.values():
+            indices.sort()
+        self.label_images = label_images
+        self.count_images = count_images
+        self.unannotated = [idx for idx, count in enumerate(self.box_counts) if not count]
+
+    def update(self, idx, anns):
+        """Refresh the tables for one image after its annotations changed"""
+        old = self._image_labels.pop(idx, Counter())
+        new = Counter(ann["label"] for ann in anns)
+        if new:
+            self._image_labels[idx] = new
+        for label in old.keys() - new.keys():
+            indices = self.label_images[label]
+            del indices[bisect_left(indices, idx)]
+        for label in new.keys() - old.keys():
+            insort(self.label_images.setdefault(label, []), idx)
+        old_count = self.box_counts[idx]
+        if old_count == len(anns):
+            return
+        if old_count:
+            indices = self.count_images[old_count]
+            del indices[bisect_left(indices, idx)]
+            if not indices:
+                del self.count_images[old_count]
+        else:
+            del self.unannotated[bisect_left(self.unannotated, idx)]
+        if anns:
+            insort(self.count_images.setdefault(len(anns), []), idx)
+        else:
+            insort(self.unannotated, idx)
+        self.box_counts[idx] = len(anns)
+
+    def next_unannotated(self, start, step=1):
+        return _next_in(self.unannotated, start, step)
+
+    def next_with_label(self, label, start, step=1):
+        return _next_in(self.label_images.get(label), start, step)
+
+    def next_with_min_boxes(self, min_boxes, start, step=1):
+        """Next image with more than min_boxes boxes.
+
+        Takes the next match from each qualifying box-count bucket, so it costs
+        O(distinct box counts * log images) rather than a scan of every image.
+        """
+        total = len(self.box_counts)
+        best, best_distance = None, None
+        for count, indices in self.count_images.items():
+            if count <= min_boxes:
+                continue
+            idx = _next_in(indices, start, step)
+            distance = (idx - start) * step % total or total  # Wrapping back onto start comes last
+            if best is None or distance < best_distance:
+                best, best_distance = idx, distance
+        return best
+
+    def find_prefix(self, prefix):
+        """First image, in name order, whose filename starts with prefix"""
+        names = self.image_files.names
+        order = self._name_order
+        lo, hi = 0, len(names)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if names[mid if order is None else order[mid]] < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(names):
+            return None
+        idx = lo if order is None else order[lo]
+        return idx if names[idx].startswith(prefix) else None
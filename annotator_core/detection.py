@@ -0,0 +1,129 @@
+"""Pluggable detectors and the batched pre-annotation engine"""
+
+from concurrent.futures import ProcessPoolExecutor
+import importlib
+import threading
+
+from PIL import Image
+
+from .images import decode_proxy
+
+# Pre-annotation detectors are callables taking a list of PIL images (display proxies)
+# and returning, per image, a list of (label, x1, y1, x2, y2, score) tuples in that
+# image's pixel coordinates. label is a label name or an index into the label list.
+DETECTORS = {}
+
+def register_detector(name):
+    """Decorator that makes a detector available under a short name"""
+    def decorator(fn):
+        DETECTORS[name] = fn
+        return fn
+    return decorator
+
+def resolve_detector(spec):
+    """Look up a detector by registered name or import it from a 'module:function' spec"""
+    if spec in DETECTORS:
+        return DETECTORS[spec]
+    module_name, sep, attr = spec.partition(":")
+    if not sep:
+        raise ValueError(f"Unknown detector '{spec}'. Use a registered name or 'module:function'")
+    return getattr(importlib.import_module(module_name), attr)
+
+@register_detector("test")
+def test_detector(images):
+    """Deterministic stand-in detector for benchmarking the pipeline offline.
+
+    Proposes a box for every cell of a 4x4 grid that is brighter than the image mean.
+    """
+    results = []
+    for img in images:
+        w, h = img.size
+        pixels = list(img.convert("L").resize((4, 4), Image.BOX).getdata())
+        mean = sum(pixels) / len(pixels)
+        boxes = []
+        for i, value in enumerate(pixels):
+            if value > mean:
+                row, col = divmod(i, 4)
+                boxes.append((0, col * w / 4, row * h / 4, (col + 1) * w / 4, (row + 1) * h / 4, round(value / 255, 3)))
+        results.append(boxes)
+    return results
+
+_worker_detector = None
+
+def _init_detector_worker(spec):
+    global _worker_detector
+    _worker_detector = resolve_detector(spec)
+
+def _run_detector_batch(sources):
+    """Process pool entry point: decode a batch of (path, frame) display proxies and run the detector"""
+    return _worker_detector([decode_proxy(path, frame) for path, frame in sources])
+
+class PreAnnotationEngine:
+    """Runs a detector in a process pool over batches of images ahead of the user.
+
+    proposals maps image index to the detector output for that image. on_ready, if set,
+    is called from a pool callback thread with each finished batch of indices.
+    """
+
+    def __init__(self, detector_spec, image_files, batch_size=8, lookahead=64, min_score=0.25, workers=None):
+        resolve_detector(detector_spec)  # Fail fast on a bad spec before starting workers
+        self.image_files = image_files
+        self.batch_size = batch_size
+        self.lookahead = lookahead
+        self.min_score = min_score
+        self.on_ready = None
+        self.proposals = {}
+        self._pending = {}  # future -> batch of indices
+        self._queued = set()
+        self._lock = threading.RLock()  # Future.cancel runs callbacks in the calling thread
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_detector_worker,
+                                         initargs=(detector_spec,))
+
+    def schedule(self, current, skip=None):
+        """Queue the images from current up to current + lookahead, cancelling stale batches"""
+        stop = min(len(self.image_files), current + self.lookahead)
+        with self._lock:
+            for future, batch in list(self._pending.items()):
+                if batch[-1] < current or batch[0] >= stop:
+                    future.cancel()
+            todo = [idx for idx in range(current, stop)
+                    if idx not in self.proposals and idx not in self._queued and not (skip and skip(idx))]
+            for start in range(0, len(todo), self.batch_size):
+                batch = todo[start:start + self.batch_size]
+                future = self._pool.submit(_run_detector_batch, [self.image_files.source(idx) for idx in batch])
+                self._pending[future] = batch
+                self._queued.update(batch)
+                future.add_done_callback(self._on_done)
+
+    def get(self, index):
+        """Proposals for an image above min_score, or an empty list"""
+        with self._lock:
+            return [p for p in self.proposals.get(index, ()) if p[5] >= self.min_score]
+
+    def discard(self, index, proposal=None):
+        """Drop one proposal, or all of them, once accepted or rejected"""
+        with self._lock:
+            if proposal is None:
+                self.proposals[index] = []
+            else:
+                self.proposals[index] = [p for p in self.proposals.get(index, ()) if p != proposal]
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _on_done(self, future):
+        with self._lock:
+            batch = self._pending.pop(future, [])
+            self._queued.difference_update(batch)
+        if future.cancelled():
+            return
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"Pre-annotation error: {e}")
+            return
+        with self._lock:
+            for idx, proposals in zip(batch, results):
+                self.proposals[idx] = [tuple(p) for p in proposals]
+        if self.on_ready:
+            self.on_ready(batch)
@@ -0,0 +1,157 @@
+"""Near-duplicate image detection with perceptual hashes"""
+
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+
+from PIL import Image
+
+from .images import open_frame
+from .store import atomic_write
+
+def dhash_file(path, hash_size=8, frame=0):
+    """Difference hash of an image computed from a tiny grayscale decode"""
+    with open_frame(path, frame) as img:
+        img.draft("L", (hash_size * 4, hash_size * 4))  # Let JPEG decode at a reduced scale
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+        pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+def _dhash_job(source):
+    """Process pool entry point taking (path, frame); unreadable files hash to None"""
+    try:
+        return dhash_file(source[0], frame=source[1])
+    except Exception:
+        return None
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """BK-tree over integer hashes for Hamming-distance range queries"""
+
+    def __init__(self):
+        self.root = None  # Nodes are [hash, items, {distance: child}]
+
+    def add(self, value, item):
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def query(self, value, max_distance):
+        """Return (distance, item) pairs for every item within max_distance of value"""
+        results = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node[1])
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return results
+
+class DuplicateIndex:
+    """Near-duplicate index over image files using dHashes cached by file mtime.
+
+    groups maps each image in a duplicate cluster to the cluster's representative,
+    the first member in sorted order. Images without duplicates are not in groups.
+    """
+
+    CACHE_NAME = "phash_cache.json"
+
+    def __init__(self, cache_dir, max_distance=4):
+        self.cache_path = os.path.join(cache_dir, self.CACHE_NAME)
+        self.max_distance = max_distance
+        self.hashes = {}
+        self.groups = {}
+        self.tree = BKTree()
+
+    def build(self, image_files, progress=None):
+        """Hash new or changed images of a DatasetIndex in a process pool, then cluster near-duplicates.
+
+        Rebuilds the index from scratch, so it can be called again after the folder changed.
+        """
+        self.hashes = {}
+        self.tree = BKTree()
+        cache = self._load_cache()
+        todo = []
+        for idx in range(len(image_files)):
+            name = image_files.name(idx)
+            path = image_files.source(idx)
+            try:
+                stat = os.stat(path[0])
+            except OSError:
+                continue
+            entry = cache.get(name)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self.hashes[name] = entry[2]
+            else:
+                todo.append((name, path, stat))
+
+        if todo:
+            with ProcessPoolExecutor() as pool:
+                results = pool.map(_dhash_job, [path for _, path, _ in todo], chunksize=64)
+                for done, ((name, _, stat), value) in enumerate(zip(todo, results), 1):
+                    if value is not None:
+                        self.hashes[name] = value
+                        cache[name] = [stat.st_mtime_ns, stat.st_size, value]
+                    if progress and done % 256 == 0:
+                        progress(done, len(todo))
+            atomic_write(self.cache_path, lambda f: json.dump(cache, f))
+
+        for name, value in self.hashes.items():
+            self.tree.add(value, name)
+        self._cluster()
+
+    def duplicates_of(self, name):
+        """Names of images within max_distance of the given image, nearest first"""
+        if name not in self.hashes:
+            return []
+        matches = sorted(self.tree.query(self.hashes[name], self.max_distance))
+        return [other for _, other in matches if other != name]
+
+    def is_redundant(self, name):
+        """True for cluster members other than the representative"""
+        return self.groups.get(name, name) != name
+
+    def _cluster(self):
+        parent = {}
+        def find(name):
+            while parent.get(name, name) != name:
+                parent[name] = parent.get(parent[name], parent[name])  # Path halving
+                name = parent[name]
+            return name
+        for name in sorted(self.hashes):
+            for _, other in self.tree.query(self.hashes[name], self.max_distance):
+                root_a, root_b = find(name), find(other)
+                if root_a != root_b:
+                    # Keep the alphabetically first name as the representative
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+        self.groups = {name: find(name) for name in parent}
+        for rep in set(self.groups.values()):
+            self.groups[rep] = rep
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,227 @@
+"""Undo/redo history of annotation edits, stored as deltas with an optional on-disk journal"""
+
+from collections import deque
+import json
+import os
+
+from .store import atomic_write
+
+ANNOTATION_BYTES = 400  # Rough footprint of one annotation dict with its points list
+EDIT_BYTES = 200  # Per-edit overhead on top of the annotations it holds
+
+def apply_splices(annotations, splices):
+    """Apply (image, position, removed, inserted) splices to annotations in order.
+
+    Each splice replaces the run of len(removed) annotations at position with
+    inserted; the run must still hold exactly the removed dicts. On a mismatch the
+    splices already applied are rolled back and ValueError is raised, leaving
+    annotations unchanged.
+    """
+    done = []
+    for img_name, position, removed, inserted in splices:
+        anns = annotations.setdefault(img_name, [])
+        end = position + len(removed)
+        if end > len(anns) or any(a is not b for a, b in zip(anns[position:end], removed)):
+            apply_splices(annotations, [(name, pos, new, old) for name, pos, old, new in reversed(done)])
+            raise ValueError(f"annotations of {img_name} were changed outside the edit history")
+        anns[position:end] = inserted
+        done.append((img_name, position, removed, inserted))
+
+def _splice_nbytes(splice):
+    return ANNOTATION_BYTES * (len(splice[2]) + len(splice[3]))
+
+def edit_nbytes(splices):
+    """Estimated memory an edit made of splices takes up in an EditHistory"""
+    return EDIT_BYTES + sum(map(_splice_nbytes, splices))
+
+class _Edit:
+    __slots__ = ("kind", "splices", "state", "nbytes")
+
+    def __init__(self, kind, splices, state, nbytes=None):
+        self.kind = kind
+        self.splices = splices
+        self.state = state
+        self.nbytes = edit_nbytes(splices) if nbytes is None else nbytes
+
+class EditHistory:
+    """Undo and redo stacks of annotation edits, capped at max_bytes.
+
+    An edit is a kind ("add", "delete", "move", "relabel", "clear", ...) and the
+    splices that made it, recorded after the caller has changed the annotations.
+    Splices hold the removed and inserted annotation dicts themselves, which is
+    safe because annotations are never mutated in place; a cleared list is kept
+    as-is rather than copied. Neither sequence may be a list that is still in
+    annotations, since undo and redo splice lists in place. Undo and redo splice
+    the affected runs back, so they cost O(size of the edit). When the estimated
+    size of both stacks goes over max_bytes the oldest edits are forgotten.
+
+    An edit can also carry caller state the splices do not cover, such as the
+    label list a taxonomy edit replaced, as a (before, after) pair that undo and
+    redo hand back for the caller to restore.
+
+    With a journal open, every change (including undos and redos) is appended to
+    it as one JSON line numbered by seq, so replay_journal can rebuild edits made
+    after the last save if the process dies.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.seq = 0  # Number of the last change, undos and redos included
+        self.dropped = 0  # Edits forgotten to stay under max_bytes
+        self._undo = deque()
+        self._redo = []
+        self._journal = None
+        self.journal_path = None
+
+    def __len__(self):
+        return len(self._undo)
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def record(self, kind, splices, state=None, nbytes=None):
+        """Add an edit the caller has just applied, with an optional (before, after) state.
+
+        Clears the redo stack. nbytes is edit_nbytes(splices), for callers that
+        already computed it off the GUI thread. An edit bigger than max_bytes
+        is dropped at once, together with every edit before it.
+        """
+        splices = tuple(s for s in splices if s[2] or s[3])
+        if not splices and state is None:
+            return
+        for edit in self._redo:
+            self.nbytes -= edit.nbytes
+        self._redo.clear()
+        edit = _Edit(kind, splices, state, nbytes)
+        self._undo.append(edit)
+        self.nbytes += edit.nbytes
+        self._log(splices)
+        self.trim()
+
+    def undo(self, annotations):
+        """Revert the newest edit. Returns (kind, names of the images it touched, state before it), or None"""
+        if not self._undo:
+            return None
+        edit = self._undo[-1]
+        inverse = [(img_name, position, inserted, removed)
+                   for img_name, position, removed, inserted in reversed(edit.splices)]
+        apply_splices(annotations, inverse)
+        self._redo.append(self._undo.pop())
+        self._log(inverse)
+        return edit.kind, {splice[0] for splice in edit.splices}, edit.state and edit.state[0]
+
+    def redo(self, annotations):
+        """Re-apply the most recently undone edit. Returns (kind, image names, state after it), or None"""
+        if not self._redo:
+            return None
+        edit = self._redo[-1]
+        apply_splices(annotations, edit.splices)
+        self._undo.append(self._redo.pop())
+        self._log(edit.splices)
+        return edit.kind, {splice[0] for splice in edit.splices}, edit.state and edit.state[1]
+
+    def trim(self):
+        """Forget the oldest edits, then the furthest redos, until under max_bytes"""
+        while self.nbytes > self.max_bytes and (self._undo or self._redo):
+            edit = self._undo.popleft() if self._undo else self._redo.pop(0)
+            self.nbytes -= edit.nbytes
+            self.dropped += 1
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self.nbytes = 0
+
+    def open_journal(self, path, seq=0):
+        """Append changes to the journal at path from now on, numbering them after seq"""
+        self.close()
+        self.seq = max(self.seq, seq)
+        self.journal_path = path
+        self._journal = open(path, "a")
+
+    def compact(self, saved_seq):
+        """Drop journal lines up to saved_seq, which a saved project file already contains"""
+        if self._journal is None:
+            return
+        self._journal.close()
+        kept = [line for line in _read_journal(self.journal_path) if line[0] > saved_seq]
+        atomic_write(self.journal_path, lambda f: f.writelines(_journal_line(*line) for line in kept))
+        self._journal = open(self.journal_path, "a")
+
+    def close(self, discard=False):
+        """Close the journal; with discard, delete it so its edits are not recovered"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+            if discard and os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+
+    def _log(self, splices):
+        self.seq += 1
+        if self._journal is not None:
+            self._journal.write(_journal_line(self.seq, [
+                [img_name, position, len(removed),
+                 [{"shape": ann["shape"], "points": ann["points"], "label": ann["label"]} for ann in inserted]]
+                for img_name, position, removed, inserted in splices]))
+            self._journal.flush()
+
+def _journal_line(seq, splices):
+    return json.dumps([seq, splices], separators=(",", ":")) + "\n"
+
+def _read_journal(path):
+    """(seq, splices) per journal line, stopping at a line cut short by a crash"""
+    lines = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                lines.append(json.loads(line))
+            except ValueError:
+                break
+    return lines
+
+def replay_journal(path, annotations, after_seq, color_for):
+    """Re-apply journal changes numbered after after_seq to annotations, in place.
+
+    annotations must be the project as saved at after_seq. The journal must
+    continue from there without a gap (changes made while journaling was off
+    leave one) and every splice must fit the list it applies to; otherwise
+    ValueError is raised and annotations are left untouched.
+    Recovered boxes are coloured with color_for(label). Returns (changes
+    replayed, last seq in the journal).
+    """
+    if not os.path.exists(path):
+        return 0, after_seq
+    lines = _read_journal(path)
+    pending = [(seq, splices) for seq, splices in lines if seq > after_seq]
+    if any(seq != after_seq + i for i, (seq, _) in enumerate(pending, 1)):
+        raise ValueError(f"edit journal {path} does not continue from the saved project")
+    # Check and decode every splice before touching annotations, so a bad journal changes nothing
+    lengths = {}
+    colors = {}
+    try:
+        for _, splices in pending:
+            for img_name, position, removed, inserted in splices:
+                length = lengths.get(img_name)
+                if length is None:
+                    length = len(annotations.get(img_name, ()))
+                if position < 0 or position + removed > length:
+                    raise ValueError(f"edit journal {path} does not match the saved annotations of {img_name}")
+                lengths[img_name] = length - removed + len(inserted)
+                for ann in inserted:
+                    label = ann["label"]
+                    if label not in colors:
+                        colors[label] = color_for(label)
+                    ann["points"] = [tuple(point) for point in ann["points"]]
+                    ann["color"] = colors[label]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"edit journal {path} has a malformed entry: {e}") from e
+    for _, splices in pending:
+        for img_name, position, removed, inserted in splices:
+            annotations.setdefault(img_name, [])[position:position + removed] = inserted
+    return len(pending), max([after_seq] + [seq for seq, _ in lines])
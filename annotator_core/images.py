@@ -0,0 +1,178 @@
+"""Image decoding helpers: display proxy sizes, multi-frame GIF/TIFF access"""
+
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import os
+import threading
+
+from PIL import Image
+
+PROXY_MAX_DIM = 1920  # Max dimension of the in-memory display proxy; annotations use its coordinates
+
+def proxy_size(orig_w, orig_h, max_dim=PROXY_MAX_DIM):
+    """Size of the display proxy that _load_image produces for an image of the given size"""
+    scale = min(1.0, max_dim / max(orig_w, orig_h))
+    if scale < 1.0:
+        return int(orig_w * scale), int(orig_h * scale)
+    return orig_w, orig_h
+
+def read_proxy_size(path, frame=0):
+    """Read the proxy size of an image from its header without decoding pixels"""
+    with Image.open(path) as img:
+        if frame and img.format == "TIFF":
+            img.seek(frame)  # TIFF pages can differ in size; seeking only reads the page header
+        return proxy_size(*img.size)
+
+def read_proxy_sizes(image_files, indices, max_workers=None):
+    """Proxy sizes for many images of a DatasetIndex, reading headers in parallel.
+
+    Returns {index: (w, h)}, with None for images that could not be opened.
+    """
+    def read(idx):
+        try:
+            return read_proxy_size(*image_files.source(idx))
+        except (OSError, ValueError):
+            return None
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(indices, pool.map(read, indices)))
+
+GIF_CHECKPOINT_EVERY = 32  # Frames between decoder snapshots of an open GIF
+GIF_CHECKPOINT_BYTES = 32 * 1024 * 1024  # Snapshot memory per open GIF; spacing doubles to stay under it
+
+def _clone_gif(img, path=None):
+    """Copy a GIF reader's decoder state so it can carry on from its current frame.
+
+    GIF frames are deltas on top of the previous one, so a reader can only reach an
+    earlier frame by decoding again from frame 0. PIL has no API for this:
+    copy.copy() returns a plain Image, so the instance state is copied directly,
+    with its own pixel buffers and, if path is given, its own file handle.
+    """
+    img.load()
+    clone = object.__new__(type(img))
+    clone.__dict__.update(img.__dict__)
+    clone._im = img.im.copy()
+    clone.info = dict(img.info)
+    clone.tile = list(img.tile)
+    for name in ("palette", "dispose"):
+        value = getattr(img, name, None)
+        if value is not None:
+            setattr(clone, name, value.copy())
+    clone.fp = clone._fp = open(path, "rb") if path else None
+    clone._exclusive_fp = bool(path)
+    return clone
+
+class _FrameReader:
+    """An open multi-frame image, with the lock its seeks and copies run under.
+
+    For GIFs it also keeps snapshots of the decoder every `interval` frames, so
+    seeking backwards resumes from the nearest snapshot instead of frame 0.
+    TIFF needs none: PIL keeps the offset of every page it has passed.
+    """
+
+    __slots__ = ("lock", "img", "closed", "checkpoints", "interval", "max_checkpoints")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.img = None  # Opened on first use, under lock
+        self.closed = False
+        self.checkpoints = None  # frame -> decoder snapshot without a file handle; None unless a GIF
+        self.interval = GIF_CHECKPOINT_EVERY
+        self.max_checkpoints = 0
+
+    def open(self, path):
+        self.img = Image.open(path)
+        if self.img.format == "GIF":
+            w, h = self.img.size
+            self.checkpoints = {}
+            self.max_checkpoints = max(2, GIF_CHECKPOINT_BYTES // (w * h * 4 or 1))
+
+    def seek(self, path, frame):
+        if self.checkpoints is None:
+            self.img.seek(frame)
+            return
+        current = self.img.tell()
+        if frame < current:
+            start = max((k for k in self.checkpoints if k <= frame), default=0)
+            if start:
+                self.img.close()
+                self.img = _clone_gif(self.checkpoints[start], path)
+            current = start
+        # Step forward through the snapshot frames on the way, taking the ones not yet kept
+        k = (current // self.interval + 1) * self.interval
+        while k <= frame:
+            self.img.seek(k)
+            if k not in self.checkpoints:
+                self.checkpoints[k] = _clone_gif(self.img)
+                if len(self.checkpoints) > self.max_checkpoints:
+                    self.interval *= 2
+                    self.checkpoints = {f: cp for f, cp in self.checkpoints.items() if f % self.interval == 0}
+            k = (k // self.interval + 1) * self.interval
+        self.img.seek(frame)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.checkpoints = None
+            if self.img is not None:
+                self.img.close()
+
+_frame_readers = OrderedDict()  # path -> _FrameReader, least recently used first
+_frame_readers_lock = threading.Lock()  # Guards the LRU only, never a decode
+
+def load_frame(path, frame, max_open=8):
+    """Decode one frame of a multi-frame GIF or TIFF.
+
+    Open handles are kept in a small LRU so stepping through frames in order only
+    seeks forward from the previous frame instead of re-reading the file, and a
+    GIF seeks back from its nearest decoder snapshot. Each handle has its own
+    lock, so frames of different files decode in parallel.
+    """
+    with _frame_readers_lock:
+        reader = _frame_readers.get(path)
+        if reader is None:
+            reader = _frame_readers[path] = _FrameReader()
+        else:
+            _frame_readers.move_to_end(path)
+        evicted = [_frame_readers.popitem(last=False)[1] for _ in range(len(_frame_readers) - max_open)]
+    for old in evicted:
+        old.close()  # Waits for a decode still running on it
+    with reader.lock:
+        if reader.closed:
+            # Evicted since the lookup; read through a handle of our own
+            with Image.open(path) as img:
+                img.seek(frame)
+                return img.copy()
+        if reader.img is None:
+            reader.open(path)
+        reader.seek(path, frame)
+        return reader.img.copy()
+
+def open_frame(path, frame=0):
+    """Open an image file, or a decoded copy of a later frame of a multi-frame file"""
+    if frame:
+        return load_frame(path, frame)
+    return Image.open(path)
+
+def count_frames(path):
+    """Number of frames in an image file (1 for anything unreadable)"""
+    try:
+        with Image.open(path) as img:
+            return getattr(img, "n_frames", 1)
+    except Exception:
+        return 1
+
+def decode_proxy(path, frame=0):
+    """Decode an image into its in-memory display proxy"""
+    # Open image and convert to RGB to ensure it's loaded into memory
+    with open_frame(path, frame) as img:
+        # Determine if we should downsample the image
+        new_w, new_h = proxy_size(*img.size)
+        if (new_w, new_h) != img.size:
+            img = img.resize((new_w, new_h), Image.LANCZOS)
+        
+        # Convert to RGB if necessary
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            return img.convert('RGB')
+        return img.copy()
@@ -0,0 +1,170 @@
+"""Binary, memory-mappable cache of a YOLO export's labels and image shapes.
+
+Training loaders normally parse every label file and open every image header
+before the first batch. export_yolo already knows both, so it writes them once
+per split to labels/{split}.labelcache, which a loader maps with LabelCache
+instead. The layout is a fixed little-endian header followed by 64-byte
+aligned arrays:
+
+    header   magic, version, image count, box count, dataset hash
+    shapes   int32   (images, 2)      width, height of each exported image
+    spans    int64   (images + 1,)    image i owns boxes spans[i]:spans[i + 1]
+    classes  int32   (boxes,)
+    boxes    float32 (boxes, 4)       normalized center x, center y, width, height
+    names    int64   (images + 1,)    offsets into the UTF-8 name blob
+    blob     uint8                    exported image file names, concatenated
+
+The hash covers the name, size and modification time of every image and label
+file of the split, so a loader can tell when the export changed underneath it.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import mmap
+import os
+import struct
+
+import numpy as np
+from PIL import Image
+
+from .store import atomic_write
+
+MAGIC = b"YOLOLBLC"
+VERSION = 1
+HEADER = struct.Struct("<8sIQQ16s")
+ALIGN = 64
+CACHE_SUFFIX = ".labelcache"
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+def _layout(images, boxes):
+    """Byte offset of each array, and the total size, for the given counts"""
+    sections = [("shapes", np.int32, (images, 2)), ("spans", np.int64, (images + 1,)),
+                ("classes", np.int32, (boxes,)), ("boxes", np.float32, (boxes, 4)),
+                ("names", np.int64, (images + 1,))]
+    offset = _aligned(HEADER.size)
+    layout = {}
+    for name, dtype, shape in sections:
+        layout[name] = (offset, dtype, shape)
+        offset = _aligned(offset + np.dtype(dtype).itemsize * int(np.prod(shape)))
+    return layout, offset
+
+def cache_path(o_path, split):
+    return os.path.join(o_path, "labels", f"{split}{CACHE_SUFFIX}")
+
+def dataset_hash(images_dir, labels_dir, names):
+    """Digest of the name, size and mtime of every exported image and its label file"""
+    digest = hashlib.blake2b(digest_size=16)
+    for name in names:
+        label_name = f"{os.path.splitext(name)[0]}.txt"
+        for path in (os.path.join(images_dir, name), os.path.join(labels_dir, label_name)):
+            try:
+                stat = os.stat(path)
+                digest.update(f"{name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+            except OSError:
+                digest.update(f"{name}\0missing\n".encode("utf-8"))
+    return digest.digest()
+
+def _read_shapes(paths, max_workers=None):
+    """Image sizes from file headers, (0, 0) for files that could not be read"""
+    def read(path):
+        try:
+            with Image.open(path) as img:
+                return img.size
+        except (OSError, ValueError):
+            return 0, 0
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(read, paths))
+
+def write_label_cache(path, images_dir, labels_dir, names, shapes, rows):
+    """Write the cache for one split.
+
+    names are the exported image file names, shapes their (w, h) or None to read
+    it from the file header, and rows each image's (class, cx, cy, w, h) rows as
+    written to its label file. Call it after the images and labels are in place,
+    since their sizes and mtimes go into the hash.
+    """
+    missing = [i for i, shape in enumerate(shapes) if shape is None]
+    if missing:
+        read = _read_shapes([os.path.join(images_dir, names[i]) for i in missing])
+        shapes = list(shapes)
+        for i, shape in zip(missing, read):
+            shapes[i] = shape
+    counts = np.fromiter(map(len, rows), np.int64, len(rows))
+    spans = np.concatenate([[0], np.cumsum(counts)])
+    flat = np.array([row for image_rows in rows for row in image_rows], np.float64).reshape(-1, 5)
+    encoded = [name.encode("utf-8") for name in names]
+    name_offsets = np.concatenate([[0], np.cumsum([len(name) for name in encoded])])
+    arrays = {
+        "shapes": np.array(shapes, np.int32).reshape(-1, 2),
+        "spans": spans,
+        "classes": flat[:, 0],
+        "boxes": flat[:, 1:],
+        "names": name_offsets,
+    }
+    layout, size = _layout(len(names), len(flat))
+    header = HEADER.pack(MAGIC, VERSION, len(names), len(flat), dataset_hash(images_dir, labels_dir, names))
+
+    def write(f):
+        f.write(header)
+        for name, (offset, dtype, _) in layout.items():
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(np.ascontiguousarray(arrays[name], dtype).tobytes())
+        f.write(b"\0" * (size - f.tell()))
+        f.write(b"".join(encoded))
+    atomic_write(path, write, binary=True)
+
+def remove_label_caches(o_path):
+    """Delete the label caches of an export whose label files were edited in place"""
+    for split in ("train", "val"):
+        if os.path.exists(cache_path(o_path, split)):
+            os.remove(cache_path(o_path, split))
+
+class LabelCache:
+    """Read-only view of a .labelcache file; the arrays are backed by the mapped file.
+
+    Raises ValueError for a file that is not a label cache or has another version.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, images, boxes, self.hash = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a label cache")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is label cache version {version}, expected {VERSION}")
+        layout, self._blob_offset = _layout(images, boxes)
+        for name, (offset, dtype, shape) in layout.items():
+            setattr(self, name, np.frombuffer(self._mmap, dtype, int(np.prod(shape)), offset).reshape(shape))
+        self.path = path
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def name(self, i):
+        start, end = self.names[i], self.names[i + 1]
+        return self._mmap[self._blob_offset + start:self._blob_offset + end].decode("utf-8")
+
+    def labels(self, i):
+        """(classes, boxes) of image i as views into the file"""
+        start, end = self.spans[i], self.spans[i + 1]
+        return self.classes[start:end], self.boxes[start:end]
+
+    def is_current(self, images_dir, labels_dir):
+        """Whether the images and label files still match the ones the cache was written from"""
+        return dataset_hash(images_dir, labels_dir, map(self.name, range(len(self)))) == self.hash
+
+    def close(self):
+        # Arrays handed out keep the mapping alive until they are garbage collected
+        for name in ("shapes", "spans", "classes", "boxes", "names"):
+            self.__dict__.pop(name, None)
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
@@ -0,0 +1,94 @@
+"""Resizing or letterboxing exported images to the training input size"""
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+
+from PIL import Image
+
+from .images import open_frame
+from .store import atomic_write
+
+RESIZE_MODES = {
+    "letterbox": "Scale the long side to the input size and pad to a square",
+    "resize": "Scale the long side to the input size without padding",
+}
+IMAGE_FORMATS = {"jpg": ("JPEG", {"quality": 95}), "png": ("PNG", {"compress_level": 1}), "bmp": ("BMP", {})}
+PAD_COLOR = (114, 114, 114)  # The grey YOLO trainers letterbox with
+MANIFEST_NAME = "letterbox.json"
+
+def letterbox_geometry(img_w, img_h, imgsz, mode="letterbox"):
+    """(new_w, new_h, pad_x, pad_y, out_w, out_h) for fitting an img_w x img_h image into imgsz"""
+    scale = imgsz / max(img_w, img_h)
+    new_w, new_h = max(1, round(img_w * scale)), max(1, round(img_h * scale))
+    if mode == "resize":
+        return new_w, new_h, 0, 0, new_w, new_h
+    return new_w, new_h, (imgsz - new_w) // 2, (imgsz - new_h) // 2, imgsz, imgsz
+
+def letterbox_annotations(anns, img_w, img_h, geometry):
+    """Annotations moved from img_w x img_h display proxy coordinates into the output image's pixels"""
+    new_w, new_h, pad_x, pad_y = geometry[:4]
+    sx, sy = new_w / img_w, new_h / img_h
+    return [dict(ann, points=[(x * sx + pad_x, y * sy + pad_y) for x, y in ann["points"]]) for ann in anns]
+
+def letterbox_file(src, dst, geometry, frame=0):
+    """Write src resized (and padded) by geometry to dst, in the format given by dst's extension"""
+    new_w, new_h, pad_x, pad_y, out_w, out_h = geometry
+    fmt, options = IMAGE_FORMATS[os.path.splitext(dst)[1][1:].lower()]
+    with open_frame(src, frame) as img:
+        img.draft("RGB", (new_w, new_h))  # Let JPEG decode at a reduced scale that is still large enough
+        img = img.convert("RGB").resize((new_w, new_h), Image.LANCZOS)
+    if (out_w, out_h) != (new_w, new_h):
+        canvas = Image.new("RGB", (out_w, out_h), PAD_COLOR)
+        canvas.paste(img, (pad_x, pad_y))
+        img = canvas
+    img.save(dst + ".tmp", fmt, **options)
+    os.replace(dst + ".tmp", dst)
+
+def _letterbox_job(job):
+    """Process pool entry point taking (src, dst, geometry, frame)"""
+    try:
+        letterbox_file(*job)
+        return "resized"
+    except Exception as e:
+        print(f"Error resizing {job[0]}: {e}")
+        return "failed"
+
+def letterbox_files(jobs, force=False, max_workers=None):
+    """Run (src, dst, geometry, frame) jobs in a process pool. Returns a Counter of outcomes.
+
+    A job whose dst is newer than its src is skipped as "existing" unless force
+    is set, which callers do when the geometry settings changed.
+    """
+    counts = Counter()
+    todo = []
+    for job in jobs:
+        try:
+            if not force and os.stat(job[1]).st_mtime >= os.stat(job[0]).st_mtime:
+                counts["existing"] += 1
+                continue
+        except OSError:
+            pass
+        todo.append(job)
+    if todo:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            counts.update(pool.map(_letterbox_job, todo, chunksize=16))
+    return counts
+
+def read_manifest(o_path):
+    """Resize settings of the images exported to o_path, or None if they are the originals"""
+    try:
+        with open(os.path.join(o_path, MANIFEST_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_manifest(o_path, settings):
+    """Record the resize settings of an export, or remove the record for one of original images"""
+    path = os.path.join(o_path, MANIFEST_NAME)
+    if settings is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    atomic_write(path, lambda f: json.dump(settings, f))
@@ -0,0 +1,294 @@
+"""Streaming k-way merge of several annotation outputs with IoU-based conflict resolution"""
+
+from collections import Counter
+from csv import reader as csv_reader, writer as csv_writer
+import heapq
+from itertools import groupby, islice
+from operator import itemgetter
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .store import CSV_FIELDS, atomic_write, iter_project_annotations, read_project_settings
+
+MERGE_POLICIES = {
+    "union": "Keep every box; same-label boxes that overlap across sources count once",
+    "majority": "Keep boxes that more than half the sources labeling the image agree on",
+    "prefer": "Keep every box; where sources overlap, the earliest listed source wins",
+}
+# Settings a merged project takes from its first source. Session state such as input_path,
+# cursor, journal_seq and queue_offsets belongs to the source's own folder and is left out
+PROJECT_SETTINGS = ("val_split", "anchor_count", "anchor_imgsz", "train_imgsz", "resize_mode",
+                    "export_image_format", "detector")
+META_KEYS = ("labels", "label_colors") + PROJECT_SETTINGS
+
+def box_iou(a, b):
+    """IoU matrix between (n, 4) and (m, 4) arrays of x1, y1, x2, y2 boxes"""
+    lo = np.maximum(a[:, None, :2], b[None, :, :2])
+    hi = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(hi - lo, 0, None).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def resolve_boxes(per_source, policy="union", iou_threshold=0.5):
+    """Merge one image's boxes from several sources.
+
+    per_source holds a (boxes, labels) pair per source that labeled the image,
+    in priority order, with boxes an (n, 4) array of normalized corners. Boxes
+    are clustered greedily: each source's boxes are matched to the clusters so
+    far by descending IoU, at most one box per source and cluster, and boxes
+    left over start new clusters. Union only matches boxes with the same label.
+    Returns a list of (box, label, cluster size).
+    """
+    reps = np.zeros((0, 4))
+    rep_labels = []
+    members = []  # Per cluster: [(box, label)] in source order
+    for boxes, labels in per_source:
+        matched = {}
+        if len(reps) and len(boxes):
+            iou = box_iou(boxes, reps)
+            if policy == "union":
+                iou[np.asarray(labels, object)[:, None] != np.asarray(rep_labels, object)[None, :]] = 0
+            pairs = np.argwhere(iou >= iou_threshold)
+            order = np.argsort(-iou[pairs[:, 0], pairs[:, 1]], kind="stable")
+            used = set()
+            for row, col in pairs[order].tolist():
+                if row not in matched and col not in used:
+                    matched[row] = col
+                    used.add(col)
+        for row, (box, label) in enumerate(zip(boxes, labels)):
+            if row in matched:
+                members[matched[row]].append((box, label))
+            else:
+                members.append([(box, label)])
+                rep_labels.append(label)
+        new = [box for row, box in enumerate(boxes) if row not in matched]
+        if new:
+            reps = np.vstack([reps, new])
+
+    resolved = []
+    for cluster in members:
+        if policy == "majority":
+            if 2 * len(cluster) <= len(per_source):
+                continue
+            votes = Counter(label for _, label in cluster)
+            top = max(votes.values())
+            label = next(label for _, label in cluster if votes[label] == top)  # Ties go to the earlier source
+            box = np.mean([box for box, _ in cluster], axis=0)
+        else:
+            box, label = cluster[0]
+        resolved.append((box, label, len(cluster)))
+    return resolved
+
+def _csv_rows(path):
+    """(image, x1, y1, x2, y2, label, shape) rows of an annotations CSV"""
+    with open(path, "r", newline="") as f:
+        rows = csv_reader(f)
+        header = next(rows, None)
+        if header is None:
+            return
+        pick = itemgetter(*(header.index(field) for field in CSV_FIELDS))
+        for row in rows:
+            image, x1, y1, x2, y2, label, shape = pick(row)
+            yield image, float(x1), float(y1), float(x2), float(y2), label, shape
+
+def _is_sorted(path):
+    with open(path, "r", newline="") as f:
+        rows = csv_reader(f)
+        header = next(rows, None)
+        if header is None:
+            return True
+        image = header.index("image")
+        previous = ""
+        for row in rows:
+            if row[image] < previous:
+                return False
+            previous = row[image]
+    return True
+
+def _write_rows(path, rows):
+    count = 0
+    def write(f):
+        nonlocal count
+        out = csv_writer(f)
+        out.writerow(CSV_FIELDS)
+        for image, x1, y1, x2, y2, label, shape in rows:
+            out.writerow((image, x1, y1, x2, y2, label, shape))
+            count += 1
+    atomic_write(path, write, newline="")
+    return count
+
+def _sorted_rows(rows, tmp_dir, chunk_rows):
+    """rows ordered by image (their first field), keeping each image's row order.
+
+    Rows that do not fit in one chunk of chunk_rows are cut into sorted runs in
+    a directory of their own under tmp_dir, which are then merged, so memory
+    stays bounded by chunk_rows.
+    """
+    runs = []
+    run_dir = None
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        chunk.sort(key=itemgetter(0))  # Stable, so rows keep their order within an image
+        if not runs and len(chunk) < chunk_rows:
+            yield from chunk  # Everything fit in one chunk
+            return
+        run_dir = run_dir or tempfile.mkdtemp(dir=tmp_dir)
+        run = os.path.join(run_dir, f"run{len(runs)}.jsonl")
+        with open(run, "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in chunk)
+        runs.append(run)
+    # heapq.merge takes equal keys from earlier runs first, which preserves the order
+    yield from heapq.merge(*(_run_rows(run) for run in runs), key=itemgetter(0))
+
+def _run_rows(path):
+    with open(path, "r") as f:
+        for line in f:
+            yield tuple(json.loads(line))
+
+def _sorted_csv_rows(path, tmp_dir, chunk_rows):
+    """Rows of a CSV ordered by image, keeping each image's box order"""
+    if _is_sorted(path):
+        return _csv_rows(path)
+    return _sorted_rows(_csv_rows(path), tmp_dir, chunk_rows)
+
+def _project_rows(path):
+    """CSV-style rows of a project file's annotations, in file order"""
+    for image, anns in iter_project_annotations(path):
+        for ann in anns:
+            (x1, y1), (x2, y2) = ann["points"]
+            yield image, float(x1), float(y1), float(x2), float(y2), ann["label"], ann.get("shape", "Rectangle")
+
+def _backgrounds(path, tmp_dir, chunk_rows):
+    """Sorted names of the images a project file marks as having no boxes"""
+    names = ((image,) for image, anns in iter_project_annotations(path) if not anns)
+    return (row[0] for row in _sorted_rows(names, tmp_dir, chunk_rows))
+
+def open_source(path, tmp_dir, chunk_rows=500_000):
+    """(metadata, rows sorted by image, sorted background images) for a project folder, CSV or project.json.
+
+    Everything is streamed. Only the META_KEYS entries are read from a project
+    file, and its annotations are decoded one image at a time, so no source is
+    ever loaded whole. Background images, annotated with an empty list, have no
+    rows and are listed separately; a CSV cannot hold them, so for one they
+    come from the project.json beside it, as does its metadata.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, "annotations.csv")
+    if path.lower().endswith(".json"):
+        project_path = path
+        rows = _sorted_rows(_project_rows(path), tmp_dir, chunk_rows)
+    else:
+        project_path = os.path.join(os.path.dirname(path), "project.json")
+        rows = _sorted_csv_rows(path, tmp_dir, chunk_rows)
+        if not os.path.exists(project_path):
+            return {}, rows, iter(())
+    meta = read_project_settings(project_path, META_KEYS)
+    return meta, rows, _backgrounds(project_path, tmp_dir, chunk_rows)
+
+def _box_array(rows):
+    """(normalized (n, 4) box array, labels) for one source's rows of an image"""
+    boxes = np.array([row[1:5] for row in rows], dtype=np.float64).reshape(-1, 4)
+    return np.hstack([np.minimum(boxes[:, :2], boxes[:, 2:]), np.maximum(boxes[:, :2], boxes[:, 2:])]), [row[5] for row in rows]
+
+def _tagged(rows, backgrounds, src):
+    """(image, source, row) for a source's rows, with a one-field (image,) row per background image"""
+    for row in heapq.merge(rows, ((image,) for image in backgrounds), key=itemgetter(0)):
+        yield row[0], src, row
+
+def reconcile_labels(metas):
+    """Combined label list, label colors (earliest source wins) and the labels whose colors disagreed"""
+    labels, colors, conflicts = [], {}, []
+    for meta in metas:
+        for label in meta.get("labels", []):
+            if label not in labels:
+                labels.append(label)
+        for label, color in meta.get("label_colors", {}).items():
+            if label not in colors:
+                colors[label] = color
+            elif colors[label] != color and label not in conflicts:
+                conflicts.append(label)
+    return labels, colors, conflicts
+
+def merge_projects(sources, output_dir, policy="union", iou_threshold=0.5, chunk_rows=500_000):
+    """Merge several annotation outputs into annotations.csv and project.json in output_dir.
+
+    sources are project folders, annotation CSVs or project files, in priority
+    order. Their rows are merged by image name with a k-way heap merge, so only
+    one image's boxes from each source are in memory at a time, and each image
+    is resolved with resolve_boxes under policy. A source that marks an image
+    as background takes part in it with no boxes, and an image some source
+    marks as background that ends up with no boxes stays a background image
+    in the merged project. Coordinates are written at full precision.
+    Returns a summary dict.
+    """
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy '{policy}'. Use one of: {', '.join(MERGE_POLICIES)}")
+    os.makedirs(output_dir, exist_ok=True)
+    csv_path = os.path.join(output_dir, "annotations.csv")
+    summary = {"sources": len(sources), "images": 0, "boxes_in": 0, "boxes_out": 0, "overlaps": 0}
+    backgrounds = []  # Sorted, since images come out of the merge in order
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        opened = [open_source(path, tmp_dir, chunk_rows) for path in sources]
+        metas = [meta for meta, _, _ in opened]
+        labels, colors, color_conflicts = reconcile_labels(metas)
+        streams = [_tagged(rows, images, src) for src, (_, rows, images) in enumerate(opened)]
+
+        def merged_rows():
+            # Equal image names come out of the heap in source order, so each group is split by source
+            for image, group in groupby(heapq.merge(*streams, key=itemgetter(0)), key=itemgetter(0)):
+                per_source = [[row for _, _, row in rows] for _, rows in groupby(group, key=itemgetter(1))]
+                background = any(len(row) == 1 for rows in per_source for row in rows)
+                per_source = [[row for row in rows if len(row) > 1] for rows in per_source]
+                summary["images"] += 1
+                summary["boxes_in"] += sum(map(len, per_source))
+                if len(per_source) == 1:
+                    # Only one source labeled this image, so there is nothing to resolve
+                    resolved = [(row[1:5], row[5], 1) for row in per_source[0]]
+                else:
+                    resolved = resolve_boxes([_box_array(rows) for rows in per_source], policy, iou_threshold)
+                if not resolved:
+                    if background:
+                        backgrounds.append(image)
+                    continue
+                shape = next(rows[0][6] for rows in per_source if rows)
+                for box, label, size in resolved:
+                    summary["overlaps"] += size > 1
+                    if label not in labels:
+                        labels.append(label)  # Labels only seen in boxes go after the declared ones
+                    x1, y1, x2, y2 = map(float, box)
+                    yield image, x1, y1, x2, y2, label, shape
+
+        summary["boxes_out"] = _write_rows(csv_path, merged_rows())
+
+    first = metas[0] if metas else {}
+    project = {key: first[key] for key in PROJECT_SETTINGS if key in first}
+    project.update(output_path=output_dir, labels=labels, label_colors=colors)
+    _write_project_stream(os.path.join(output_dir, "project.json"), project, csv_path, backgrounds)
+    summary.update(labels=labels, color_conflicts=color_conflicts, backgrounds=len(backgrounds))
+    return summary
+
+def _write_project_stream(path, project, csv_path, backgrounds=()):
+    """Write project.json with its annotations read image by image from the merged CSV.
+
+    backgrounds, sorted names of images without rows, get an empty list.
+    """
+    colors = project.get("label_colors", {})
+    def write(f):
+        f.write("{\n")
+        for key, value in project.items():
+            f.write(f"  {json.dumps(key)}: {json.dumps(value)},\n")
+        f.write('  "annotations": {')
+        images = ((image, list(rows)) for image, rows in groupby(_csv_rows(csv_path), key=itemgetter(0)))
+        for i, (image, rows) in enumerate(heapq.merge(images, ((image, []) for image in backgrounds),
+                                                      key=itemgetter(0))):
+            anns = [{"shape": shape, "points": [[x1, y1], [x2, y2]], "label": label,
+                     "color": colors.get(label, "#FF0000")} for _, x1, y1, x2, y2, label, shape in rows]
+            f.write(f"{',' if i else ''}\n    {json.dumps(image)}: {json.dumps(anns)}")
+        f.write("\n  }\n}\n")
+    atomic_write(path, write)
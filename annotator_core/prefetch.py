@@ -0,0 +1,83 @@
+"""Priority prefetching of decoded images around the image being viewed"""
+
+import heapq
+import threading
+
+class PrefetchScheduler:
+    """Decodes images into an ImageCache in order of distance from the focus image.
+
+    Priorities are distances from the focus, with images behind the direction of
+    travel counted behind_weight times further away, so more of the window lies
+    ahead. Only images whose weighted distance is at most radius are queued. Each
+    focus() call replaces the whole queue, which cancels every job that has not
+    started yet; decodes already running finish and stay in the cache.
+    on_loaded(index) is called from a worker thread after each decode.
+    """
+
+    def __init__(self, cache, total, workers=4, radius=48, behind_weight=2.0, on_loaded=None):
+        self.cache = cache
+        self.total = total
+        self.radius = radius
+        self.behind_weight = behind_weight
+        self.on_loaded = on_loaded
+        self.focus_index = None
+        self.direction = 1
+        self._heap = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, daemon=True, name=f"prefetch-{i}")
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def focus(self, index, direction=None):
+        """Re-centre the queue on index. direction is +1 or -1; by default it is inferred"""
+        if direction is None:
+            direction = self.direction if self.focus_index is None or index == self.focus_index else (
+                1 if index > self.focus_index else -1)
+        heap = []
+        for idx in self.window(index, direction):
+            if idx not in self.cache:
+                offset = idx - index
+                weight = 1.0 if offset * direction >= 0 else self.behind_weight
+                heap.append((abs(offset) * weight, idx))
+        heapq.heapify(heap)
+        with self._cond:
+            self.focus_index, self.direction = index, direction
+            self._heap = heap
+            self._cond.notify_all()
+
+    def window(self, index, direction=None):
+        """Indices the scheduler keeps decoded around index, clipped to the dataset"""
+        direction = direction or self.direction
+        ahead = self.radius
+        behind = int(self.radius / self.behind_weight)
+        lo, hi = (index - behind, index + ahead) if direction >= 0 else (index - ahead, index + behind)
+        return range(max(0, lo), min(self.total, hi + 1))
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._heap = []
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._heap or self._closed)
+                if self._closed:
+                    return
+                _, idx = heapq.heappop(self._heap)
+            if idx in self.cache:
+                continue
+            try:
+                self.cache.load(idx)
+            except Exception as e:
+                print(f"Error loading image {idx}: {e}")
+                continue
+            if self.on_loaded is not None:
+                self.on_loaded(idx)
@@ -0,0 +1,85 @@
+"""Box propagation between frames with normalized cross-correlation"""
+
+import numpy as np
+from PIL import Image
+
+def _window_sums(a, th, tw):
+    """Sum of every th x tw window of a, via an integral image"""
+    ii = np.pad(a.astype(np.float64), ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    return ii[th:, tw:] - ii[:-th, tw:] - ii[th:, :-tw] + ii[:-th, :-tw]
+
+def ncc_map(search, template):
+    """Normalized cross-correlation of template at every valid position in search.
+
+    Returns None when the template has no contrast to match on.
+    """
+    th, tw = template.shape
+    t = template - template.mean()
+    t_norm = np.sqrt((t * t).sum())
+    if t_norm < 1e-6:
+        return None
+    windows = np.lib.stride_tricks.sliding_window_view(search, (th, tw))
+    # The template is zero-mean, so the window means cancel out of the numerator
+    numerator = np.einsum("ijkl,kl->ij", windows, t)
+    sums = _window_sums(search, th, tw)
+    variance = _window_sums(search * search, th, tw) - sums * sums / (th * tw)
+    denominator = np.sqrt(np.maximum(variance, 0)) * t_norm
+    return np.where(denominator > 1e-6, numerator / np.maximum(denominator, 1e-6), 0.0)
+
+def _subpixel_offset(values):
+    """Offset of the peak of a parabola through three samples centred on the maximum"""
+    if len(values) != 3:
+        return 0.0
+    left, centre, right = values
+    curvature = left - 2 * centre + right
+    return float(np.clip((left - right) / (2 * curvature), -0.5, 0.5)) if curvature < 0 else 0.0
+
+def propagate_boxes(prev_img, next_img, boxes, margin=0.5, max_template=32, min_score=0.5):
+    """Track boxes from prev_img into next_img with template matching.
+
+    Each box's patch is downscaled so its longer side is at most max_template pixels
+    and matched by NCC within a search window grown by margin times the box size.
+    boxes are (x1, y1, x2, y2) in prev_img pixels; returns (x1, y1, x2, y2, score)
+    in next_img pixels. Boxes without a match above min_score are carried over as is.
+    """
+    sx, sy = next_img.width / prev_img.width, next_img.height / prev_img.height
+    prev_gray, next_gray = prev_img.convert("L"), next_img.convert("L")
+    results = []
+    for x1, y1, x2, y2 in boxes:
+        x1, x2 = sorted((x1, x2))
+        y1, y2 = sorted((y1, y2))
+        bw, bh = x2 - x1, y2 - y1
+        carried = (x1 * sx, y1 * sy, x2 * sx, y2 * sy, 0.0)
+        if bw < 2 or bh < 2:
+            results.append(carried)
+            continue
+
+        scale = min(1.0, max_template / max(bw, bh))
+        tw, th = max(2, round(bw * scale)), max(2, round(bh * scale))
+        template = np.asarray(prev_gray.resize((tw, th), Image.BILINEAR, box=(x1, y1, x2, y2)), dtype=np.float32)
+
+        # Search window around the box's position in the next image, at the template's scale
+        fx, fy = tw / (bw * sx), th / (bh * sy)
+        mx, my = max(bw * sx * margin, 8), max(bh * sy * margin, 8)
+        rx1, ry1 = max(0.0, x1 * sx - mx), max(0.0, y1 * sy - my)
+        rx2, ry2 = min(next_img.width, x2 * sx + mx), min(next_img.height, y2 * sy + my)
+        sw, sh = round((rx2 - rx1) * fx), round((ry2 - ry1) * fy)
+        if sw < tw or sh < th:
+            results.append(carried)
+            continue
+        search = np.asarray(next_gray.resize((sw, sh), Image.BILINEAR, box=(rx1, ry1, rx2, ry2)), dtype=np.float32)
+
+        scores = ncc_map(search, template)
+        if scores is None:
+            results.append(carried)
+            continue
+        py, px = np.unravel_index(np.argmax(scores), scores.shape)
+        score = float(scores[py, px])
+        if score < min_score:
+            results.append(carried[:4] + (score,))
+            continue
+        # Parabolic sub-pixel refinement of the peak, since the template is downscaled
+        dx, dy = _subpixel_offset(scores[py, max(px - 1, 0):px + 2]), _subpixel_offset(scores[max(py - 1, 0):py + 2, px])
+        nx1, ny1 = rx1 + (px + dx) / fx, ry1 + (py + dy) / fy
+        results.append((float(nx1), float(ny1), float(nx1 + bw * sx), float(ny1 + bh * sy), score))
+    return results
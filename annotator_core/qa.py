@@ -0,0 +1,152 @@
+"""Annotation quality checks and batch fixes"""
+
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+
+from .boxes import normalized_box
+
+# QA checks run by validate_annotations, in report order, with their descriptions
+QA_CHECKS = {
+    "inverted": "Inverted corners (x1 > x2 or y1 > y2)",
+    "zero_area": "Zero or sub-pixel width or height",
+    "out_of_bounds": "Extends outside the image",
+    "duplicate": "Duplicate of another box with the same label",
+    "unknown_label": "Label missing from the label list",
+    "orphaned": "Image not found in the input folder",
+    "unreadable": "Image could not be read",
+}
+
+class ValidationReport:
+    """Boxes flagged by validate_annotations, as check -> list of (image name, box position)"""
+
+    def __init__(self, min_size):
+        self.min_size = min_size
+        self.issues = {check: [] for check in QA_CHECKS}
+        self.unknown_labels = set()
+        self.boxes = 0
+
+    def __bool__(self):
+        return any(self.issues.values())
+
+    def by_image(self):
+        """image name -> {box position -> set of checks it failed}"""
+        result = {}
+        for check, flagged in self.issues.items():
+            for img_name, position in flagged:
+                result.setdefault(img_name, {}).setdefault(position, set()).add(check)
+        return result
+
+def validate_annotations(annotations_per_image, label_list, image_sizes, iou_threshold=0.9, min_size=1.0,
+                         unreadable=()):
+    """Check every box in the project at once with array operations.
+
+    image_sizes maps image names to their display proxy (w, h), or None for images
+    without one: those no longer in the input folder, or the unreadable ones, which
+    are still there but could not be opened. Duplicates are boxes with the same label
+    on the same image overlapping an earlier one above iou_threshold.
+    """
+    report = ValidationReport(min_size)
+    names = [img_name for img_name, anns in annotations_per_image.items() if anns]
+    lengths = np.array([len(annotations_per_image[img_name]) for img_name in names], np.int64)
+    anns = list(chain.from_iterable(annotations_per_image[img_name] for img_name in names))
+    n = report.boxes = len(anns)
+    if not n:
+        return report
+    points = chain.from_iterable(chain.from_iterable(map(itemgetter("points"), anns)))
+    coords = np.fromiter(points, np.float64, n * 4).reshape(-1, 4)
+    img_ids = np.repeat(np.arange(len(names)), lengths)
+    positions = np.arange(n) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    labels = list(map(itemgetter("label"), anns))
+    label_ids = {label: i for i, label in enumerate(dict.fromkeys(labels))}
+    box_labels = np.fromiter(map(label_ids.__getitem__, labels), np.int64, n)
+    known = set(label_list)
+    unknown_ids = [i for label, i in label_ids.items() if label not in known]
+    report.unknown_labels = {label for label in label_ids if label not in known}
+
+    sizes = np.array([image_sizes.get(img_name) or (np.nan, np.nan) for img_name in names], np.float64)
+    box_sizes = sizes[img_ids]
+    lo = np.minimum(coords[:, :2], coords[:, 2:])
+    hi = np.maximum(coords[:, :2], coords[:, 2:])
+    no_size = np.isnan(box_sizes[:, 0])
+    unreadable = no_size & np.fromiter((img_name in unreadable for img_name in names), bool, len(names))[img_ids]
+    with np.errstate(invalid="ignore"):
+        out_of_bounds = ~no_size & ((lo < 0).any(1) | (hi > box_sizes).any(1))
+    masks = {
+        "inverted": (coords[:, 0] > coords[:, 2]) | (coords[:, 1] > coords[:, 3]),
+        "zero_area": ((hi - lo) < min_size).any(1),
+        "out_of_bounds": out_of_bounds,
+        "duplicate": _duplicate_mask(img_ids * len(label_ids) + box_labels, np.hstack([lo, hi]), iou_threshold),
+        "unknown_label": np.isin(box_labels, unknown_ids),
+        "orphaned": no_size & ~unreadable,
+        "unreadable": unreadable,
+    }
+    for check, mask in masks.items():
+        hits = np.flatnonzero(mask)
+        report.issues[check] = [(names[i], p) for i, p in zip(img_ids[hits].tolist(), positions[hits].tolist())]
+    return report
+
+def _duplicate_mask(groups, boxes, iou_threshold):
+    """Flag boxes overlapping an earlier box of the same group above iou_threshold.
+
+    Boxes are sorted by group and left edge, then each pass compares every box with
+    the one d places later, for as long as some of those pairs still overlap in x.
+    """
+    n = len(boxes)
+    order = np.lexsort((boxes[:, 0], groups))
+    groups, boxes = groups[order], boxes[order]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    duplicate = np.zeros(n, bool)
+    i = np.arange(n)
+    d = 1
+    while len(i):
+        i = i[i + d < n]
+        j = i + d
+        live = (groups[j] == groups[i]) & (boxes[j, 0] < boxes[i, 2])
+        i, j = i[live], j[live]
+        iw = np.minimum(boxes[i, 2], boxes[j, 2]) - boxes[j, 0]
+        ih = np.minimum(boxes[i, 3], boxes[j, 3]) - np.maximum(boxes[i, 1], boxes[j, 1])
+        inter = iw * np.maximum(ih, 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            hit = inter / (areas[i] + areas[j] - inter) > iou_threshold
+        duplicate[np.maximum(order[i[hit]], order[j[hit]])] = True  # Keep the earlier box
+        d += 1
+    return duplicate
+
+def apply_fixes(annotations_per_image, report, image_sizes, fixes, unknown_labels="keep"):
+    """New annotation lists for the images touched by the chosen fixes.
+
+    Inverted boxes get their corners swapped and out-of-bounds boxes are clipped to the
+    image. Boxes that are degenerate, duplicated, orphaned or (with unknown_labels="drop")
+    unknown are removed. Annotation dicts are replaced, never mutated.
+    """
+    drop = fixes & {"zero_area", "duplicate", "orphaned"}
+    if unknown_labels == "drop":
+        drop.add("unknown_label")
+    fixed = {}
+    for img_name, flagged in report.by_image().items():
+        anns = annotations_per_image.get(img_name, [])
+        size = image_sizes.get(img_name)
+        new_anns, changed = [], False
+        for position, ann in enumerate(anns):
+            checks = flagged.get(position, set())
+            if checks & drop:
+                changed = True
+                continue
+            reshape = checks & fixes & {"inverted", "out_of_bounds"}
+            if reshape:
+                x1, y1, x2, y2 = normalized_box(ann)
+                if "out_of_bounds" in reshape and size:
+                    x1, x2 = min(max(x1, 0), size[0]), min(max(x2, 0), size[0])
+                    y1, y2 = min(max(y1, 0), size[1]), min(max(y2, 0), size[1])
+                    if min(x2 - x1, y2 - y1) < report.min_size:
+                        changed = True
+                        continue  # Nothing of the box was inside the image
+                ann = dict(ann, points=[(x1, y1), (x2, y2)])
+                changed = True
+            new_anns.append(ann)
+        if changed:
+            fixed[img_name] = new_anns
+    return fixed
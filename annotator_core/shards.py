@@ -0,0 +1,144 @@
+"""Packing a YOLO export into WebDataset-style tar shards for sequential training reads"""
+
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import os
+import re
+import tarfile
+
+from .store import atomic_write
+
+INDEX_NAME = "index.tsv"
+INDEX_FIELDS = ("key", "name", "shard", "member", "offset", "size")
+SHARD_NAME = re.compile(r"^(train|val)-\d{6}\.tar(\.tmp)?$")  # Files pack_shards owns in shards/
+
+def _plan_shards(split, samples, shard_samples, shard_bytes):
+    """Cut (base name, image path, label path, bytes) samples into consecutive shards"""
+    shards, current, nbytes = [], [], 0
+    for sample in samples:
+        if current and (len(current) >= shard_samples or nbytes + sample[3] > shard_bytes):
+            shards.append(current)
+            current, nbytes = [], 0
+        current.append(sample)
+        nbytes += sample[3]
+    if current:
+        shards.append(current)
+    return [(f"{split}-{i:06d}.tar", shard) for i, shard in enumerate(shards)]
+
+def _split_samples(o_path, split):
+    """(base name, image path, label path, bytes) for every image of one split of a YOLO export"""
+    images_dir = os.path.join(o_path, "images", split)
+    labels_dir = os.path.join(o_path, "labels", split)
+    if not os.path.isdir(images_dir):
+        return []
+    samples = []
+    for entry in sorted(os.scandir(images_dir), key=lambda entry: entry.name):
+        if not entry.is_file():
+            continue
+        base_name = os.path.splitext(entry.name)[0]
+        label_path = os.path.join(labels_dir, f"{base_name}.txt")
+        label_size = os.path.getsize(label_path) if os.path.exists(label_path) else 0
+        samples.append((base_name, entry.path, label_path, entry.stat().st_size + label_size))
+    return samples
+
+def _add_member(tar, member, fileobj, size, mtime):
+    """Append one file to tar. Returns the offset of its data in the archive"""
+    info = tarfile.TarInfo(member)
+    info.size = size
+    info.mtime = mtime
+    info.mode = 0o444
+    tar.addfile(info, fileobj)
+    # Data is padded to whole 512-byte blocks and ends where the archive now ends
+    padded = -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+    return tar.offset - padded
+
+def write_shard(path, samples, first_key, metadata=None):
+    """Write one tar shard of (base name, image path, label path, bytes) samples.
+
+    Sample n is stored under the key first_key + n as KEY.<image ext>, KEY.txt
+    and, when metadata has an entry for its base name, KEY.json; numeric keys
+    keep WebDataset readers, which cut the key at the first dot, safe from
+    dotted file names. Returns index rows (key, name, shard, member, offset, size).
+    """
+    rows = []
+    shard = os.path.basename(path)
+    with tarfile.open(path + ".tmp", "w", format=tarfile.GNU_FORMAT) as tar:
+        for n, (base_name, image_path, label_path, _) in enumerate(samples):
+            key = f"{first_key + n:09d}"
+            members = [(f"{key}{os.path.splitext(image_path)[1].lower()}", image_path)]
+            if os.path.exists(label_path):
+                members.append((f"{key}.txt", label_path))
+            for member, file_path in members:
+                stat = os.stat(file_path)
+                with open(file_path, "rb") as f:
+                    offset = _add_member(tar, member, f, stat.st_size, stat.st_mtime)
+                rows.append((key, base_name, shard, member, offset, stat.st_size))
+            meta = metadata.get(base_name) if metadata else None
+            if meta is not None:
+                data = json.dumps(meta).encode("utf-8")
+                offset = _add_member(tar, f"{key}.json", io.BytesIO(data), len(data), os.stat(image_path).st_mtime)
+                rows.append((key, base_name, shard, f"{key}.json", offset, len(data)))
+    os.replace(path + ".tmp", path)
+    return rows
+
+def pack_shards(o_path, shard_samples=1000, shard_bytes=256 * 1024 * 1024, metadata=None, max_workers=None):
+    """Pack the images/ and labels/ trees of a YOLO export in o_path into tar shards.
+
+    Each split becomes consecutive shards/{split}-NNNNNN.tar files of at most
+    shard_samples samples and roughly shard_bytes bytes (a single larger sample
+    gets a shard of its own), written in parallel. metadata optionally maps image
+    base names to JSON-serializable dicts stored beside each sample.
+    shards/index.tsv lists every member's shard, byte offset and size by key, so
+    any sample can be read with one seek without scanning the tar. Shards left
+    from an earlier, larger export are removed; other files in shards/, such as
+    a work queue's annotator shards, are left alone. Returns a summary dict.
+    """
+    shard_dir = os.path.join(o_path, "shards")
+    os.makedirs(shard_dir, exist_ok=True)
+    jobs = []
+    first_key = 0
+    for split in ("train", "val"):
+        for name, samples in _plan_shards(split, _split_samples(o_path, split), shard_samples, shard_bytes):
+            jobs.append((os.path.join(shard_dir, name), samples, first_key))
+            first_key += len(samples)
+
+    if max_workers is None:
+        max_workers = min(8, (os.cpu_count() or 1) + 2)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        rows = list(pool.map(lambda job: write_shard(*job, metadata=metadata), jobs))
+
+    def write_index(f):
+        f.write("\t".join(INDEX_FIELDS) + "\n")
+        for shard_rows in rows:
+            f.writelines("\t".join(map(str, row)) + "\n" for row in shard_rows)
+    atomic_write(os.path.join(shard_dir, INDEX_NAME), write_index)
+
+    kept = {os.path.basename(path) for path, _, _ in jobs}
+    for entry in os.scandir(shard_dir):
+        if entry.is_file() and SHARD_NAME.match(entry.name) and entry.name not in kept:
+            os.remove(entry.path)
+    return {
+        "shards": len(jobs),
+        "samples": first_key,
+        "bytes": sum(os.path.getsize(path) for path, _, _ in jobs),
+    }
+
+def read_shard_index(o_path):
+    """{key: {member: (shard path, offset, size)}} from a shard index, plus {image base name: key}"""
+    shard_dir = os.path.join(o_path, "shards")
+    samples, keys = {}, {}
+    with open(os.path.join(shard_dir, INDEX_NAME), "r") as f:
+        next(f, None)
+        for line in f:
+            key, name, shard, member, offset, size = line.rstrip("\n").split("\t")
+            samples.setdefault(key, {})[member] = (os.path.join(shard_dir, shard), int(offset), int(size))
+            keys[name] = key
+    return samples, keys
+
+def read_member(location):
+    """Bytes of one shard member from its (shard path, offset, size) index entry"""
+    path, offset, size = location
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
@@ -0,0 +1,163 @@
+"""Project-wide annotation statistics"""
+
+from csv import writer as csv_writer
+from itertools import chain
+from operator import itemgetter
+import json
+
+import numpy as np
+
+from .store import atomic_write
+
+class DatasetStats:
+    """Project-wide annotation statistics computed with NumPy and updated per image.
+
+    rebuild() flattens every box into flat arrays once. update() subtracts the changed
+    image's previous contribution and adds its new one, so edits never rescan the project.
+
+    Class and box histograms cover every annotated image in the project, so the
+    taxonomy editor sees boxes on images missing from disk. Per-image figures
+    (coverage, boxes per image) count only images in the DatasetIndex.
+    """
+
+    SIZE_EDGES = np.geomspace(1, 4096, 25)  # sqrt(box area) in display-proxy pixels
+    ASPECT_EDGES = np.linspace(-4, 4, 17)  # log2(width / height)
+
+    def __init__(self):
+        self.image_files = None  # DatasetIndex the per-image figures are restricted to
+        self.image_count = 0
+        self.labels = {}  # label -> class id, in first-seen order
+        self.class_counts = np.zeros(0, np.int64)
+        self.size_hist = np.zeros(len(self.SIZE_EDGES) + 1, np.int64)  # Plus under/overflow bins
+        self.aspect_hist = np.zeros(len(self.ASPECT_EDGES) + 1, np.int64)
+        self.box_counts = {}  # image name -> box count, for indexed images with boxes only
+        self._base = None  # (class ids, size bins, aspect bins) from the last rebuild
+        self._spans = {}  # image name -> (start, end) into the base arrays
+        self._overrides = {}  # image name -> contribution after an update
+
+    def rebuild(self, annotations_per_image, image_files):
+        """Recompute every histogram from scratch in one vectorized pass"""
+        self.image_files = image_files
+        self.image_count = len(image_files)
+        self.labels = ids = {}
+        self.class_counts = np.zeros(0, np.int64)
+        self.size_hist[:] = 0
+        self.aspect_hist[:] = 0
+        self._overrides = {}
+        names = [img_name for img_name, anns in annotations_per_image.items() if anns]
+        lengths = [len(annotations_per_image[img_name]) for img_name in names]
+        anns = list(chain.from_iterable(annotations_per_image[img_name] for img_name in names))
+        labels = list(map(itemgetter("label"), anns))
+        ids.update((label, i) for i, label in enumerate(dict.fromkeys(labels)))
+        label_ids = np.fromiter(map(ids.__getitem__, labels), np.int32, len(labels))
+        points = chain.from_iterable(chain.from_iterable(map(itemgetter("points"), anns)))
+        coords = np.fromiter(points, np.float64, len(anns) * 4)
+        self._base = self._bin(label_ids, coords.reshape(-1, 4))
+        ends = np.cumsum(lengths).tolist()
+        self._spans = dict(zip(names, zip([0] + ends[:-1], ends)))
+        self.box_counts = {img_name: n for img_name, n in zip(names, lengths) if self._indexed(img_name)}
+        self._apply(self._base, 1)
+
+    def update(self, img_name, anns):
+        """Refresh the statistics for one image after its annotations changed"""
+        self._apply(self._contribution(img_name), -1)
+        self._spans.pop(img_name, None)
+        ids = self.labels
+        label_ids = np.array([ids.setdefault(ann["label"], len(ids)) for ann in anns], np.int32)
+        coords = np.array([ann["points"] for ann in anns], np.float64).reshape(-1, 4)
+        new = self._bin(label_ids, coords)
+        self._overrides[img_name] = new
+        self._apply(new, 1)
+        if anns and self._indexed(img_name):
+            self.box_counts[img_name] = len(anns)
+        else:
+            self.box_counts.pop(img_name, None)
+
+    def count(self, label):
+        idx = self.labels.get(label)
+        return int(self.class_counts[idx]) if idx is not None and idx < len(self.class_counts) else 0
+
+    def report(self, label_list=()):
+        """Plain dict of the current statistics, ready for json.dump"""
+        annotated = len(self.box_counts)
+        per_image = np.fromiter(self.box_counts.values(), np.int64, annotated)
+        per_image_hist = np.bincount(per_image, minlength=1)
+        per_image_hist[0] += max(0, self.image_count - annotated)
+        labels = list(label_list) + [label for label in self.labels if label not in label_list]
+        total = int(self.class_counts.sum())
+        indexed_boxes = int(per_image.sum())
+        return {
+            "images": self.image_count,
+            "annotated_images": annotated,
+            "unannotated_images": max(0, self.image_count - annotated),
+            "coverage": annotated / self.image_count if self.image_count else 0.0,
+            "boxes": total,
+            "classes": {label: self.count(label) for label in labels},
+            "box_size_edges": self.SIZE_EDGES.round(2).tolist(),
+            "box_size_counts": self.size_hist.tolist(),
+            "aspect_log2_edges": self.ASPECT_EDGES.tolist(),
+            "aspect_counts": self.aspect_hist.tolist(),
+            "boxes_per_image_counts": per_image_hist.tolist(),
+            "boxes_per_image_mean": indexed_boxes / self.image_count if self.image_count else 0.0,
+        }
+
+    def _indexed(self, img_name):
+        return self.image_files is not None and self.image_files.index_of(img_name) is not None
+
+    def _contribution(self, img_name):
+        if img_name in self._overrides:
+            return self._overrides[img_name]
+        span = self._spans.get(img_name)
+        if span is None:
+            return None
+        return tuple(values[span[0]:span[1]] for values in self._base)
+
+    def _bin(self, label_ids, coords):
+        w = np.abs(coords[:, 2] - coords[:, 0])
+        h = np.abs(coords[:, 3] - coords[:, 1])
+        size_bins = np.searchsorted(self.SIZE_EDGES, np.sqrt(w * h)).astype(np.uint8)
+        aspect = np.log2(np.maximum(w, 1e-6) / np.maximum(h, 1e-6))
+        aspect_bins = np.searchsorted(self.ASPECT_EDGES, aspect).astype(np.uint8)
+        return label_ids, size_bins, aspect_bins
+
+    def _apply(self, contribution, sign):
+        if contribution is None:
+            return
+        label_ids, size_bins, aspect_bins = contribution
+        if len(self.class_counts) < len(self.labels):
+            grown = np.zeros(len(self.labels), np.int64)
+            grown[:len(self.class_counts)] = self.class_counts
+            self.class_counts = grown
+        self.class_counts += sign * np.bincount(label_ids, minlength=len(self.class_counts))
+        self.size_hist += sign * np.bincount(size_bins, minlength=len(self.size_hist))
+        self.aspect_hist += sign * np.bincount(aspect_bins, minlength=len(self.aspect_hist))
+
+def write_stats_json(path, report):
+    atomic_write(path, lambda f: json.dump(report, f, indent=2))
+
+def write_stats_csv(path, report):
+    """Flatten a stats report into (section, key, value) rows"""
+    def write(f):
+        writer = csv_writer(f)
+        writer.writerow(("section", "key", "value"))
+        for key in ("images", "annotated_images", "unannotated_images", "coverage", "boxes", "boxes_per_image_mean"):
+            writer.writerow(("summary", key, report[key]))
+        for label, count in report["classes"].items():
+            writer.writerow(("class", label, count))
+        edges = report["box_size_edges"]
+        for i, count in enumerate(report["box_size_counts"]):
+            writer.writerow(("box_size", bin_label(edges, i), count))
+        edges = report["aspect_log2_edges"]
+        for i, count in enumerate(report["aspect_counts"]):
+            writer.writerow(("aspect_log2", bin_label(edges, i), count))
+        for n, count in enumerate(report["boxes_per_image_counts"]):
+            writer.writerow(("boxes_per_image", n, count))
+    atomic_write(path, write, newline="")
+
+def bin_label(edges, i):
+    """Name histogram bin i of a searchsorted histogram with under/overflow bins"""
+    if i == 0:
+        return f"<{edges[0]:g}"
+    if i == len(edges):
+        return f">={edges[-1]:g}"
+    return f"{edges[i - 1]:g}-{edges[i]:g}"
@@ -0,0 +1,203 @@
+"""Annotation storage: atomic CSV and project file writes, and the background writer"""
+
+from csv import DictReader, writer as csv_writer
+import json
+import os
+import threading
+
+CSV_FIELDS = ["image", "x1", "y1", "x2", "y2", "label", "shape"]
+
+def atomic_write(path, write_fn, newline=None, binary=False):
+    """Write a file through a temp file, fsync it and swap it into place with os.replace"""
+    temp_path = path + ".tmp"
+    try:
+        with (open(temp_path, "wb") if binary else open(temp_path, "w", newline=newline)) as f:
+            write_fn(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except Exception:
+        # Clean up temp file if something went wrong
+        if os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        raise
+
+def write_annotations_csv(path, annotations):
+    """Atomically write annotations as CSV rows. Returns the number of rows written"""
+    count = 0
+    def write(f):
+        nonlocal count
+        writer = csv_writer(f)
+        writer.writerow(CSV_FIELDS)
+        for img_name, anns in annotations.items():
+            for ann in anns:
+                (x1, y1), (x2, y2) = ann["points"]
+                writer.writerow((img_name, x1, y1, x2, y2, ann["label"], ann["shape"]))
+                count += 1
+    atomic_write(path, write, newline="")
+    return count
+
+def write_project_json(path, project_data):
+    """Atomically write the project file"""
+    atomic_write(path, lambda f: json.dump(project_data, f, indent=2))
+
+def read_project_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+class _JSONStream:
+    """Pull parser over a JSON file that decodes one value at a time from a bounded buffer"""
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+
+    def peek(self):
+        """Next non-whitespace character, or "" at the end of the file"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in project file at {self.f.name}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self.buf) and self._fill():
+                continue  # A number at the end of the buffer may go on in the next chunk
+            self.pos = end
+            return value
+
+    def _fill(self):
+        data = self.f.read(self.chunk_size)
+        if not data:
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+def _walk_project_json(path, chunk_size):
+    """(key, value) for each top-level entry of a project file.
+
+    The annotations object comes out as one ("annotations", (image, anns)) per image.
+    """
+    with open(path, "r") as f:
+        stream = _JSONStream(f, chunk_size)
+        stream.expect("{")
+        while stream.peek() != "}":
+            key = stream.value()
+            stream.expect(":")
+            if key == "annotations" and stream.peek() == "{":
+                stream.expect("{")
+                while stream.peek() != "}":
+                    image = stream.value()
+                    stream.expect(":")
+                    yield key, (image, stream.value())
+                    if stream.peek() == ",":
+                        stream.expect(",")
+                stream.expect("}")
+            else:
+                yield key, stream.value()
+            if stream.peek() == ",":
+                stream.expect(",")
+
+def read_project_settings(path, keys, chunk_size=1 << 16):
+    """Top-level entries of a project file named in keys, streamed past its annotations"""
+    keys = set(keys) - {"annotations"}
+    return {key: value for key, value in _walk_project_json(path, chunk_size) if key in keys}
+
+def iter_project_annotations(path, chunk_size=1 << 16):
+    """(image, annotations) pairs of a project file in file order, decoded one image at a time"""
+    return (value for key, value in _walk_project_json(path, chunk_size) if key == "annotations")
+
+def read_annotations_csv(path, color_for):
+    """Read annotations written by write_annotations_csv, colouring each label with color_for"""
+    annotations = {}
+    colors = {}
+    with open(path, "r", newline="") as file:
+        for row in DictReader(file):
+            label = row["label"]
+            if label not in colors:
+                colors[label] = color_for(label)
+            annotations.setdefault(row["image"], []).append({
+                "shape": row["shape"],
+                "points": [(float(row["x1"]), float(row["y1"])), (float(row["x2"]), float(row["y2"]))],
+                "label": label,
+                "color": colors[label]
+            })
+    return annotations
+
+class AnnotationWriter:
+    """Background worker that serializes project snapshots off the caller's thread.
+
+    Jobs are keyed by CSV path, so a newer snapshot for the same target replaces one
+    that has not been written yet. Completion callbacks are handed to post, which
+    should run them on the owning thread (the GUI passes its _post_to_tk, which
+    queues them for the Tk thread); without it they run on the writer thread.
+    """
+
+    def __init__(self, post=None):
+        self.post = post or (lambda fn: fn())
+        self._cond = threading.Condition()
+        self._pending = {}  # csv_path -> (snapshot, on_done)
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot, csv_path, on_done=None):
+        """Queue a snapshot to be written to csv_path and project.json next to it"""
+        with self._cond:
+            self._pending.pop(csv_path, None)
+            self._pending[csv_path] = (snapshot, on_done)
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every queued snapshot has been written. Returns False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                csv_path = next(iter(self._pending))
+                snapshot, on_done = self._pending.pop(csv_path)
+                self._busy = True
+            count, error = 0, None
+            try:
+                count = write_annotations_csv(csv_path, snapshot["annotations"])
+                write_project_json(os.path.join(os.path.dirname(csv_path), "project.json"), snapshot)
+            except Exception as e:
+                error = e
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+            if on_done is not None:
+                self.post(lambda: on_done(count, error))
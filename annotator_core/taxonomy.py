@@ -0,0 +1,150 @@
+"""Bulk class taxonomy edits: rename, merge, split and delete labels across a project"""
+
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+
+class TaxonomyEdit:
+    """Result of edit_taxonomy.
+
+    label_list and label_colors are the new taxonomy. annotations maps each image
+    whose boxes changed to its new annotation list, for the caller to swap in.
+    splices describe the same change for EditHistory.record: one (image, position,
+    removed, inserted) splice per run of changed boxes, so an edit holds only the
+    boxes it relabeled or deleted rather than whole annotation lists. reexport
+    holds the images whose YOLO label files change: those with changed boxes plus
+    those whose class indices moved because another class went away.
+    """
+
+    def __init__(self, label_list, label_colors):
+        self.label_list = label_list
+        self.label_colors = label_colors
+        self.annotations = {}
+        self.splices = []
+        self.reexport = set()
+        self.relabeled = 0
+        self.deleted = 0
+
+def _new_label_list(label_list, mapping, split):
+    """Label list after the mapping; split keeps the old labels and adds the targets after them"""
+    labels = []
+    for label in label_list:
+        target = mapping.get(label, label)
+        for new in ((label, target) if split else (target,)):
+            if new is not None and new not in labels:
+                labels.append(new)
+    for target in mapping.values():
+        if target is not None and target not in labels:
+            labels.append(target)  # Targets of labels missing from the list go last
+    return labels
+
+def edit_taxonomy(annotations_per_image, label_list, label_colors, mapping, color_for, images=None,
+                  images_with=None):
+    """Apply a label mapping to every box in the project in one vectorized pass.
+
+    mapping sends old labels to new ones, or to None to delete their boxes:
+    {"Cate": "cat"} renames (or merges, if "cat" already exists), several keys
+    with one value merge, and {"Cater": None} deletes. With images, a set of
+    image names, the mapping only applies to those images and the old labels
+    stay in the list, which splits a class. Labels are interned to integer ids
+    once and remapped through a lookup array; only boxes whose label changes get
+    new dicts, coloured like their new class or with color_for(label) for a new
+    one. images_with(label), the names of the images containing label (as kept by
+    a NavigationIndex), narrows the pass to images that can change; without it
+    every image is scanned. annotations_per_image is not modified.
+    """
+    mapping = {old: new for old, new in mapping.items() if old != new}
+    if any(new == "" for new in mapping.values()):
+        raise ValueError("Labels cannot be empty")
+    split = images is not None
+    new_list = _new_label_list(label_list, mapping, split)
+    colors = dict(label_colors)
+    for old, new in mapping.items():
+        color = colors.get(old) if split else colors.pop(old, None)
+        if new is not None and new not in colors:
+            colors[new] = color if color and not split else color_for(new)
+    edit = TaxonomyEdit(new_list, colors)
+
+    old_class = {label: i for i, label in enumerate(label_list)}
+    new_class = {label: i for i, label in enumerate(new_list)}
+    # Labels whose class index moves even where the mapping does not apply
+    shifted = [label for label in label_list
+               if new_class.get(label if split else mapping.get(label, label)) != old_class[label]]
+    if images_with is None:
+        names = [img_name for img_name, anns in annotations_per_image.items() if anns]
+    else:
+        touched = set(chain.from_iterable(map(images_with, chain(mapping, shifted))))
+        names = [img_name for img_name in touched if annotations_per_image.get(img_name)]
+    if not names:
+        return edit
+
+    lengths = np.fromiter((len(annotations_per_image[img_name]) for img_name in names), np.int64, len(names))
+    anns = list(chain.from_iterable(annotations_per_image[img_name] for img_name in names))
+    labels = list(map(itemgetter("label"), anns))
+    ids = {label: i for i, label in enumerate(dict.fromkeys(chain(labels, new_list)))}
+    box_ids = np.fromiter(map(ids.__getitem__, labels), np.int64, len(labels))
+
+    remap = np.arange(len(ids))
+    for old, new in mapping.items():
+        if old in ids:
+            remap[ids[old]] = -1 if new is None else ids[new]
+    new_ids = remap[box_ids]
+    if split:
+        in_split = np.fromiter((img_name in images for img_name in names), bool, len(names))
+        new_ids = np.where(np.repeat(in_split, lengths), new_ids, box_ids)
+
+    vocab = list(ids)
+    old_classes = np.array([old_class.get(label, -1) for label in vocab] + [-1])
+    new_classes = np.array([new_class.get(label, -1) for label in vocab] + [-1])
+    changed = new_ids != box_ids
+    # -1 indexes the trailing "not exported" entry, so deleted boxes compare as absent
+    exported_changed = old_classes[box_ids] != new_classes[new_ids]
+    starts = np.cumsum(lengths) - lengths  # Every scanned image has boxes, so no span is empty
+    image_changed = np.logical_or.reduceat(changed, starts)
+    reexport = np.logical_or.reduceat(changed | exported_changed, starts)
+    edit.reexport = {names[i] for i in np.flatnonzero(reexport).tolist()}
+    edit.deleted = int(np.count_nonzero(new_ids < 0))
+    edit.relabeled = int(np.count_nonzero(changed)) - edit.deleted
+
+    # New dicts only for the boxes that changed label; everything else is shared
+    flat = list(anns)
+    for j, new_id in zip(np.flatnonzero(changed).tolist(), new_ids[changed].tolist()):
+        if new_id < 0:
+            flat[j] = None
+        else:
+            label = vocab[new_id]
+            flat[j] = {**anns[j], "label": label, "color": colors[label]}
+    spans = np.stack([starts, starts + lengths], 1)[image_changed].tolist()
+    for i, (start, end) in zip(np.flatnonzero(image_changed).tolist(), spans):
+        new_anns = flat[start:end]
+        if edit.deleted and None in new_anns:
+            new_anns = [ann for ann in new_anns if ann is not None]
+        edit.annotations[names[i]] = new_anns
+    edit.splices = _changed_runs(names, starts.tolist(), anns, flat, np.flatnonzero(changed))
+    return edit
+
+def _changed_runs(names, starts, old, new, changed):
+    """Splices replacing each run of consecutive changed entries of old with its non-deleted entries of new.
+
+    old and new are the flattened boxes of every scanned image, image i starting at
+    starts[i]; deleted boxes are None in new. Positions account for the boxes that
+    earlier splices of the same image removed.
+    """
+    splices = []
+    owners = (np.searchsorted(starts, changed, side="right") - 1).tolist()
+    changed = changed.tolist()
+    k = 0
+    while k < len(changed):
+        first, owner = changed[k], owners[k]
+        if not splices or splices[-1][0] != names[owner]:
+            shift = 0
+        end = first + 1
+        k += 1
+        while k < len(changed) and changed[k] == end and owners[k] == owner:
+            end += 1
+            k += 1
+        inserted = tuple(ann for ann in new[first:end] if ann is not None)
+        splices.append((names[owner], first - starts[owner] - shift, tuple(old[first:end]), inserted))
+        shift += end - first - len(inserted)
+    return splices
@@ -0,0 +1,99 @@
+"""Background thumbnail decoding with memory and disk caches"""
+
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+from PIL import Image
+
+from .images import open_frame
+
+class ThumbnailCache:
+    """Thumbnails decoded at reduced size on a background thread and persisted to disk.
+
+    Decoded thumbnails are kept in an in-memory LRU and written as small JPEGs
+    keyed by file name, mtime and size, so a changed file gets a new thumbnail.
+    on_ready, if set, is called from the worker thread with each finished batch.
+    """
+
+    def __init__(self, image_files, cache_dir, size=128, memory_limit=2000, batch_size=32, workers=4):
+        self.image_files = image_files
+        self.cache_dir = cache_dir
+        self.size = size
+        self.memory_limit = memory_limit
+        self.batch_size = batch_size
+        self.on_ready = None
+        self._memory = OrderedDict()  # index -> PIL thumbnail, least recently used first
+        self._wanted = []  # Indices requested by the view, most urgent first
+        self._closed = False
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        os.makedirs(cache_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def get(self, index):
+        """Return the thumbnail for index if it has been decoded, otherwise None"""
+        with self._cond:
+            thumb = self._memory.get(index)
+            if thumb is not None:
+                self._memory.move_to_end(index)
+            return thumb
+
+    def request(self, indices):
+        """Replace the pending work with indices, most urgent first"""
+        with self._cond:
+            self._wanted = [idx for idx in indices if idx not in self._memory]
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._wanted = []
+            self._cond.notify_all()
+        self._pool.shutdown(wait=False)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._wanted or self._closed)
+                if self._closed:
+                    return
+                batch = self._wanted[:self.batch_size]
+                del self._wanted[:self.batch_size]
+            try:
+                thumbs = list(self._pool.map(self._load, batch))
+            except RuntimeError:
+                return  # Pool shut down while closing
+            with self._cond:
+                for idx, thumb in zip(batch, thumbs):
+                    if thumb is not None:
+                        self._memory[idx] = thumb
+                while len(self._memory) > self.memory_limit:
+                    self._memory.popitem(last=False)
+            if self.on_ready:
+                self.on_ready(batch)
+
+    def _load(self, index):
+        path, frame = self.image_files.source(index)
+        try:
+            stat = os.stat(path)
+            key = hashlib.md5(f"{self.image_files.name(index)}:{stat.st_mtime_ns}:{stat.st_size}:{self.size}".encode("utf-8")).hexdigest()
+            cache_path = os.path.join(self.cache_dir, key + ".jpg")
+            if os.path.exists(cache_path):
+                with Image.open(cache_path) as cached:
+                    cached.load()
+                    return cached.copy()
+            with open_frame(path, frame) as img:
+                img.draft("RGB", (self.size, self.size))  # Let JPEG decode at a reduced scale
+                img.thumbnail((self.size, self.size), Image.BILINEAR)
+                thumb = img.convert("RGB")
+            temp_path = cache_path + ".tmp"
+            thumb.save(temp_path, "JPEG", quality=85)
+            os.replace(temp_path, cache_path)
+            return thumb
+        except Exception as e:
+            print(f"Error creating thumbnail for {path}: {e}")
+            return None
@@ -0,0 +1,227 @@
+"""Shared work queue that lets several annotators label one dataset without overlap.
+
+Coordination goes through a SQLite database in the project's output folder.
+SQLite's file locking serialises claims, so the folder must be on a disk
+(or share) whose locks work. Finished images are appended to one shard file
+per annotator under shards/, and the shards are merged back into a single
+set of annotations by reading only the lines added since the last merge. How
+far each shard has been merged belongs to the annotations it was merged into,
+so callers save WorkQueue.offsets with them and pass it back when they reopen.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'todo',  -- todo, leased or done
+    annotator TEXT,
+    lease_until REAL,
+    done_at REAL
+);
+CREATE INDEX IF NOT EXISTS images_open ON images (state, position);
+"""
+
+ANNOTATOR_NAME = re.compile(r"^[A-Za-z0-9_-]+$")  # Names become shard file names
+
+def _chunks(items, size=500):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class WorkQueue:
+    """One annotator's connection to the shared queue in project_dir.
+
+    claim() hands out the next unclaimed images (or ones whose lease ran out)
+    under a lease of lease_seconds, in one short write transaction, so any
+    number of annotators can claim concurrently and no image is handed to two
+    of them at once. complete() appends the image's boxes to this annotator's
+    shard and marks it done, provided the lease is still held; an annotator
+    whose lease expired and was re-claimed cannot overwrite the new owner.
+
+    offsets maps shard file names to the bytes already merged into the
+    caller's annotations. It is updated in place, so the caller can save it
+    alongside them.
+    """
+
+    def __init__(self, project_dir, annotator, lease_seconds=900, offsets=None):
+        if not ANNOTATOR_NAME.match(annotator or ""):
+            raise ValueError(f"Invalid annotator name '{annotator}': use letters, digits, '_' and '-'")
+        self.project_dir = project_dir
+        self.annotator = annotator
+        self.lease_seconds = lease_seconds
+        self.shard_dir = os.path.join(project_dir, "shards")
+        self.shard_path = os.path.join(self.shard_dir, f"{annotator}.jsonl")
+        os.makedirs(self.shard_dir, exist_ok=True)
+        # Autocommit mode; every write below opens its own BEGIN IMMEDIATE transaction
+        self.db = sqlite3.connect(os.path.join(project_dir, "queue.sqlite"), timeout=60, isolation_level=None)
+        self.db.executescript(SCHEMA)
+        self.offsets = {} if offsets is None else offsets  # shard file name -> bytes already merged
+
+    def populate(self, names):
+        """Add image names to the queue in order; names already queued keep their state"""
+        with self._write():
+            start = self.db.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM images").fetchone()[0]
+            self.db.executemany("INSERT OR IGNORE INTO images (name, position) VALUES (?, ?)",
+                                ((name, start + i) for i, name in enumerate(names)))
+
+    def claim(self, count):
+        """Lease up to count open images to this annotator. Returns their names in queue order"""
+        now = time.time()
+        with self._write():
+            names = [row[0] for row in self.db.execute(
+                "SELECT name FROM images WHERE state = 'todo' OR (state = 'leased' AND lease_until < ?) "
+                "ORDER BY position LIMIT ?", (now, count))]
+            self.db.executemany("UPDATE images SET state = 'leased', annotator = ?, lease_until = ? WHERE name = ?",
+                                ((self.annotator, now + self.lease_seconds, name) for name in names))
+        return names
+
+    def claimed(self):
+        """Names this annotator holds an unexpired lease on, in queue order"""
+        return [row[0] for row in self.db.execute(
+            "SELECT name FROM images WHERE state = 'leased' AND annotator = ? AND lease_until >= ? ORDER BY position",
+            (self.annotator, time.time()))]
+
+    def renew(self):
+        """Extend every lease this annotator still holds. Returns how many were extended"""
+        now = time.time()
+        with self._write():
+            return self.db.execute(
+                "UPDATE images SET lease_until = ? WHERE state = 'leased' AND annotator = ? AND lease_until >= ?",
+                (now + self.lease_seconds, self.annotator, now)).rowcount
+
+    def complete(self, img_name, anns):
+        """Record img_name as finished with anns. Returns False if the lease was lost.
+
+        The shard append and its fsync run outside any transaction, so a slow
+        disk never holds the database lock other annotators claim through. The
+        lease is checked before the append and again when the row is marked
+        done; a line whose completion was never recorded is ignored by merge().
+        """
+        now = time.time()
+        if not self._holds_lease(img_name, now):
+            return False
+        line = json.dumps({"image": img_name, "annotator": self.annotator, "done_at": now, "annotations": [
+            {"shape": ann["shape"], "points": ann["points"], "label": ann["label"]} for ann in anns]})
+        data = (line + "\n").encode()
+        # One O_APPEND write, so two sessions under the same name never interleave lines.
+        # The line is durable before the row says done, so a crash never loses a finished image
+        fd = os.open(self.shard_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0))
+        try:
+            if os.write(fd, data) != len(data):
+                raise OSError(f"Short write to {self.shard_path}")
+            os.fsync(fd)
+            end = os.lseek(fd, 0, os.SEEK_CUR)
+        finally:
+            os.close(fd)
+        with self._write():
+            done = self.db.execute(
+                "UPDATE images SET state = 'done', done_at = ?, lease_until = NULL "
+                "WHERE name = ? AND state = 'leased' AND annotator = ? AND lease_until >= ?",
+                (now, img_name, self.annotator, time.time())).rowcount
+        if not done:
+            return False
+        # Our own line is already in memory; only skip it if nothing before it is unmerged
+        shard = os.path.basename(self.shard_path)
+        if self.offsets.get(shard, 0) == end - len(data):
+            self.offsets[shard] = end
+        return True
+
+    def release(self, names=None):
+        """Give leased images back to the queue (all of this annotator's by default)"""
+        with self._write():
+            if names is None:
+                self.db.execute("UPDATE images SET state = 'todo', annotator = NULL, lease_until = NULL "
+                                "WHERE state = 'leased' AND annotator = ?", (self.annotator,))
+                return
+            self.db.executemany("UPDATE images SET state = 'todo', annotator = NULL, lease_until = NULL "
+                                "WHERE name = ? AND state = 'leased' AND annotator = ?",
+                                ((name, self.annotator) for name in names))
+
+    def progress(self):
+        """{state: image count}, with expired leases counted as todo"""
+        counts = {"todo": 0, "leased": 0, "done": 0}
+        for state, n in self.db.execute(
+                "SELECT CASE WHEN state = 'leased' AND lease_until < ? THEN 'todo' ELSE state END, COUNT(*) "
+                "FROM images GROUP BY 1", (time.time(),)):
+            counts[state] += n
+        return counts
+
+    def merge(self, annotations, color_for):
+        """Apply shard lines added since the last merge to annotations, in place.
+
+        Only the latest completion of each image, by the annotator the queue
+        records as having finished it, is applied. Returns {name: its annotation
+        list before the merge} for the images changed, so the caller can record
+        the merge as an edit; the lists are replaced, not modified.
+        """
+        entries = []
+        for shard in sorted(os.listdir(self.shard_dir)):
+            if shard.endswith(".jsonl"):
+                entries += self._read_new_lines(shard)
+        if not entries:
+            return {}
+        accepted = set()
+        for chunk in _chunks(list({entry["image"] for entry in entries})):
+            accepted.update(self.db.execute(
+                f"SELECT name, annotator, done_at FROM images WHERE state = 'done' AND name IN "
+                f"({','.join('?' * len(chunk))})", chunk))
+        colors = {}
+        previous = {}
+        for entry in entries:
+            img_name = entry["image"]
+            if (img_name, entry["annotator"], entry["done_at"]) not in accepted:
+                continue
+            anns = []
+            for ann in entry["annotations"]:
+                label = ann["label"]
+                if label not in colors:
+                    colors[label] = color_for(label)
+                anns.append({"shape": ann["shape"], "points": [tuple(point) for point in ann["points"]],
+                             "label": label, "color": colors[label]})
+            previous.setdefault(img_name, annotations.get(img_name, ()))
+            annotations[img_name] = anns
+        return previous
+
+    def close(self):
+        self.db.close()
+
+    def _holds_lease(self, img_name, now):
+        row = self.db.execute("SELECT annotator, lease_until FROM images WHERE name = ? AND state = 'leased'",
+                              (img_name,)).fetchone()
+        return row is not None and row[0] == self.annotator and row[1] >= now
+
+    def _read_new_lines(self, shard):
+        """Complete JSON lines appended to the shard file since the last merge"""
+        offset = self.offsets.get(shard, 0)
+        entries = []
+        with open(os.path.join(self.shard_dir, shard), "rb") as f:
+            if offset > os.fstat(f.fileno()).st_size:
+                offset = 0  # The shard was replaced since the offset was saved
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Still being written; picked up by the next merge
+                offset += len(line)
+                entries.append(json.loads(line))
+        self.offsets[shard] = offset
+        return entries
+
+    def _write(self):
+        return _Transaction(self.db)
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
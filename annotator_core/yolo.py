@@ -0,0 +1,377 @@
+"""YOLO dataset import and export"""
+
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+import os
+import shutil
+
+import numpy as np
+
+from .anchors import anchor_fitness, format_anchors_yaml, kmeans_anchors
+from .dataset import split_dataset
+from .images import open_frame, read_proxy_size
+from .labelcache import cache_path, remove_label_caches, write_label_cache
+from .letterbox import (letterbox_annotations, letterbox_files, letterbox_geometry, read_manifest,
+                        write_manifest)
+
+_FICLONE = 0x40049409  # Linux ioctl for copy-on-write file clones
+
+def _reflink(src, dst):
+    """Clone src into dst with a copy-on-write reflink (Linux only)"""
+    import fcntl
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+
+def _extract_frame(src, dst, frame):
+    """Write one frame of a multi-frame file to dst as a PNG, unless dst is newer than src"""
+    if os.path.exists(dst) and os.stat(dst).st_mtime >= os.stat(src).st_mtime:
+        return "existing"
+    with open_frame(src, frame) as img:
+        img.save(dst + ".tmp", "PNG")
+    os.replace(dst + ".tmp", dst)
+    return "extracted"
+
+def materialize_file(src, dst, frame=0):
+    """Place src at dst as a hardlink, reflink or plain copy. Returns the method used"""
+    if frame:
+        return _extract_frame(src, dst, frame)
+    if os.path.lexists(dst):
+        try:
+            if os.path.samefile(src, dst):
+                return "existing"
+            src_stat, dst_stat = os.stat(src), os.stat(dst)
+            if src_stat.st_size == dst_stat.st_size and int(src_stat.st_mtime) == int(dst_stat.st_mtime):
+                return "existing"
+        except OSError:
+            pass
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        _reflink(src, dst)
+        shutil.copystat(src, dst)
+        return "reflink"
+    except (OSError, ImportError):
+        if os.path.exists(dst):
+            os.remove(dst)
+    shutil.copy2(src, dst)
+    return "copy"
+
+def materialize_files(jobs, max_workers=None):
+    """Materialize (src, dst[, frame]) jobs in parallel. Returns a Counter of methods used"""
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return Counter(pool.map(lambda job: materialize_file(*job), jobs))
+
+def remove_stale_files(directory, keep):
+    """Delete files in directory whose names are not in keep"""
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name not in keep:
+            os.remove(entry.path)
+
+def find_yolo_labels(*roots):
+    """Find YOLO label directories (flat or split into train/val) under the given folders.
+
+    Returns (label_dirs, classes_path); classes_path is None if no classes.txt was found.
+    """
+    label_dirs, classes_path, seen = [], None, set()
+    for root in roots:
+        labels_dir = os.path.normpath(os.path.join(root, "labels"))
+        if labels_dir in seen or not os.path.isdir(labels_dir):
+            continue
+        seen.add(labels_dir)
+        for candidate in (os.path.join(labels_dir, "classes.txt"), os.path.join(root, "classes.txt")):
+            if classes_path is None and os.path.isfile(candidate):
+                classes_path = candidate
+        label_dirs.append(labels_dir)
+        for split in ("train", "val"):
+            if os.path.isdir(os.path.join(labels_dir, split)):
+                label_dirs.append(os.path.join(labels_dir, split))
+    return label_dirs, classes_path
+
+def read_class_names(classes_path):
+    with open(classes_path, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def parse_yolo_label_file(label_path, img_w, img_h, class_names):
+    """Parse a YOLO label file into annotations in display proxy coordinates.
+
+    Segmentation polygons are reduced to their bounding boxes.
+    """
+    anns = []
+    with open(label_path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            class_idx = int(float(parts[0]))
+            coords = [float(v) for v in parts[1:]]
+            if len(coords) == 4:
+                center_x, center_y, width, height = coords
+                x1, x2 = (center_x - width / 2) * img_w, (center_x + width / 2) * img_w
+                y1, y2 = (center_y - height / 2) * img_h, (center_y + height / 2) * img_h
+            else:
+                xs, ys = coords[0::2], coords[1::2]
+                x1, x2 = min(xs) * img_w, max(xs) * img_w
+                y1, y2 = min(ys) * img_h, max(ys) * img_h
+            if 0 <= class_idx < len(class_names):
+                label = class_names[class_idx]
+            else:
+                label = f"class_{class_idx}"
+            anns.append({"shape": "Rectangle", "points": [(x1, y1), (x2, y2)], "label": label})
+    return anns
+
+def import_yolo_labels(image_files, label_dirs, class_names, max_workers=None):
+    """Read YOLO labels for a DatasetIndex in parallel into a dict keyed by image name"""
+    label_paths = {}
+    for labels_dir in label_dirs:
+        for entry in os.scandir(labels_dir):
+            if entry.is_file() and entry.name.endswith(".txt") and entry.name != "classes.txt":
+                label_paths.setdefault(entry.name[:-4], entry.path)
+
+    jobs = []
+    for idx in range(len(image_files)):
+        base_name = os.path.splitext(image_files.export_name(idx))[0]
+        if base_name in label_paths:
+            jobs.append((idx, label_paths[base_name]))
+
+    def load(job):
+        idx, label_path = job
+        img_path, frame = image_files.source(idx)
+        try:
+            img_w, img_h = read_proxy_size(img_path, frame)
+            return image_files.name(idx), parse_yolo_label_file(label_path, img_w, img_h, class_names)
+        except Exception as e:
+            print(f"Error importing labels for {img_path}: {e}")
+            return None
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(result for result in pool.map(load, jobs) if result is not None)
+
+def label_rows(anns, img_w, img_h, class_ids, skipped=None):
+    """(class, center x, center y, width, height) YOLO rows for one image's boxes.
+
+    Boxes whose label is not in class_ids have no class to export and are left
+    out; pass a Counter as skipped to have them counted per label.
+    """
+    rows = []
+    for ann in anns:
+        (x1, y1), (x2, y2) = ann["points"]
+
+        # Convert to YOLO format (center_x, center_y, width, height)
+        # All values are normalized between 0 and 1
+        center_x = (x1 + x2) / (2 * img_w)
+        center_y = (y1 + y2) / (2 * img_h)
+        width = abs(x2 - x1) / img_w
+        height = abs(y2 - y1) / img_h
+
+        class_idx = class_ids.get(ann["label"])
+        if class_idx is None:
+            if skipped is not None:
+                skipped[ann["label"]] += 1
+            continue
+        rows.append((class_idx, center_x, center_y, width, height))
+    return rows
+
+def write_label_file(path, anns, img_w, img_h, class_ids, skipped=None):
+    """Write one image's boxes as a YOLO label file. Returns the rows written (see label_rows)"""
+    rows = label_rows(anns, img_w, img_h, class_ids, skipped)
+    with open(path, "w") as f:
+        f.writelines(f"{class_idx} {center_x:.6f} {center_y:.6f} {width:.6f} {height:.6f}\n"
+                     for class_idx, center_x, center_y, width, height in rows)
+    return rows
+
+def _exported_labels(anns, img_w, img_h, resize):
+    """(annotations, width, height) to write a label file from, in the exported image's space"""
+    if resize is None:
+        return anns, img_w, img_h
+    geometry = letterbox_geometry(img_w, img_h, resize["imgsz"], resize["mode"])
+    return letterbox_annotations(anns, img_w, img_h, geometry), geometry[4], geometry[5]
+
+def _write_classes(o_path, label_list):
+    for classes_path in (os.path.join(o_path, "classes.txt"), os.path.join(o_path, "labels", "classes.txt")):
+        with open(classes_path, "w") as f:
+            for label in label_list:
+                f.write(f"{label}\n")
+
+def _names_yaml(label_list):
+    return ["names:\n"] + [f"  {idx}: {label}\n" for idx, label in enumerate(label_list)]
+
+def export_yolo(o_path, image_files, annotations_per_image, label_list, image_size, val_split=0.2,
+                groups=None, anchor_count=9, anchor_imgsz=640, train_imgsz=None, resize_mode="letterbox",
+                image_format="jpg"):
+    """Write a YOLO dataset tree (images/, labels/, classes.txt, config.yaml) under o_path.
+
+    image_size(index) returns the display proxy size the annotations are stored in.
+    groups maps image names to duplicate clusters that must share a split. Only images
+    with an annotation entry are exported; an empty list is a background image.
+    With train_imgsz, images are resized (or letterboxed, see RESIZE_MODES) to that
+    size in a process pool and saved as image_format instead of being linked, and
+    the labels are written for the resized images; outputs newer than their source
+    are kept unless the resize settings changed since the last export.
+    Each split's labels and image shapes also go to labels/{split}.labelcache (see
+    labelcache). Returns a summary dict with the split sizes, materialize counts,
+    anchor fitness and, as skipped_labels, a Counter of the boxes left out because
+    their label is not in label_list.
+    """
+    # Ensure the YOLO directory tree exists
+    images_dir = os.path.join(o_path, "images")
+    labels_dir = os.path.join(o_path, "labels")
+    for split in ("train", "val"):
+        os.makedirs(os.path.join(images_dir, split), exist_ok=True)
+        os.makedirs(os.path.join(labels_dir, split), exist_ok=True)
+
+    # Create classes.txt in output and labels directory
+    _write_classes(o_path, label_list)
+
+    class_ids = {label: idx for idx, label in enumerate(label_list)}
+    resize = None
+    if train_imgsz:
+        resize = {"imgsz": train_imgsz, "mode": resize_mode, "format": image_format}
+
+    annotated = [(img_idx, image_files[img_idx]) for img_idx, img_name in enumerate(image_files.names)
+                 if img_name in annotations_per_image]
+    # Split by duplicate cluster so near-duplicates never straddle train and val
+    groups = groups or {}
+    names = [image_files.name(img_idx) for img_idx, _ in annotated]
+    group_splits = split_dataset({groups.get(name, name) for name in names}, val_split)
+    splits = {name: group_splits[groups.get(name, name)] for name in names}
+
+    link_jobs = []
+    resize_jobs = []
+    box_sizes = []  # Box (w, h) in pixels at the anchor input size, per image
+    kept_images = {"train": set(), "val": set()}
+    kept_labels = {"train": set(), "val": set()}
+    cache_entries = {"train": [], "val": []}  # (image file name, shape or None, label rows)
+    skipped = Counter()  # Boxes per label missing from label_list
+
+    # Process each image
+    for img_idx, img_path in annotated:
+        img_name = image_files.name(img_idx)
+        file_name = image_files.export_name(img_idx)
+        base_name = os.path.splitext(file_name)[0]
+        split = splits[img_name]
+
+        # Annotations are stored in display proxy coordinates
+        img_w, img_h = image_size(img_idx)
+        anns = annotations_per_image.get(img_name, [])
+        if anns and anchor_count:
+            coords = np.array([ann["points"] for ann in anns], np.float64).reshape(-1, 4)
+            # Letterboxing scales the long side to the input size
+            box_sizes.append(np.abs(coords[:, 2:] - coords[:, :2]) * (anchor_imgsz / max(img_w, img_h)))
+
+        # Create YOLO format file in the split's labels directory
+        rows = write_label_file(os.path.join(labels_dir, split, f"{base_name}.txt"),
+                                *_exported_labels(anns, img_w, img_h, resize), class_ids, skipped)
+
+        if resize is None:
+            link_jobs.append((img_path, os.path.join(images_dir, split, file_name), image_files.frame(img_idx)))
+            shape = None  # Original size, read from the header when the label cache is written
+        else:
+            file_name = f"{base_name}.{image_format}"
+            geometry = letterbox_geometry(img_w, img_h, train_imgsz, resize_mode)
+            resize_jobs.append((img_path, os.path.join(images_dir, split, file_name), geometry,
+                                image_files.frame(img_idx)))
+            shape = geometry[4:]
+        cache_entries[split].append((file_name, shape, rows))
+        kept_images[split].add(file_name)
+        kept_labels[split].add(f"{base_name}.txt")
+
+    # Drop files left over from a previous export whose image moved split or lost its annotations
+    for split in ("train", "val"):
+        remove_stale_files(os.path.join(images_dir, split), kept_images[split])
+        remove_stale_files(os.path.join(labels_dir, split), kept_labels[split])
+
+    # Hardlink (or reflink/copy) the images into place, or resize them for training
+    methods = materialize_files(link_jobs)
+    if resize is not None:
+        methods.update(letterbox_files(resize_jobs, force=read_manifest(o_path) != resize))
+    write_manifest(o_path, resize)
+
+    # Labels and image shapes in one mappable file per split, so loaders skip parsing
+    for split, entries in cache_entries.items():
+        names, shapes, rows = zip(*entries) if entries else ((), (), ())
+        write_label_cache(cache_path(o_path, split), os.path.join(images_dir, split),
+                          os.path.join(labels_dir, split), names, shapes, rows)
+
+    anchors = None
+    if box_sizes:
+        wh = np.concatenate(box_sizes)
+        anchors = kmeans_anchors(wh, anchor_count)
+        if anchors is not None:
+            avg_iou, recall = anchor_fitness(wh, anchors)
+
+    # --- Write config.yaml for YOLO ---
+    config_path = os.path.join(o_path, "config.yaml")
+    with open(config_path, "w") as f:
+        f.write(f"path: {o_path}\n")
+        f.write("train: images/train\n")
+        f.write("val: images/val\n\n")
+        f.writelines(_names_yaml(label_list))
+        if anchors is not None:
+            f.write("\n")
+            f.writelines(format_anchors_yaml(anchors, avg_iou, recall, anchor_imgsz))
+    # --- End config.yaml ---
+
+    return {
+        "train": len(kept_images["train"]),
+        "val": len(kept_images["val"]),
+        "methods": methods,
+        "skipped_labels": skipped,
+        "anchors": None if anchors is None else {"count": len(anchors), "imgsz": anchor_imgsz,
+                                                 "avg_iou": avg_iou, "recall": recall},
+    }
+
+def update_yolo_labels(o_path, image_files, annotations_per_image, label_list, image_size, names, max_workers=None):
+    """Bring an existing YOLO export in line with a new label list without re-exporting it.
+
+    Rewrites classes.txt, the names block of config.yaml and the label files of
+    the given images (those whose class indices changed), in whichever split they
+    were exported to; images that were never exported are skipped. The label
+    caches no longer match and are removed until the next export. Returns the
+    number of label files rewritten, or None if o_path holds no YOLO export.
+    """
+    config_path = os.path.join(o_path, "config.yaml")
+    if not os.path.isfile(config_path):
+        return None
+    _write_classes(o_path, label_list)
+    remove_label_caches(o_path)
+    with open(config_path, "r") as f:
+        lines = f.readlines()
+    if "names:\n" in lines:
+        start = end = lines.index("names:\n")
+        end += 1
+        while end < len(lines) and lines[end].startswith("  "):
+            end += 1
+        lines[start:end] = _names_yaml(label_list)
+        with open(config_path, "w") as f:
+            f.writelines(lines)
+
+    class_ids = {label: idx for idx, label in enumerate(label_list)}
+    labels_dir = os.path.join(o_path, "labels")
+    resize = read_manifest(o_path)
+
+    def rewrite(img_name):
+        idx = image_files.index_of(img_name)
+        if idx is None:
+            return False
+        base_name = os.path.splitext(image_files.export_name(idx))[0]
+        for split in ("train", "val"):
+            label_path = os.path.join(labels_dir, split, f"{base_name}.txt")
+            if os.path.exists(label_path):
+                img_w, img_h = image_size(idx)
+                anns = annotations_per_image.get(img_name, [])
+                write_label_file(label_path, *_exported_labels(anns, img_w, img_h, resize), class_ids)
+                return True
+        return False
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return sum(pool.map(rewrite, names))
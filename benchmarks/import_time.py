@@ -0,0 +1,94 @@
+"""Import-time budget for the core package and the GUI module, and GUI startup.
+
+    python benchmarks/import_time.py [--runs N]
+
+Each import runs in a fresh interpreter with -X importtime, and the best of N
+runs is compared against its budget. Heavy dependencies that a module must not
+pull in at import time are checked too. Startup is timed in a fresh interpreter
+from the first import until the setup screen has been drawn; it is skipped
+without a display. Exits non-zero when anything is over budget.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> (budget in ms, modules it must not import)
+BUDGETS = {
+    "annotator_core": (10, ("numpy", "PIL", "tkinter")),
+    "annotator_core.dataset": (25, ("numpy", "PIL", "tkinter")),
+    "annotator_core.store": (30, ("numpy", "PIL", "tkinter")),
+    "annotator_core.__main__": (50, ("numpy", "PIL", "tkinter")),
+    "improved_image_annotator": (150, ("numpy",)),
+}
+STARTUP_BUDGET = (400, ("numpy",))  # Until the setup screen is drawn
+
+STARTUP_CODE = """
+import sys, time
+start = time.perf_counter()
+import tkinter
+import improved_image_annotator
+try:
+    root = tkinter.Tk()
+except tkinter.TclError:
+    sys.exit(3)
+app = improved_image_annotator.ImageAnnotator(root)
+root.update()
+elapsed = time.perf_counter() - start
+print(int(elapsed * 1e6), ','.join(sorted(m for m in ('numpy', 'PIL', 'tkinter') if m in sys.modules)))
+root.destroy()
+"""
+
+def measure(module):
+    """Cumulative import time of module in microseconds, and the heavy modules it loaded"""
+    code = f"import sys, {module}; print(','.join(sorted(m for m in ('numpy', 'PIL', 'tkinter') if m in sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative = int(parts[1])
+    loaded = set(filter(None, result.stdout.strip().split(",")))
+    return cumulative, loaded
+
+def measure_startup():
+    """Microseconds until the setup screen is drawn and the heavy modules loaded, or None without a display"""
+    result = subprocess.run([sys.executable, "-c", STARTUP_CODE], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode == 3:
+        return None
+    result.check_returncode()
+    elapsed, _, loaded = result.stdout.splitlines()[-1].partition(" ")
+    return int(elapsed), set(filter(None, loaded.split(",")))
+
+def check(name, results, budget_ms, forbidden):
+    """Print the best of results against the budget. Returns whether it passed"""
+    best_ms = min(us for us, _ in results) / 1000
+    leaked = sorted(set(forbidden) & results[0][1])
+    ok = best_ms <= budget_ms and not leaked
+    note = f"  imports {', '.join(leaked)}" if leaked else ""
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<28} {best_ms:7.1f} ms (budget {budget_ms} ms){note}")
+    return ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module, (budget_ms, forbidden) in BUDGETS.items():
+        failed |= not check(module, [measure(module) for _ in range(args.runs)], budget_ms, forbidden)
+
+    first = measure_startup()
+    if first is None:
+        print(f"skip {'startup to setup screen':<28} no display")
+    else:
+        results = [first] + [measure_startup() for _ in range(args.runs - 1)]
+        failed |= not check("startup to setup screen", results, *STARTUP_BUDGET)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
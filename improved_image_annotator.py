@@ -1,13 +1,272 @@
 from tkinter import *
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 from PIL import ImageTk, Image
-from csv import DictWriter, DictReader
 import os
+from fnmatch import fnmatchcase
+import getpass
 import random
+import re
 import json
 from datetime import datetime
+import math
+import multiprocessing
+import queue
 import threading
-import time
+
+# Data logic lives in the headless core; its submodules load on first use
+import annotator_core as core
+
+class ThumbnailGrid:
+    """Virtualized thumbnail grid window; only the visible cells exist as canvas items"""
+
+    PAD = 6
+    CAPTION_HEIGHT = 16
+
+    def __init__(self, app):
+        self.app = app
+        self.cache = core.ThumbnailCache(app.image_files, os.path.join(app.o_path, ".thumbnails"))
+        self.cache.on_ready = self._on_thumbnails_ready
+        self.cell_w = self.cache.size + self.PAD * 2
+        self.cell_h = self.cache.size + self.PAD * 2 + self.CAPTION_HEIGHT
+        self.top_row = 0.0
+        self.photos = {}  # index -> PhotoImage for the cells currently drawn
+        self._redraw_pending = False
+
+        self.window = Toplevel(app.root)
+        self.window.title("Thumbnails")
+        self.window.geometry("900x700")
+        self.window.grid_rowconfigure(0, weight=1)
+        self.window.grid_columnconfigure(0, weight=1)
+        self.canvas = Canvas(self.window, bg=app.theme["secondary"], highlightthickness=0)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = Scrollbar(self.window, orient=VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.canvas.bind("<Configure>", lambda e: self.refresh())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll(-1 * (e.delta // 120)))
+        self.canvas.bind("<Button-4>", lambda e: self.scroll(-1))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll(1))
+        self.window.bind("<Prior>", lambda e: self.scroll(-self._visible_rows()))
+        self.window.bind("<Next>", lambda e: self.scroll(self._visible_rows()))
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.window.update_idletasks()
+        self.scroll_to(app.current)
+
+    def close(self):
+        self.cache.close()
+        self.window.destroy()
+        self.app.thumbnail_grid = None
+
+    def refresh(self):
+        """Schedule a redraw, coalescing bursts of scroll and resize events"""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.window.after_idle(self._redraw)
+
+    def scroll(self, rows):
+        self.top_row += rows
+        self.refresh()
+
+    def scroll_to(self, index):
+        """Scroll so the row holding index is roughly centred"""
+        row = index // self._columns()
+        self.top_row = row - max(0, self._visible_rows() - 1) / 2
+        self.refresh()
+
+    def _columns(self):
+        return max(1, self.canvas.winfo_width() // self.cell_w)
+
+    def _visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.cell_h)
+
+    def _on_scrollbar(self, *args):
+        total_rows = math.ceil(len(self.app.image_files) / self._columns())
+        if args[0] == "moveto":
+            self.top_row = float(args[1]) * total_rows
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.top_row += step * self._visible_rows() if args[2] == "pages" else step
+        self.refresh()
+
+    def _on_thumbnails_ready(self, batch):
+        # Called from the cache worker thread; hand the redraw to the Tk thread
+        self.app._post_to_tk(self._refresh_if_open)
+
+    def _refresh_if_open(self):
+        # Thumbnails can finish after the window was closed
+        if self.window.winfo_exists():
+            self.refresh()
+
+    def _on_click(self, event):
+        cols = self._columns()
+        col = event.x // self.cell_w
+        row = int(math.floor(self.top_row + event.y / self.cell_h))
+        idx = row * cols + col
+        if col < cols and 0 <= idx < len(self.app.image_files):
+            self.app.jump_to_image(idx)
+
+    def _redraw(self):
+        self._redraw_pending = False
+        if not self.window.winfo_exists():
+            return
+        total = len(self.app.image_files)
+        cols = self._columns()
+        total_rows = max(1, math.ceil(total / cols))
+        visible_rows = self.canvas.winfo_height() / self.cell_h
+        self.top_row = min(max(0.0, self.top_row), max(0.0, total_rows - visible_rows))
+
+        first_row = int(self.top_row)
+        y_offset = -(self.top_row - first_row) * self.cell_h
+        first = first_row * cols
+        last = min(total, (first_row + math.ceil(visible_rows) + 1) * cols)
+
+        nav_index = self.app.nav_index
+        size = self.cache.size
+        photos = {}
+        self.canvas.delete("all")
+        for idx in range(first, last):
+            row, col = divmod(idx - first, cols)
+            x = col * self.cell_w + self.PAD
+            y = y_offset + row * self.cell_h + self.PAD
+
+            thumb = self.cache.get(idx)
+            if thumb is not None:
+                photo = self.photos.get(idx) or ImageTk.PhotoImage(thumb)
+                photos[idx] = photo
+                self.canvas.create_image(x + (size - thumb.width) // 2, y + (size - thumb.height) // 2,
+                                         image=photo, anchor=NW)
+            else:
+                self.canvas.create_rectangle(x, y, x + size, y + size, fill=self.app.theme["dark"], outline="")
+
+            if idx == self.app.current:
+                self.canvas.create_rectangle(x - 3, y - 3, x + size + 3, y + size + 3,
+                                             outline=self.app.theme["warning"], width=3)
+
+            # Annotation-count badge
+            count = nav_index.box_counts[idx] if nav_index else 0
+            badge_color = self.app.theme["success"] if count else self.app.theme["dark"]
+            self.canvas.create_rectangle(x + size - 26, y, x + size, y + 16, fill=badge_color, outline="")
+            self.canvas.create_text(x + size - 13, y + 8, text=str(count), fill="white", font=("Arial", 8, "bold"))
+
+            name = self.app.image_files.name(idx)
+            if len(name) > 20:
+                name = name[:9] + "…" + name[-10:]
+            self.canvas.create_text(x + size // 2, y + size + self.CAPTION_HEIGHT // 2 + 2, text=name,
+                                    fill=self.app.theme["light"], font=("Arial", 8))
+        self.photos = photos  # Release PhotoImages of cells that scrolled out of view
+
+        # Decode the visible cells first, then the next screenful
+        prefetch_end = min(total, last + (last - first))
+        self.cache.request([idx for idx in range(first, prefetch_end) if idx not in photos])
+
+        self.scrollbar.set(self.top_row / total_rows, min(1.0, (self.top_row + visible_rows) / total_rows))
+
+class StatsWindow:
+    """Bar charts of the project statistics, redrawn from DatasetStats as annotations change"""
+
+    ROW_HEIGHT = 16
+    LABEL_WIDTH = 110
+    MAX_PER_IMAGE_BINS = 30
+
+    def __init__(self, app):
+        self.app = app
+        self._redraw_pending = False
+
+        self.window = Toplevel(app.root)
+        self.window.title("Statistics")
+        self.window.geometry("520x700")
+        self.window.grid_rowconfigure(1, weight=1)
+        self.window.grid_columnconfigure(0, weight=1)
+        self.summary = ttk.Label(self.window, anchor="w", justify=LEFT)
+        self.summary.grid(row=0, column=0, columnspan=2, sticky="ew", padx=10, pady=5)
+        self.canvas = Canvas(self.window, bg=app.theme["secondary"], highlightthickness=0)
+        self.canvas.grid(row=1, column=0, sticky="nsew")
+        scrollbar = Scrollbar(self.window, orient=VERTICAL, command=self.canvas.yview)
+        scrollbar.grid(row=1, column=1, sticky="ns")
+        self.canvas.config(yscrollcommand=scrollbar.set)
+        self.canvas.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1 * (e.delta // 120), "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
+        self.canvas.bind("<Configure>", lambda e: self.refresh())
+
+        buttons = ttk.Frame(self.window)
+        buttons.grid(row=2, column=0, columnspan=2, sticky="e", padx=10, pady=5)
+        ttk.Button(buttons, text="Export JSON", command=lambda: self.export("json")).pack(side=LEFT, padx=5)
+        ttk.Button(buttons, text="Export CSV", command=lambda: self.export("csv")).pack(side=LEFT, padx=5)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def close(self):
+        self.window.destroy()
+        self.app.stats_window = None
+
+    def refresh(self):
+        """Schedule a redraw, coalescing bursts of annotation changes"""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.window.after_idle(self._redraw)
+
+    def export(self, fmt):
+        path = filedialog.asksaveasfilename(parent=self.window, initialdir=self.app.o_path or None,
+                                            initialfile=f"stats.{fmt}", defaultextension=f".{fmt}",
+                                            filetypes=[(fmt.upper(), f"*.{fmt}")])
+        if not path:
+            return
+        report = self.app.stats.report(self.app.label_list)
+        try:
+            (core.write_stats_json if fmt == "json" else core.write_stats_csv)(path, report)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export statistics: {str(e)}", parent=self.window)
+
+    def _redraw(self):
+        self._redraw_pending = False
+        if not self.window.winfo_exists():
+            return
+        report = self.app.stats.report(self.app.label_list)
+        self.summary.config(text=(
+            f"Images: {report['images']}    Annotated: {report['annotated_images']} "
+            f"({report['coverage']:.1%})    Unannotated: {report['unannotated_images']}\n"
+            f"Boxes: {report['boxes']}    Mean boxes per image: {report['boxes_per_image_mean']:.2f}"))
+
+        per_image = report["boxes_per_image_counts"]
+        if len(per_image) > self.MAX_PER_IMAGE_BINS:
+            per_image = per_image[:self.MAX_PER_IMAGE_BINS - 1] + [sum(per_image[self.MAX_PER_IMAGE_BINS - 1:])]
+            per_image_names = [str(n) for n in range(len(per_image) - 1)] + [f"{len(per_image) - 1}+"]
+        else:
+            per_image_names = [str(n) for n in range(len(per_image))]
+        size_edges = report["box_size_edges"]
+        aspect_edges = report["aspect_log2_edges"]
+        sections = [
+            ("Boxes per class", list(report["classes"].items()),
+             [self.app.get_label_color(label) for label in report["classes"]]),
+            ("Box size (sqrt area, px)",
+             [(core.bin_label(size_edges, i), n) for i, n in enumerate(report["box_size_counts"])], None),
+            ("Aspect ratio (log2 w/h)",
+             [(core.bin_label(aspect_edges, i), n) for i, n in enumerate(report["aspect_counts"])], None),
+            ("Boxes per image", list(zip(per_image_names, per_image)), None),
+        ]
+
+        self.canvas.delete("all")
+        width = max(200, self.canvas.winfo_width())
+        bar_width = width - self.LABEL_WIDTH - 70
+        light = self.app.theme["light"]
+        y = 10
+        for title, rows, colors in sections:
+            self.canvas.create_text(10, y, text=title, anchor=NW, fill=light, font=("Arial", 10, "bold"))
+            y += self.ROW_HEIGHT + 4
+            peak = max((n for _, n in rows), default=0) or 1
+            for i, (name, n) in enumerate(rows):
+                color = colors[i] if colors else self.app.theme["primary"]
+                self.canvas.create_text(10, y, text=name, anchor=NW, fill=light, font=("Arial", 8))
+                x1 = self.LABEL_WIDTH
+                x2 = x1 + max(1, bar_width * n / peak) if n else x1
+                self.canvas.create_rectangle(x1, y + 2, x2, y + self.ROW_HEIGHT - 3, fill=color, outline="")
+                self.canvas.create_text(x2 + 5, y, text=str(n), anchor=NW, fill=light, font=("Arial", 8))
+                y += self.ROW_HEIGHT
+            y += 10
+        self.canvas.config(scrollregion=(0, 0, width, y))
 
 class ImageAnnotator:
     def __init__(self, root):
@@ -25,8 +284,10 @@ class ImageAnnotator:
         self.current = 0
         self.i_path = ""
         self.o_path = ""
-        self.images = []
-        self.image_files = []
+        self.images = core.ImageCache(self._decode_image)
+        self.prefetcher = None  # Decodes images around the current one on background threads
+        self.pending_propagation = None  # Image index to auto-propagate onto once it is decoded
+        self.image_files = core.DatasetIndex()
         self.canvas = None
         self.annotations_per_image = {}
         self.label_list = []
@@ -37,12 +298,53 @@ class ImageAnnotator:
         self.drag_start_x = 0
         self.drag_start_y = 0
         self.is_dragging = False
-        self.undo_stack = []
+        self.undo_budget_mb = 64  # Memory the undo/redo history may hold before dropping old edits
+        self.journal_edits = True  # Journal edits next to the project so a crash loses none of them
+        self.history = core.EditHistory(self.undo_budget_mb * 1024 * 1024)
+        self.journal_seq = 0  # Last journaled change the loaded project file already contains
+        self.work_queue = None  # Shared multi-annotator queue, when this session has joined one
+        self.queue_offsets = {}  # Queue shard file -> bytes merged into the annotations; saved with them
+        self.queue_batch_size = 20  # Images claimed from the work queue at a time
+        self.lease_minutes = 15  # Claimed images go back to the queue if not renewed within this
+        self.lease_timer = None
         self.autosave_timer = None
         self.last_save_time = None
+        self.tk_calls = queue.SimpleQueue()  # Callbacks from worker threads, run by _drain_tk_calls
+        self._drain_tk_calls()
+        self.writer = core.AnnotationWriter(post=self._post_to_tk)
+        self.duplicate_index = None
+        self.nav_index = None
+        self.bulk_refresh_images = 500  # Edits touching more images rebuild the indexes in one pass
+        self.annotation_changes = 0  # Bumped on every annotation change; background work checks it for staleness
+        self.rebuild_changes = None  # Images edited during an index rebuild, replayed onto its result
+        self.rebuild_superseded = False  # A bulk edit landed during the rebuild, which has to start over
+        self.taxonomy_running = False
+        self.thumbnail_grid = None
+        self.stats = None  # DatasetStats, created when a project loads since it imports NumPy
+        self.proxy_sizes = {}  # index -> display proxy size, filled from image headers
+        self.stats_window = None
+        self.preannotator = None
+        self.detector_spec = "test"  # Registered detector name or 'module:function'
+        self.skip_duplicates = BooleanVar(value=False)
+        self.auto_propagate = BooleanVar(value=False)
+        self.box_grid = None  # Spatial index over the current image's boxes
+        self.box_grid_image = None
+        self.selected_ann = None
+        self.hovered_ann = None
+        self.edit_mode = None  # "move" or a resize handle ("nw", "n", ..., "w") while dragging
+        self.edit_start = None
+        self.view_transform = (0, 0, 1.0)  # Canvas offset and scale of the displayed image
+        self.raster_threshold = 500  # Boxes per image above which annotations are drawn as one raster layer
+        self.annotation_versions = {}  # Image name -> change counter, used to key the overlay cache
+        self.overlay_cache = {}
         self.display_scale = 1.0
-        self.total_loaded = 0
         self.autosave_interval = 1  # Default autosave interval in minutes
+        self.val_split = 0.2  # Fraction of annotated images exported to the val split
+        self.anchor_count = 9  # Anchors written to config.yaml on export, 0 to skip
+        self.anchor_imgsz = 640  # Training input size the anchors are computed for
+        self.train_imgsz = 0  # Export images resized to this training size, 0 to link the originals
+        self.resize_mode = "letterbox"
+        self.export_image_format = "jpg"
         
         # Define theme colors
         self.theme = {
@@ -217,26 +519,24 @@ Image Annotator Pro - Quick Help
             self.label_list = project_data.get('labels', [])
             self.annotations_per_image = project_data.get('annotations', {})
             self.label_colors = project_data.get('label_colors', {})
+            self.val_split = project_data.get('val_split', self.val_split)
+            self.anchor_count = project_data.get('anchor_count', self.anchor_count)
+            self.anchor_imgsz = project_data.get('anchor_imgsz', self.anchor_imgsz)
+            self.train_imgsz = project_data.get('train_imgsz', self.train_imgsz)
+            self.resize_mode = project_data.get('resize_mode', self.resize_mode)
+            self.export_image_format = project_data.get('export_image_format', self.export_image_format)
+            self.undo_budget_mb = project_data.get('undo_budget_mb', self.undo_budget_mb)
+            self.journal_edits = project_data.get('journal_edits', self.journal_edits)
+            self.detector_spec = project_data.get('detector', self.detector_spec)
             
             # Set current_label to first label if available
             if self.label_list:
                 self.current_label.set(self.label_list[0])
             
-            # Find last annotated image
-            last_annotated = None
-            last_time = None
-            for img_name, anns in self.annotations_per_image.items():
-                for ann in anns:
-                    if 'timestamp' in ann:
-                        t = ann['timestamp']
-                    else:
-                        t = None
-                    if t and (last_time is None or t > last_time):
-                        last_time = t
-                        last_annotated = img_name
+            # Resume where the last session stopped, falling back to the last annotated image
+            last_annotated = project_data.get('cursor')
             if not last_annotated and self.annotations_per_image:
-                # Fallback: just use the last key
-                last_annotated = list(self.annotations_per_image.keys())[-1]
+                last_annotated = next(reversed(self.annotations_per_image))
             
             # Update UI with loaded data
             self.input_entry.delete(0, END)
@@ -257,11 +557,10 @@ Image Annotator Pro - Quick Help
             # After images are loaded, jump to last annotated image
             if last_annotated:
                 def jump_to_last():
-                    for idx, path in enumerate(self.image_files):
-                        if os.path.basename(path) == last_annotated:
-                            self.current = idx
-                            self.show_image(self.current)
-                            break
+                    idx = self.image_files.index_of(last_annotated)
+                    if idx is not None:
+                        self.current = idx
+                        self.show_image(self.current)
                 self.root.after(1000, jump_to_last)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load project: {str(e)}")
@@ -328,6 +627,16 @@ Image Annotator Pro - Quick Help
         ttk.Button(nav_frame, text="▶", width=3, command=lambda: self.navigate_image(1), style="Nav.TButton").pack(side=LEFT, padx=2)
         ttk.Button(nav_frame, text="⏭", width=3, command=lambda: self.navigate_image_to(-1), style="Nav.TButton").pack(side=LEFT, padx=2)
         
+        # Indexed jumps
+        jump_button = ttk.Menubutton(nav_frame, text="Jump")
+        jump_menu = Menu(jump_button, tearoff=0)
+        jump_menu.add_command(label="Next Unannotated (U)", command=self.jump_to_unannotated)
+        jump_menu.add_command(label="Next With Current Label (L)", command=self.jump_to_label)
+        jump_menu.add_command(label="Next With More Than N Boxes...", command=self.jump_to_min_boxes)
+        jump_menu.add_command(label="Find By Filename... (Ctrl+F)", command=self.jump_to_filename)
+        jump_button.config(menu=jump_menu)
+        jump_button.pack(side=LEFT, padx=2)
+        
         # Label selection
         label_frame = ttk.Frame(self.toolbar)
         label_frame.pack(side=LEFT, padx=10)
@@ -353,6 +662,12 @@ Image Annotator Pro - Quick Help
         
         ttk.Button(tool_frame, text="Clear All", command=self.clear_all_annotations, style="Nav.TButton").pack(side=LEFT, padx=5)
         ttk.Button(tool_frame, text="Undo", command=self.undo_last_annotation, style="Nav.TButton").pack(side=LEFT, padx=5)
+        ttk.Button(tool_frame, text="Redo", command=self.redo_annotation, style="Nav.TButton").pack(side=LEFT, padx=5)
+        ttk.Button(tool_frame, text="Find Duplicates", command=self.build_duplicate_index, style="Nav.TButton").pack(side=LEFT, padx=5)
+        ttk.Checkbutton(tool_frame, text="Skip Duplicates", variable=self.skip_duplicates).pack(side=LEFT, padx=5)
+        ttk.Button(tool_frame, text="Pre-annotate", command=self.toggle_preannotation, style="Nav.TButton").pack(side=LEFT, padx=5)
+        ttk.Button(tool_frame, text="Propagate", command=self.propagate_from_previous, style="Nav.TButton").pack(side=LEFT, padx=5)
+        ttk.Checkbutton(tool_frame, text="Auto", variable=self.auto_propagate).pack(side=LEFT)
         
         # Zoom controls
         zoom_frame = ttk.Frame(self.toolbar)
@@ -371,6 +686,20 @@ Image Annotator Pro - Quick Help
         ttk.Button(right_frame, text="Save", command=self.save_annotations, style="Nav.TButton").pack(side=RIGHT, padx=5)
         ttk.Button(right_frame, text="Export", command=self.export_menu, style="Nav.TButton").pack(side=RIGHT, padx=5)
         ttk.Button(right_frame, text="Settings", command=self.show_settings, style="Nav.TButton").pack(side=RIGHT, padx=5)
+        ttk.Button(right_frame, text="Grid", command=self.show_thumbnail_grid, style="Nav.TButton").pack(side=RIGHT, padx=5)
+        ttk.Button(right_frame, text="Stats", command=self.show_stats, style="Nav.TButton").pack(side=RIGHT, padx=5)
+        ttk.Button(right_frame, text="Labels", command=self.show_taxonomy, style="Nav.TButton").pack(side=RIGHT, padx=5)
+        ttk.Button(right_frame, text="Validate", command=self.check_annotations, style="Nav.TButton").pack(side=RIGHT, padx=5)
+        
+        # Shared work queue for several annotators on one project
+        queue_button = ttk.Menubutton(right_frame, text="Queue")
+        queue_menu = Menu(queue_button, tearoff=0)
+        queue_menu.add_command(label="Join Work Queue...", command=self.join_work_queue)
+        queue_menu.add_command(label="Finish Image & Next (Ctrl+Enter)", command=self.finish_queue_image)
+        queue_menu.add_command(label="Merge Others' Work", command=self.merge_queue)
+        queue_menu.add_command(label="Leave Work Queue", command=self.leave_work_queue)
+        queue_button.config(menu=queue_menu)
+        queue_button.pack(side=RIGHT, padx=5)
         
         # Annotation area
         self.canvas_frame = ttk.Frame(main_frame)
@@ -406,6 +735,8 @@ Image Annotator Pro - Quick Help
         self.canvas.bind("<B1-Motion>", self.draw_shape_update)
         self.canvas.bind("<ButtonRelease-1>", self.draw_shape_finalize)
         self.canvas.bind("<Button-3>", self.canvas_right_click)
+        self.canvas.bind("<Double-Button-1>", self.accept_suggestion_at)
+        self.canvas.bind("<Motion>", self.on_canvas_motion)
         self.canvas.bind("<MouseWheel>", self.mouse_scroll)
         
         # Status bar
@@ -430,11 +761,7 @@ Image Annotator Pro - Quick Help
         self.label_count_frame.place(relx=1.0,x=-27, y=50, anchor="ne")  # y=50 shifts it below the buttons
         ttk.Label(self.label_count_frame, text="Label Counts", font=("Arial", 10, "bold")).pack(anchor="n", pady=(0, 5))
         self.label_count_labels = {}
-        for label in self.label_list:
-            lbl = ttk.Label(self.label_count_frame, text=f"{label}: 0", foreground=self.get_label_color(label), anchor="w")
-            lbl.pack(anchor="w", padx=3)
-            self.label_count_labels[label] = lbl
-        self.update_label_counts()
+        self.refresh_label_widgets()
         # --- End Label Count Visualization ---
         
         # Bind keyboard shortcuts
@@ -444,10 +771,23 @@ Image Annotator Pro - Quick Help
         self.root.bind('A', lambda e: self.navigate_image(-1))  # A key for previous image
         self.root.bind('d', lambda e: self.navigate_image(1))
         self.root.bind('D', lambda e: self.navigate_image(1))   # D key for next image
+        self.root.bind('u', lambda e: self.jump_to_unannotated())
+        self.root.bind('U', lambda e: self.jump_to_unannotated(-1))  # Shift+U searches backwards
+        self.root.bind('l', lambda e: self.jump_to_label())
+        self.root.bind('L', lambda e: self.jump_to_label(step=-1))
+        self.root.bind('<Control-f>', lambda e: self.jump_to_filename())
         self.root.bind('<Return>', lambda e: self.save_annotations())
         self.root.bind('<Control-z>', lambda e: self.undo_last_annotation())
+        self.root.bind('<Control-y>', lambda e: self.redo_annotation())
+        self.root.bind('<Control-Z>', lambda e: self.redo_annotation())  # Ctrl+Shift+Z
+        self.root.bind('p', lambda e: self.propagate_from_previous())
+        self.root.bind('y', lambda e: self.accept_suggestions())
+        self.root.bind('n', lambda e: self.reject_suggestions())
         self.root.bind('<Control-s>', lambda e: self.save_annotations())
+        self.root.bind('<Control-Return>', lambda e: self.finish_queue_image())
         self.root.bind('<Escape>', lambda e: self.clear_current_drawing())
+        self.root.bind('<Delete>', lambda e: self.delete_selected_annotation())
+        self.root.bind('<BackSpace>', lambda e: self.delete_selected_annotation())
         
         # Number key shortcuts for labels
         for i in range(10):
@@ -456,7 +796,7 @@ Image Annotator Pro - Quick Help
     def export_menu(self):
         export_window = Toplevel(self.root)
         export_window.title("Export Options")
-        export_window.geometry("400x300")
+        export_window.geometry("400x340")
         export_window.transient(self.root)
         export_window.grab_set()
         
@@ -465,6 +805,7 @@ Image Annotator Pro - Quick Help
         formats = [
             ("CSV Format", "csv"),
             ("YOLO Format", "yolo"),
+            ("YOLO Tar Shards (WebDataset)", "shards"),
             ("COCO Format", "coco"),
             ("Pascal VOC Format", "voc")
         ]
@@ -480,7 +821,11 @@ Image Annotator Pro - Quick Help
         if format_type == "csv":
             self.save_annotations()
         elif format_type == "yolo":
-            self.export_yolo_format()
+            if self.check_annotations(before_export=True):
+                self.export_yolo_format()
+        elif format_type == "shards":
+            if self.check_annotations(before_export=True):
+                self.export_yolo_format(shards=True)
         elif format_type == "coco":
             messagebox.showinfo("Info", "COCO format export will be available in the next update")
         elif format_type == "voc":
@@ -489,87 +834,93 @@ Image Annotator Pro - Quick Help
         if window:
             window.destroy()
 
-    def export_yolo_format(self):
+    def export_yolo_format(self, shards=False):
         try:
-            # Ensure 'labels' directory exists
-            labels_dir = os.path.join(self.o_path, "labels")
-            os.makedirs(labels_dir, exist_ok=True)
-
-            # Create classes.txt in output and labels directory
-            with open(os.path.join(self.o_path, "classes.txt"), "w") as f:
-                for label in self.label_list:
-                    f.write(f"{label}\n")
-            with open(os.path.join(labels_dir, "classes.txt"), "w") as f:
-                for label in self.label_list:
-                    f.write(f"{label}\n")
-            
-            # Ensure 'labels' directory exists
-            labels_dir = os.path.join(self.o_path, "labels")
-            os.makedirs(labels_dir, exist_ok=True)
-
-            # Process each image
-            for img_idx, img_path in enumerate(self.image_files):
-                img_name = os.path.basename(img_path)
-                base_name = os.path.splitext(img_name)[0]
-                
-                # If no annotations for this image, continue
-                if img_name not in self.annotations_per_image:
-                    continue
-                    
-                # Get image dimensions
-                img = self._load_image(img_idx)  # Use _load_image to ensure image is loaded
-                if img is None:
-                    raise Exception(f"Failed to load image: {img_path}")
-                img_w, img_h = img.size
-                
-                # Create YOLO format file in labels directory
-                with open(os.path.join(labels_dir, f"{base_name}.txt"), "w") as f:
-                    for ann in self.annotations_per_image.get(img_name, []):
-                        (x1, y1), (x2, y2) = ann["points"]
-                        
-                        # Convert to YOLO format (center_x, center_y, width, height)
-                        # All values are normalized between 0 and 1
-                        center_x = (x1 + x2) / (2 * img_w)
-                        center_y = (y1 + y2) / (2 * img_h)
-                        width = abs(x2 - x1) / img_w
-                        height = abs(y2 - y1) / img_h
-                        
-                        # Get class index
-                        class_idx = self.label_list.index(ann["label"])
-                        
-                        # Write to file
-                        f.write(f"{class_idx} {center_x:.6f} {center_y:.6f} {width:.6f} {height:.6f}\n")
-            
+            groups = self.duplicate_index.groups if self.duplicate_index else {}
+            summary = core.export_yolo(self.o_path, self.image_files, self.annotations_per_image, self.label_list,
+                                       self._get_image_size, val_split=self.val_split, groups=groups,
+                                       anchor_count=self.anchor_count, anchor_imgsz=self.anchor_imgsz,
+                                       train_imgsz=self.train_imgsz, resize_mode=self.resize_mode,
+                                       image_format=self.export_image_format)
+            methods = summary["methods"]
+            anchors = summary["anchors"]
+            skipped = summary["skipped_labels"]
+            skipped_summary = (
+                f"Left out {sum(skipped.values())} boxes with labels not in the label list: "
+                + ", ".join(f"{label} ({count})" for label, count in skipped.most_common()) + "\n\n"
+                if skipped else "")
+            anchor_summary = (f"Anchors: {anchors['count']} at {anchors['imgsz']}px, avg IoU {anchors['avg_iou']:.3f}\n\n"
+                              if anchors else "")
+            shard_summary = ""
+            if shards:
+                self.loadingStatusBar.config(text="Packing tar shards...")
+                self.root.update_idletasks()
+                packed = core.pack_shards(self.o_path, metadata=self._shard_metadata())
+                shard_summary = (f"Packed {packed['samples']} samples into {packed['shards']} tar shards "
+                                 f"({packed['bytes'] / 1024 ** 2:.0f} MB) with shards/index.tsv\n\n")
+                self.loadingStatusBar.config(text="")
             messagebox.showinfo(
                 "Export Complete",
-                f"YOLO format annotations exported to {self.o_path}\n\n"
-                "Please arrange your data as follows:\n"
-                f"- {self.i_path} (input folder) should contain all images in a folder named 'images'\n"
-                f"- {self.o_path} (output folder) should contain:\n"
-                "    - labels/ (all .txt files and classes.txt)\n"
-                "    - config.yaml\n"
-                "    - classes.txt\n"
-                "    - annotations.csv, annotations_autosave.csv, project.json (if present)\n"
-                "    - images/ (if you want to copy images for YOLO training)\n"
+                f"YOLO dataset exported to {self.o_path}\n\n"
+                f"Train images: {summary['train']}\n"
+                f"Val images: {summary['val']}\n\n"
+                f"Hardlinked: {methods['hardlink']}, reflinked: {methods['reflink']}, "
+                f"copied: {methods['copy']}, frames extracted: {methods['extracted']}, "
+                f"resized to {self.train_imgsz}px: {methods['resized']}, failed: {methods['failed']}, "
+                f"unchanged: {methods['existing']}\n\n"
+                f"{skipped_summary}"
+                f"{anchor_summary}"
+                f"{shard_summary}"
+                "config.yaml is ready for training."
             )
-
-            # --- Write config.yaml for YOLO ---
-            config_path = os.path.join(self.o_path, "config.yaml")
-            with open(config_path, "w") as f:
-                f.write(f"path: {self.o_path}\n")
-                f.write("train: images\n")
-                f.write("val: images\n\n")
-                f.write("names:\n")
-                for idx, label in enumerate(self.label_list):
-                    f.write(f"  {idx}: {label}\n")
-            # --- End config.yaml ---
         except Exception as e:
             messagebox.showerror("Export Error", f"Failed to export YOLO format: {str(e)}")
 
+    def _shard_metadata(self):
+        """Per exported image, the metadata stored beside it in the tar shards"""
+        metadata = {}
+        for img_name, anns in self.annotations_per_image.items():
+            idx = self.image_files.index_of(img_name)
+            if idx is not None:
+                base_name = os.path.splitext(self.image_files.export_name(idx))[0]
+                metadata[base_name] = {"image": img_name, "frame": self.image_files.frame(idx),
+                                       "size": list(self._get_image_size(idx)), "boxes": len(anns)}
+        return metadata
+
+    def _get_image_size(self, index):
+        """Size of the display proxy for an image, read from its header if it is not loaded"""
+        size = self.proxy_sizes.get(index)
+        if size is None:
+            img = self.images.get(index)
+            size = self.proxy_sizes[index] = img.size if img is not None else core.read_proxy_size(*self.image_files.source(index))
+        return size
+
+    def _image_sizes_by_name(self, names):
+        """Proxy size per image name, or None if it has none, and the names of the unreadable images.
+
+        Images missing from the input folder and images that could not be opened
+        both get None; only the latter are listed as unreadable.
+        """
+        indices = {img_name: self.image_files.index_of(img_name) for img_name in names}
+        unknown = []
+        for idx in indices.values():
+            if idx is None or idx in self.proxy_sizes:
+                continue
+            img = self.images.get(idx)
+            if img is not None:
+                self.proxy_sizes[idx] = img.size
+            else:
+                unknown.append(idx)
+        read = core.read_proxy_sizes(self.image_files, unknown)
+        self.proxy_sizes.update((idx, size) for idx, size in read.items() if size is not None)
+        sizes = {img_name: None if idx is None else self.proxy_sizes.get(idx) for img_name, idx in indices.items()}
+        unreadable = {img_name for img_name, idx in indices.items() if idx is not None and sizes[img_name] is None}
+        return sizes, unreadable
+
     def show_settings(self):
         settings_window = Toplevel(self.root)
         settings_window.title("Settings")
-        settings_window.geometry("400x300")
+        settings_window.geometry("440x670")
         settings_window.transient(self.root)
         settings_window.grab_set()
         
@@ -590,11 +941,113 @@ Image Annotator Pro - Quick Help
                 if val < 1:
                     val = 1
                 self.autosave_interval = val
+                self.setup_autosave()
                 messagebox.showinfo("Settings", f"Autosave interval set to {val} minute(s)")
             except Exception:
                 messagebox.showerror("Error", "Please enter a valid number for autosave interval.")
         ttk.Button(autosave_frame, text="Save", command=save_autosave_setting, style="Nav.TButton").pack(side=LEFT, padx=10)
         
+        # Validation split used by the YOLO export
+        split_frame = ttk.Frame(settings_window, padding="10")
+        split_frame.pack(fill=X)
+        
+        ttk.Label(split_frame, text="Validation Split (%):").pack(side=LEFT, padx=5)
+        split_var = StringVar(value=str(int(round(self.val_split * 100))))
+        split_entry = ttk.Entry(split_frame, textvariable=split_var, width=5)
+        split_entry.pack(side=LEFT, padx=5)
+        
+        def save_split_setting():
+            try:
+                val = min(max(int(split_var.get()), 0), 90)
+                self.val_split = val / 100
+                messagebox.showinfo("Settings", f"Validation split set to {val}%")
+            except Exception:
+                messagebox.showerror("Error", "Please enter a valid percentage for the validation split.")
+        ttk.Button(split_frame, text="Save", command=save_split_setting, style="Nav.TButton").pack(side=LEFT, padx=10)
+        
+        # Anchor computation for config.yaml
+        anchor_frame = ttk.Frame(settings_window, padding="10")
+        anchor_frame.pack(fill=X)
+        
+        ttk.Label(anchor_frame, text="Anchors (0 = off):").pack(side=LEFT, padx=5)
+        anchor_count_var = StringVar(value=str(self.anchor_count))
+        ttk.Entry(anchor_frame, textvariable=anchor_count_var, width=4).pack(side=LEFT, padx=5)
+        ttk.Label(anchor_frame, text="at px:").pack(side=LEFT)
+        anchor_imgsz_var = StringVar(value=str(self.anchor_imgsz))
+        ttk.Entry(anchor_frame, textvariable=anchor_imgsz_var, width=5).pack(side=LEFT, padx=5)
+        
+        def save_anchor_setting():
+            try:
+                count = min(max(int(anchor_count_var.get()), 0), 30)
+                imgsz = int(anchor_imgsz_var.get())
+                if imgsz < 32:
+                    raise ValueError
+                self.anchor_count, self.anchor_imgsz = count, imgsz
+                messagebox.showinfo("Settings", f"Export will compute {count} anchors at {imgsz}px" if count
+                                    else "Anchor computation disabled")
+            except Exception:
+                messagebox.showerror("Error", "Please enter a valid anchor count and input size.")
+        ttk.Button(anchor_frame, text="Save", command=save_anchor_setting, style="Nav.TButton").pack(side=LEFT, padx=10)
+        
+        # Resize images to the training input size on export
+        resize_frame = ttk.Frame(settings_window, padding="10")
+        resize_frame.pack(fill=X)
+        
+        ttk.Label(resize_frame, text="Export at px (0 = originals):").pack(side=LEFT, padx=5)
+        train_imgsz_var = StringVar(value=str(self.train_imgsz))
+        ttk.Entry(resize_frame, textvariable=train_imgsz_var, width=5).pack(side=LEFT, padx=5)
+        resize_mode_var = StringVar(value=self.resize_mode)
+        ttk.Combobox(resize_frame, textvariable=resize_mode_var, values=list(core.RESIZE_MODES),
+                     state="readonly", width=9).pack(side=LEFT, padx=2)
+        image_format_var = StringVar(value=self.export_image_format)
+        ttk.Combobox(resize_frame, textvariable=image_format_var, values=list(core.IMAGE_FORMATS),
+                     state="readonly", width=4).pack(side=LEFT, padx=2)
+        
+        def save_resize_setting():
+            try:
+                imgsz = int(train_imgsz_var.get())
+                if imgsz and imgsz < 32:
+                    raise ValueError
+                self.train_imgsz = imgsz
+                self.resize_mode = resize_mode_var.get()
+                self.export_image_format = image_format_var.get()
+                messagebox.showinfo("Settings", f"Export will {self.resize_mode} images to {imgsz}px "
+                                    f"{self.export_image_format.upper()}" if imgsz
+                                    else "Export will link the original images")
+            except Exception:
+                messagebox.showerror("Error", "Please enter a valid input size (0 keeps the originals).")
+        ttk.Button(resize_frame, text="Save", command=save_resize_setting, style="Nav.TButton").pack(side=LEFT, padx=10)
+        
+        # Undo history memory cap and crash-recovery journal
+        history_frame = ttk.Frame(settings_window, padding="10")
+        history_frame.pack(fill=X)
+        
+        ttk.Label(history_frame, text="Undo memory (MB):").pack(side=LEFT, padx=5)
+        undo_budget_var = StringVar(value=str(self.undo_budget_mb))
+        ttk.Entry(history_frame, textvariable=undo_budget_var, width=5).pack(side=LEFT, padx=5)
+        journal_var = BooleanVar(value=self.journal_edits)
+        ttk.Checkbutton(history_frame, text="Journal edits", variable=journal_var).pack(side=LEFT, padx=5)
+        
+        def save_history_setting():
+            try:
+                budget = int(undo_budget_var.get())
+                if budget < 1:
+                    raise ValueError
+                self.undo_budget_mb = budget
+                self.history.max_bytes = budget * 1024 * 1024
+                self.history.trim()
+                if journal_var.get() != self.journal_edits:
+                    self.journal_edits = journal_var.get()
+                    if not self.journal_edits:
+                        self.history.close(discard=True)
+                    elif self.o_path and not self.work_queue:  # leave_work_queue turns it on
+                        self.history.open_journal(os.path.join(self.o_path, "edits.journal"))
+                messagebox.showinfo("Settings", f"Undo history capped at {budget} MB, edit journal "
+                                    f"{'on' if self.journal_edits else 'off'}")
+            except Exception:
+                messagebox.showerror("Error", "Please enter a valid number of megabytes.")
+        ttk.Button(history_frame, text="Save", command=save_history_setting, style="Nav.TButton").pack(side=LEFT, padx=10)
+        
         # Keyboard shortcuts
         ttk.Label(settings_window, text="Keyboard Shortcuts", font=("Arial", 10, "bold")).pack(pady=(20, 10), anchor=W, padx=20)
         
@@ -603,7 +1056,16 @@ Image Annotator Pro - Quick Help
             ("Previous Image", "Left Arrow"),
             ("Save", "Ctrl+S"),
             ("Undo", "Ctrl+Z"),
-            ("Cancel Drawing", "Escape"),
+            ("Redo", "Ctrl+Y (or Ctrl+Shift+Z)"),
+            ("Cancel Drawing / Deselect", "Escape"),
+            ("Select / Move / Resize Box", "Click, drag box or handles"),
+            ("Delete Selected Box", "Delete"),
+            ("Next Unannotated", "U (Shift+U back)"),
+            ("Next With Label", "L (Shift+L back)"),
+            ("Find By Filename", "Ctrl+F"),
+            ("Propagate From Previous", "P"),
+            ("Accept / Reject Suggestions", "Y / N (double-click accepts one)"),
+            ("Finish Queue Image & Next", "Ctrl+Enter"),
             ("Quick Label Selection", "1-0 (number keys)")
         ]
         
@@ -632,7 +1094,7 @@ Image Annotator Pro - Quick Help
         self.zoom_label.config(text=f"{int(self.display_scale*100)}%")
         
         # Refresh display
-        if self.images:
+        if self.image_files:
             self.show_image(self.current)
 
     def mouse_scroll(self, event):
@@ -647,13 +1109,17 @@ Image Annotator Pro - Quick Help
             self.canvas.yview_scroll(-1 * (event.delta // 120), "units")
 
     def canvas_right_click(self, event):
-        if not self.images:
+        if self._current_image() is None:
             return
             
         # Show context menu
         menu = Menu(self.root, tearoff=0)
         menu.add_command(label="Clear All Annotations", command=self.clear_all_annotations)
         menu.add_command(label="Undo Last Annotation", command=self.undo_last_annotation)
+        menu.add_command(label="Redo", command=self.redo_annotation)
+        if self.preannotator:
+            menu.add_command(label="Accept Suggestions", command=self.accept_suggestions)
+            menu.add_command(label="Reject Suggestions", command=self.reject_suggestions)
         menu.add_separator()
         
         # Submenu for labels
@@ -666,85 +1132,103 @@ Image Annotator Pro - Quick Help
 
     def set_label(self, label):
         self.current_label.set(label)
+        # Relabel the selected box as well
+        if self.selected_ann is not None and self.selected_ann["label"] != label:
+            new_ann = dict(self.selected_ann, label=label, color=self.get_label_color(label))
+            self._replace_annotation(self.selected_ann, new_ann)
 
     def select_label(self, idx):
         if idx < len(self.label_list):
             self.current_label.set(self.label_list[idx])
 
     def clear_current_drawing(self):
-        if self.current_points:
+        if self.current_points or self.selected_ann is not None:
             self.current_points = []
+            self.selected_ann = None
             self.show_image(self.current)
 
     def clear_all_annotations(self):
-        if not self.images:
+        if not self.image_files:
             return
             
         result = messagebox.askyesno("Confirm", "Clear all annotations for the current image?")
         if not result:
             return
             
-        img_name = os.path.basename(self.image_files[self.current])
+        img_name = self.image_files.name(self.current)
         
-        # Add to undo stack before clearing
-        if img_name in self.annotations_per_image:
-            self.undo_stack.append({
-                "action": "clear_all",
-                "image": img_name,
-                "annotations": self.annotations_per_image[img_name].copy()
-            })
-            
-        # Clear annotations
+        # The history keeps the cleared list itself; it is replaced below, never modified
+        cleared = self.annotations_per_image.get(img_name, [])
         self.annotations_per_image[img_name] = []
+        self.history.record("clear", [(img_name, 0, cleared, ())])
+        self._on_annotations_changed(img_name)
         self.show_image(self.current)
         self.update_annotation_count()
         self.update_label_counts()
 
     def undo_last_annotation(self):
-        if not self.undo_stack:
+        self._step_history(self.history.undo, "Undo")
+
+    def redo_annotation(self):
+        self._step_history(self.history.redo, "Redo")
+
+    def _step_history(self, step, name):
+        """Run history.undo or history.redo and refresh every image it touched"""
+        try:
+            result = step(self.annotations_per_image)
+        except ValueError as e:
+            self.history.clear()
+            self.statusBar.config(text=f"{name} history cleared: {e}")
             return
-            
-        action = self.undo_stack.pop()
-        action_type = action["action"]
-        
-        if action_type == "add":
-            # Remove the last added annotation
-            img_name = action["image"]
-            if img_name in self.annotations_per_image and self.annotations_per_image[img_name]:
-                self.annotations_per_image[img_name].pop()
-        elif action_type == "clear_all":
-            # Restore all cleared annotations
-            img_name = action["image"]
-            self.annotations_per_image[img_name] = action["annotations"]
+        if result is None:
+            return
+        kind, img_names, state = result
+        self.selected_ann = None
+        self._on_many_annotations_changed(img_names)
+        exported = ""
+        if kind == "taxonomy":
+            rewritten = self._set_taxonomy(*state)
+            exported = f", {rewritten} YOLO label files rewritten" if rewritten is not None else ""
+        self.statusBar.config(text=f"{name}: {kind}{exported}")
             
         self.show_image(self.current)
         self.update_annotation_count()
         self.update_label_counts()
 
     def navigate_image_to(self, idx):
-        if not self.images:
+        if not self.image_files:
             return
             
         if idx < 0:  # Navigate to last image
-            self.current = len(self.images) - 1
+            self.current = len(self.image_files) - 1
         else:  # Navigate to specific index
-            self.current = min(idx, len(self.images) - 1)
+            self.current = min(idx, len(self.image_files) - 1)
             
         self.show_image(self.current)
 
     def draw_shape_start(self, event):
-        if not self.images:
+        if self._current_image() is None:
             return
             
         # Calculate actual image coordinates
         x, y = self.get_image_coords(event.x, event.y)
         
+        # Dragging a handle or the body of the selected box edits it instead of drawing
+        handle = self._handle_at(x, y)
+        if handle:
+            self.edit_mode = handle
+            self.edit_start = (x, y)
+            return
+        
         # Start drawing rectangle
         self.current_points = [(x, y), (x, y)]
         self.temp_rect = None  # Store the temporary rectangle ID
 
     def draw_shape_update(self, event):
-        if not self.images or not self.current_points:
+        if self.edit_mode:
+            self._update_edit_preview(*self.get_image_coords(event.x, event.y))
+            return
+        if self._current_image() is None or not self.current_points:
             return
             
         # Calculate actual image coordinates
@@ -755,7 +1239,7 @@ Image Annotator Pro - Quick Help
             self.current_points[1] = (x, y)
             
             # Get canvas scale and offsets
-            img = self.images[self.current]
+            img = self._current_image()
             img_w, img_h = img.size
             canvas_width = self.canvas.winfo_width()
             canvas_height = self.canvas.winfo_height()
@@ -788,7 +1272,10 @@ Image Annotator Pro - Quick Help
                 )
 
     def draw_shape_finalize(self, event):
-        if not self.images or not self.current_points:
+        if self.edit_mode:
+            self._finish_edit(*self.get_image_coords(event.x, event.y))
+            return
+        if self._current_image() is None or not self.current_points:
             return
             
         if len(self.current_points) == 2:
@@ -803,15 +1290,19 @@ Image Annotator Pro - Quick Help
                 # Remove temporary rectangle if too small
                 if self.temp_rect:
                     self.canvas.delete(self.temp_rect)
+                # A click rather than a drag selects the smallest box under the cursor
+                hits = self._get_box_grid().hit(x2, y2)
+                self.selected_ann = hits[0] if hits else None
+                self._draw_selection()
                 
         self.current_points = []
         self.temp_rect = None
 
     def get_image_coords(self, canvas_x, canvas_y):
-        if not self.images:
+        img = self._current_image()
+        if img is None:
             return (0, 0)
             
-        img = self.images[self.current]
         img_w, img_h = img.size
         
         # Get canvas dimensions
@@ -848,53 +1339,61 @@ Image Annotator Pro - Quick Help
         
         return (img_x, img_y)
 
-    def add_annotation(self, shape, points):
-        if not self.images:
+    def add_annotation(self, shape, points, label=None):
+        if not self.image_files:
             return
             
         # Get current image name
-        img_name = os.path.basename(self.image_files[self.current])
+        img_name = self.image_files.name(self.current)
         
         # Create annotation
-        color = self.get_label_color(self.current_label.get())
+        label = label or self.current_label.get()
+        color = self.get_label_color(label)
         ann = {
             "shape": shape, 
-            "points": points.copy(), 
-            "label": self.current_label.get(), 
+            "points": list(points), 
+            "label": label, 
             "color": color
         }
         
-        # Initialize annotation list if needed
-        if img_name not in self.annotations_per_image:
-            self.annotations_per_image[img_name] = []
-            
-        # Add to undo stack
-        self.undo_stack.append({
-            "action": "add",
-            "image": img_name
-        })
-        
         # Add annotation
-        self.annotations_per_image[img_name].append(ann)
+        anns = self.annotations_per_image.setdefault(img_name, [])
+        anns.append(ann)
+        self.history.record("add", [(img_name, len(anns) - 1, (), (ann,))])
+        if self.box_grid is not None and self.box_grid_image == img_name:
+            self.box_grid.insert(ann)
+        self._on_annotations_changed(img_name, box_grid_updated=True)
         self.update_annotation_count()
         self.update_label_counts()
 
+    def refresh_label_widgets(self):
+        """Sync the label selector and label count panel with self.label_list"""
+        self.label_menu.config(values=self.label_list)
+        if self.label_list and self.current_label.get() not in self.label_list:
+            self.current_label.set(self.label_list[0])
+        for lbl in self.label_count_labels.values():
+            lbl.destroy()
+        self.label_count_labels = {}
+        for label in self.label_list:
+            lbl = ttk.Label(self.label_count_frame, text=f"{label}: 0", foreground=self.get_label_color(label), anchor="w")
+            lbl.pack(anchor="w", padx=3)
+            self.label_count_labels[label] = lbl
+        self.update_label_counts()
+
     def update_label_counts(self):
-        # Count annotations for each label across all images
-        label_counts = {label: 0 for label in self.label_list}
-        for anns in self.annotations_per_image.values():
-            for ann in anns:
-                if ann["label"] in label_counts:
-                    label_counts[ann["label"]] += 1
-        # Update label count labels
+        # Per-label totals are maintained incrementally by the stats engine
         for label, lbl_widget in self.label_count_labels.items():
-            lbl_widget.config(text=f"{label}: {label_counts.get(label, 0)}")
+            lbl_widget.config(text=f"{label}: {self.label_box_count(label)}")
+
+    def label_box_count(self, label):
+        """Boxes with label across the project, 0 before a project is loaded"""
+        return self.stats.count(label) if self.stats is not None else 0
 
     def update_annotation_count(self):
-        if not self.images:
+        if not self.image_files:
             self.annotation_count.config(text="Annotations: 0")
             return
-        img_name = os.path.basename(self.image_files[self.current])
+        img_name = self.image_files.name(self.current)
         count = len(self.annotations_per_image.get(img_name, []))
         self.annotation_count.config(text=f"Annotations: {count}")
         self.update_label_counts()
@@ -906,9 +1405,14 @@ Image Annotator Pro - Quick Help
         # Clear canvas
         self.canvas.delete("all")
         
-        # Get current image with lazy loading
-        img = self._load_image(index)
-        if not img:
+        # Decoding happens on the prefetch threads; until this image is ready show a placeholder
+        img = self.images.get(index)
+        if img is None:
+            self._prefetch_around(index)
+            self.canvas.create_text(self.canvas.winfo_width() // 2, self.canvas.winfo_height() // 2,
+                                    text=f"Loading {self.image_files.name(index)}…",
+                                    fill=self.theme["light"], font=("Arial", 12))
+            self.statusBar.config(text=f"Image {index + 1} of {len(self.image_files)} | Loading...")
             return
         img_w, img_h = img.size
         
@@ -945,12 +1449,20 @@ Image Annotator Pro - Quick Help
                     del self.resized_images_cache[k]
             self.resized_images_cache[cache_key] = resized_img
             
+        # Dense images get their boxes composited into the bitmap instead of as canvas items
+        img_name = self.image_files.name(index)
+        anns = self.annotations_per_image.get(img_name, [])
+        rasterize = len(anns) > self.raster_threshold
+        if rasterize:
+            resized_img = self._composite_overlay(index, img_name, anns, resized_img, scale)
+            
         # Convert to PhotoImage
         self.canvas.image = ImageTk.PhotoImage(resized_img)
         
         # Calculate image position (centered in canvas)
         img_x = max(0, (canvas_width - new_w) // 2)
         img_y = max(0, (canvas_height - new_h) // 2)
+        self.view_transform = (img_x, img_y, scale)
         
         # Create a larger scroll region to allow for proper centering
         scroll_width = max(canvas_width, new_w + img_x * 2)
@@ -963,8 +1475,7 @@ Image Annotator Pro - Quick Help
         self.canvas.config(scrollregion=(0, 0, scroll_width, scroll_height))
         
         # Draw annotations
-        img_name = os.path.basename(self.image_files[index])
-        for ann in self.annotations_per_image.get(img_name, []):
+        for ann in (() if rasterize else anns):
             color = self.get_label_color(ann["label"])
             (x1, y1), (x2, y2) = ann["points"]
             
@@ -982,6 +1493,25 @@ Image Annotator Pro - Quick Help
                                                 fill=color, outline=color)
             text = self.canvas.create_text(sx1+5, sy1-10, text=ann["label"], anchor=W, fill="white")
         
+        # Selection and hover only apply to the image they were made on
+        if self.box_grid_image != img_name:
+            self.selected_ann = None
+            self.hovered_ann = None
+        self._draw_selection()
+        self._draw_hover()
+        
+        # Draw pre-annotation suggestions
+        if self.preannotator:
+            suggestion_color = self.theme["warning"]
+            for proposal in self.preannotator.get(index):
+                _, x1, y1, x2, y2, score = proposal
+                sx1, sy1 = img_x + x1 * scale, img_y + y1 * scale
+                sx2, sy2 = img_x + x2 * scale, img_y + y2 * scale
+                self.canvas.create_rectangle(sx1, sy1, sx2, sy2, outline=suggestion_color, dash=(4, 4), width=2)
+                self.canvas.create_text(sx1 + 4, sy2 - 10, anchor=W, fill=suggestion_color,
+                                        text=f"{self._proposal_label(proposal)}? {score:.2f}")
+            self._schedule_preannotation()
+        
         # Draw current shape being created
         if self.current_points:
             color = self.get_label_color(self.current_label.get())
@@ -1000,27 +1530,847 @@ Image Annotator Pro - Quick Help
         self.canvas.config(scrollregion=self.canvas.bbox("all"))
         
         # Update status bar
-        self.statusBar.config(text=f"Image {index + 1} of {len(self.images)} | {img_name} | {img_w}×{img_h}px")
+        status = f"Image {index + 1} of {len(self.image_files)} | {img_name} | {img_w}×{img_h}px"
+        if self.duplicate_index and self.duplicate_index.is_redundant(img_name):
+            status += f" | Duplicate of {self.duplicate_index.groups[img_name]}"
+        self.statusBar.config(text=status)
         # Only update loadingStatusBar with loading info, not statusBar
         if hasattr(self, 'loadingStatusBar'):
-            if self.total_loaded < len(self.image_files):
-                self.loadingStatusBar.config(text=f"Loading images: {self.total_loaded}/{len(self.image_files)}")
-            else:
-                self.loadingStatusBar.config(text="All images loaded")
+            self.loadingStatusBar.config(text=self._loading_status())
 
         # Update annotation count
         self.update_annotation_count()
+        
+        # Keep the grid's highlight and badges current
+        if self.thumbnail_grid:
+            self.thumbnail_grid.refresh()
+
+    def show_thumbnail_grid(self):
+        """Open (or raise) the thumbnail grid window"""
+        if not self.image_files:
+            return
+        if self.thumbnail_grid:
+            self.thumbnail_grid.window.lift()
+            self.thumbnail_grid.scroll_to(self.current)
+            return
+        self.thumbnail_grid = ThumbnailGrid(self)
+
+    def check_annotations(self, before_export=False):
+        """Check the project for broken boxes and offer batch fixes.
+
+        Returns whether an export that asked for the check should go ahead.
+        """
+        names = [img_name for img_name, anns in self.annotations_per_image.items() if anns]
+        self.loadingStatusBar.config(text="Validating annotations...")
+        self.root.update_idletasks()
+        sizes, unreadable = self._image_sizes_by_name(names)
+        report = core.validate_annotations(self.annotations_per_image, self.label_list, sizes, unreadable=unreadable)
+        self.loadingStatusBar.config(text=f"Validated {report.boxes} boxes")
+        if not report:
+            if not before_export:
+                messagebox.showinfo("Validation", f"No problems found in {report.boxes} boxes.")
+            return True
+
+        window = Toplevel(self.root)
+        window.title("Annotation Problems")
+        window.transient(self.root)
+        window.grab_set()
+        ttk.Label(window, text=f"Problems found in {report.boxes} boxes", font=("Arial", 12, "bold")).pack(pady=(15, 10))
+
+        fix_names = {"inverted": "Swap corners", "zero_area": "Delete", "out_of_bounds": "Clip to image",
+                     "duplicate": "Delete later copies", "orphaned": "Delete"}
+        fix_vars = {}
+        unknown_var = StringVar(value="keep")
+        table = ttk.Frame(window, padding="10")
+        table.pack(fill=X)
+        for row, (check, description) in enumerate(core.QA_CHECKS.items()):
+            flagged = report.issues[check]
+            if not flagged:
+                continue
+            examples = ", ".join(list(dict.fromkeys(img_name for img_name, _ in flagged[:50]))[:3])
+            ttk.Label(table, text=f"{description}: {len(flagged)}").grid(row=row * 2, column=0, sticky=W)
+            ttk.Label(table, text=f"e.g. {examples}", foreground="gray").grid(row=row * 2 + 1, column=0, sticky=W, padx=10)
+            if check == "unknown_label":
+                ttk.Label(table, text=", ".join(sorted(report.unknown_labels))).grid(row=row * 2 + 1, column=1, sticky=W)
+                ttk.Combobox(table, textvariable=unknown_var, values=["keep", "add to labels", "drop"],
+                             state="readonly", width=14).grid(row=row * 2, column=1, sticky=W, padx=10)
+            elif check in fix_names:  # Boxes on unreadable images are kept until the file is fixed
+                fix_vars[check] = BooleanVar(value=check != "orphaned")
+                ttk.Checkbutton(table, text=fix_names[check], variable=fix_vars[check]).grid(row=row * 2, column=1, sticky=W, padx=10)
+
+        proceed = BooleanVar(value=False)
+
+        def apply_and_close(export):
+            fixes = {check for check, var in fix_vars.items() if var.get()}
+            self._apply_validation_fixes(report, sizes, fixes, unknown_var.get())
+            proceed.set(export)
+            window.destroy()
+
+        def skip_and_close():
+            proceed.set(True)
+            window.destroy()
+
+        buttons = ttk.Frame(window, padding="10")
+        buttons.pack(fill=X)
+        if before_export:
+            ttk.Button(buttons, text="Fix & Export", command=lambda: apply_and_close(True), style="Nav.TButton").pack(side=LEFT, padx=5)
+            ttk.Button(buttons, text="Export Anyway", command=skip_and_close, style="Nav.TButton").pack(side=LEFT, padx=5)
+        else:
+            ttk.Button(buttons, text="Apply Fixes", command=lambda: apply_and_close(False), style="Nav.TButton").pack(side=LEFT, padx=5)
+        ttk.Button(buttons, text="Cancel", command=window.destroy, style="Nav.TButton").pack(side=RIGHT, padx=5)
+        self.root.wait_window(window)
+        return proceed.get()
+
+    def _apply_validation_fixes(self, report, sizes, fixes, unknown_labels):
+        fixed = core.apply_fixes(self.annotations_per_image, report, sizes, fixes, unknown_labels)
+        if unknown_labels == "add to labels" and report.unknown_labels:
+            self.label_list += sorted(report.unknown_labels - set(self.label_list))
+            self.refresh_label_widgets()
+        if not fixed:
+            return
+        splices = []
+        for img_name, anns in fixed.items():
+            splices.append((img_name, 0, self.annotations_per_image[img_name], tuple(anns)))
+            self.annotations_per_image[img_name] = anns
+            self._on_annotations_changed(img_name)
+        self.history.record("fix", splices)
+        self.show_image(self.current)
+        self.update_annotation_count()
+        self.loadingStatusBar.config(text=f"Fixed annotations on {len(fixed)} images")
+
+    def show_stats(self):
+        """Open (or raise) the statistics window"""
+        if self.stats is None:
+            return
+        if self.stats_window:
+            self.stats_window.window.lift()
+            return
+        self.stats_window = StatsWindow(self)
+
+    def show_taxonomy(self):
+        """Rename, merge, split, delete and add classes across the whole project"""
+        window = Toplevel(self.root)
+        window.title("Labels")
+        window.geometry("420x460")
+        window.transient(self.root)
+        window.grab_set()
+
+        ttk.Label(window, text="Classes", font=("Arial", 12, "bold")).pack(pady=(15, 5))
+        listbox = Listbox(window, selectmode=EXTENDED, activestyle="none")
+        listbox.pack(fill=BOTH, expand=True, padx=10)
+        entries = []
+
+        def refresh():
+            # Labels with a colour but no place in the label list are leftovers from old sessions
+            entries[:] = self.label_list + [label for label in self.label_colors if label not in self.label_list]
+            listbox.delete(0, END)
+            for label in entries:
+                note = "" if label in self.label_list else "  (not in label list)"
+                listbox.insert(END, f"{label}  [{self.label_box_count(label)}]{note}")
+                listbox.itemconfig(END, foreground=self.get_label_color(label))
+
+        def selected():
+            return [entries[i] for i in listbox.curselection()]
+
+        def rename():
+            labels = selected()
+            if not labels:
+                return
+            prompt = f"New name for {labels[0]}:" if len(labels) == 1 else f"Merge {len(labels)} classes into:"
+            new = simpledialog.askstring("Rename / Merge", prompt, parent=window, initialvalue=labels[0])
+            if new and new.strip():
+                self._apply_taxonomy({label: new.strip() for label in labels}, "Renamed", on_done=refresh)
+
+        def split():
+            labels = selected()
+            if len(labels) != 1:
+                messagebox.showinfo("Split", "Select one class to split.", parent=window)
+                return
+            new = simpledialog.askstring("Split", f"Name of the class split off from {labels[0]}:", parent=window)
+            if not new or not new.strip():
+                return
+            pattern = simpledialog.askstring("Split", f"Move {labels[0]} boxes on images whose filename matches:",
+                                             parent=window, initialvalue="*")
+            if pattern:
+                images = {img_name for img_name in self.annotations_per_image if fnmatchcase(img_name, pattern)}
+                self._apply_taxonomy({labels[0]: new.strip()}, "Split", images, on_done=refresh)
+
+        def delete():
+            labels = selected()
+            boxes = sum(map(self.label_box_count, labels))
+            if labels and messagebox.askyesno("Delete", f"Delete {', '.join(labels)} and its {boxes} boxes?",
+                                              parent=window):
+                self._apply_taxonomy(dict.fromkeys(labels), "Deleted", on_done=refresh)
+
+        def clean_up():
+            unused = [label for label in entries if label not in self.label_list and not self.label_box_count(label)]
+            if unused:
+                self._apply_taxonomy(dict.fromkeys(unused), "Removed unused", on_done=refresh)
+
+        def add():
+            new = simpledialog.askstring("Add Class", "New class name:", parent=window)
+            if new and new.strip() and new.strip() not in self.label_list:
+                self.label_list.append(new.strip())
+                self.refresh_label_widgets()
+                refresh()
+
+        buttons = ttk.Frame(window, padding="10")
+        buttons.pack(fill=X)
+        for text, command in (("Rename / Merge", rename), ("Split", split), ("Delete", delete),
+                              ("Clean Up Unused", clean_up), ("Add", add)):
+            ttk.Button(buttons, text=text, command=command, style="Nav.TButton").pack(side=LEFT, padx=2)
+        refresh()
+
+    def _apply_taxonomy(self, mapping, name, images=None, on_done=None):
+        """Apply a label mapping to the project and to an existing YOLO export.
+
+        The remap, and for edits of many images the rebuilt indexes, are computed on
+        a worker thread; _finish_taxonomy applies them on the Tk thread and then
+        calls on_done.
+        """
+        if self.taxonomy_running:
+            self.statusBar.config(text="Another taxonomy edit is still running")
+            return
+        self.taxonomy_running = True
+        annotations, image_files, nav_index = self.annotations_per_image, self.image_files, self.nav_index
+        label_list, label_colors = list(self.label_list), dict(self.label_colors)
+        changes = self.annotation_changes
+
+        def images_with(label):
+            return map(image_files.name, nav_index.label_images.get(label, ()))
+
+        def worker():
+            edit = nbytes = indexes = error = None
+            try:
+                edit = core.edit_taxonomy(annotations, label_list, label_colors, mapping,
+                                          lambda label: self.get_random_color(), images,
+                                          images_with if nav_index is not None else None)
+                nbytes = core.edit_nbytes(edit.splices)
+                if nav_index is not None and len(edit.annotations) > self.bulk_refresh_images:
+                    indexes = self._build_indexes({**annotations, **edit.annotations}, image_files)
+            except Exception as e:
+                error = e
+            self._post_to_tk(lambda: self._finish_taxonomy(mapping, name, images, on_done, (
+                annotations, label_list, label_colors, changes), edit, nbytes, indexes, error))
+
+        self.statusBar.config(text=f"{name}: updating boxes...")
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _finish_taxonomy(self, mapping, name, images, on_done, started, edit, nbytes, indexes, error):
+        self.taxonomy_running = False
+        annotations, label_list, label_colors, changes = started
+        if annotations is not self.annotations_per_image:
+            return  # Another project was loaded meanwhile
+        if (changes, label_list, label_colors) != (self.annotation_changes, self.label_list, self.label_colors):
+            # The annotations or labels changed while the worker ran, so its result is stale
+            self._apply_taxonomy(mapping, name, images, on_done)
+            return
+        if isinstance(error, ValueError):
+            self.statusBar.config(text=f"{name} failed")
+            messagebox.showerror("Error", str(error))
+            return
+        if error is not None:
+            print(f"Taxonomy edit error: {error}")
+            self.statusBar.config(text=f"{name} failed")
+            return
+        if nbytes > self.history.max_bytes and not messagebox.askyesno(
+                name, f"{name} changes {edit.relabeled + edit.deleted} boxes, more than the {self.undo_budget_mb} MB "
+                "undo history can hold. It cannot be undone, and earlier edits can no longer be undone either.\n\n"
+                "Apply it anyway?"):
+            self.statusBar.config(text=f"{name} cancelled")
+            return
+        current = self.current_label.get()
+        if images is None and mapping.get(current):
+            self.current_label.set(mapping[current])
+        self.annotations_per_image.update(edit.annotations)
+        # The images to re-export are the same whichever way the edit is stepped
+        before = (list(self.label_list), dict(self.label_colors), edit.reexport)
+        after = (list(edit.label_list), dict(edit.label_colors), edit.reexport)
+        if edit.splices or before[:2] != after[:2]:
+            self.history.record("taxonomy", edit.splices, (before, after), nbytes)
+        self._on_many_annotations_changed(edit.annotations, indexes)
+        rewritten = self._set_taxonomy(*after)
+        self.selected_ann = None
+        self.show_image(self.current)
+        self.update_annotation_count()
+        exported = f", {rewritten} YOLO label files rewritten" if rewritten is not None else ""
+        self.statusBar.config(text=f"{name}: {edit.relabeled} boxes relabeled, {edit.deleted} deleted{exported}")
+        if on_done is not None:
+            on_done()
+
+    def _set_taxonomy(self, label_list, label_colors, reexport):
+        """Switch to a label list and colours, and bring an existing YOLO export in line with them.
+
+        Returns the number of label files rewritten, or None if there is no export.
+        """
+        self.label_list = list(label_list)
+        self.label_colors = dict(label_colors)
+        self.refresh_label_widgets()
+        if not self.o_path:
+            return None
+        try:
+            return core.update_yolo_labels(self.o_path, self.image_files, self.annotations_per_image,
+                                           self.label_list, self._get_image_size, reexport)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to update the YOLO export: {str(e)}")
+            return None
+
+    def propagate_from_previous(self, refresh=True):
+        """Copy the previous image's boxes onto this one, refined by template matching"""
+        if not self.image_files or self.current == 0:
+            return
+        prev_idx = self.current - 1
+        prev_anns = self.annotations_per_image.get(self.image_files.name(prev_idx))
+        if not prev_anns:
+            self.statusBar.config(text="Previous image has no annotations to propagate")
+            return
+        prev_img, cur_img = self.images.get(prev_idx), self._current_image()
+        if prev_img is None or cur_img is None:
+            self.statusBar.config(text="Images are still loading, try again in a moment")
+            return
+            
+        boxes = [(x1, y1, x2, y2) for (x1, y1), (x2, y2) in (ann["points"] for ann in prev_anns)]
+        tracked = core.propagate_boxes(prev_img, cur_img, boxes)
+        new_anns = [{
+            "shape": ann["shape"],
+            "points": [(x1, y1), (x2, y2)],
+            "label": ann["label"],
+            "color": self.get_label_color(ann["label"])
+        } for ann, (x1, y1, x2, y2, _) in zip(prev_anns, tracked)]
+        
+        img_name = self.image_files.name(self.current)
+        anns = self.annotations_per_image.setdefault(img_name, [])
+        anns.extend(new_anns)
+        # One undo step removes the whole propagated batch
+        self.history.record("propagate", [(img_name, len(anns) - len(new_anns), (), tuple(new_anns))])
+        self._on_annotations_changed(img_name)
+        if refresh:
+            self.show_image(self.current)
+            self.update_label_counts()
+
+    def toggle_preannotation(self):
+        """Start or stop running a detector ahead of the current image"""
+        if self.preannotator:
+            self.preannotator.close()
+            self.preannotator = None
+            self.statusBar.config(text="Pre-annotation stopped")
+            self.show_image(self.current)
+            return
+        if not self.image_files:
+            return
+        spec = simpledialog.askstring("Pre-annotate", "Detector (registered name or module:function):",
+                                      parent=self.root, initialvalue=self.detector_spec)
+        if not spec:
+            return
+        try:
+            self.preannotator = core.PreAnnotationEngine(spec.strip(), self.image_files)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to start detector: {str(e)}")
+            return
+        self.detector_spec = spec.strip()
+        self.preannotator.on_ready = self._on_proposals_ready
+        self._schedule_preannotation()
+
+    def _schedule_preannotation(self):
+        # Images that already have boxes don't need suggestions
+        box_counts = self.nav_index.box_counts if self.nav_index else None
+        self.preannotator.schedule(self.current, skip=lambda idx: box_counts is not None and box_counts[idx] > 0)
+
+    def _on_proposals_ready(self, batch):
+        # Called from a pool callback thread; redraw on the Tk thread if the current image is done
+        if self.current in batch:
+            self._post_to_tk(lambda: self.show_image(self.current))
+
+    def _proposal_label(self, proposal):
+        """Map a detector label (name or class index) onto the project's label list"""
+        label = proposal[0]
+        if isinstance(label, int) and 0 <= label < len(self.label_list):
+            return self.label_list[label]
+        if label in self.label_list:
+            return label
+        return self.current_label.get()
+
+    def accept_suggestions(self):
+        """Turn every suggestion on the current image into an annotation"""
+        if not self.preannotator or not self.image_files:
+            return
+        proposals = self.preannotator.get(self.current)
+        if proposals:
+            # One edit for the whole batch, so a single undo takes it back
+            img_name = self.image_files.name(self.current)
+            new_anns = []
+            for proposal in proposals:
+                _, x1, y1, x2, y2, _ = proposal
+                label = self._proposal_label(proposal)
+                new_anns.append({"shape": "Rectangle", "points": [(x1, y1), (x2, y2)], "label": label,
+                                 "color": self.get_label_color(label)})
+            anns = self.annotations_per_image.setdefault(img_name, [])
+            anns.extend(new_anns)
+            self.history.record("accept", [(img_name, len(anns) - len(new_anns), (), tuple(new_anns))])
+            self._on_annotations_changed(img_name)
+            self.update_annotation_count()
+        self.preannotator.discard(self.current)
+        self.show_image(self.current)
+
+    def reject_suggestions(self):
+        if not self.preannotator or not self.image_files:
+            return
+        self.preannotator.discard(self.current)
+        self.show_image(self.current)
+
+    def accept_suggestion_at(self, event):
+        """Accept the smallest suggestion under the cursor"""
+        if not self.preannotator or self._current_image() is None:
+            return
+        x, y = self.get_image_coords(event.x, event.y)
+        hits = [p for p in self.preannotator.get(self.current) if p[1] <= x <= p[3] and p[2] <= y <= p[4]]
+        if not hits:
+            return
+        proposal = min(hits, key=lambda p: (p[3] - p[1]) * (p[4] - p[2]))
+        self._accept_proposal(proposal)
+        self.preannotator.discard(self.current, proposal)
+        self.current_points = []
+        self.show_image(self.current)
+
+    def _accept_proposal(self, proposal):
+        _, x1, y1, x2, y2, _ = proposal
+        self.add_annotation("Rectangle", [(x1, y1), (x2, y2)], label=self._proposal_label(proposal))
+
+    def _composite_overlay(self, index, img_name, anns, resized_img, scale):
+        """Resized image with every box drawn in, cached until the annotations or view change"""
+        key = (index, resized_img.size, self.annotation_versions.get(img_name, 0), id(anns), len(anns))
+        composited = self.overlay_cache.get(key)
+        if composited is None:
+            colors = {label: self.get_label_color(label) for label in {ann["label"] for ann in anns}}
+            layer = core.render_box_overlay(resized_img.size, anns, scale, colors)
+            composited = Image.alpha_composite(resized_img.convert("RGBA"), layer)
+            self.overlay_cache = {key: composited}  # Only the current view is worth keeping
+        return composited
+
+    def _get_box_grid(self):
+        """Spatial index over the current image's boxes, rebuilt when stale"""
+        img_name = self.image_files.name(self.current)
+        if self.box_grid is None or self.box_grid_image != img_name:
+            self.box_grid = core.BoxGrid.build(self.annotations_per_image.get(img_name, []))
+            self.box_grid_image = img_name
+        return self.box_grid
+
+    def _to_canvas(self, x, y):
+        img_x, img_y, scale = self.view_transform
+        return img_x + x * scale, img_y + y * scale
+
+    def _selection_handles(self):
+        """Handle name -> image coordinates for the selected box"""
+        x1, y1, x2, y2 = core.normalized_box(self.selected_ann)
+        xm, ym = (x1 + x2) / 2, (y1 + y2) / 2
+        return {"nw": (x1, y1), "n": (xm, y1), "ne": (x2, y1), "e": (x2, ym),
+                "se": (x2, y2), "s": (xm, y2), "sw": (x1, y2), "w": (x1, ym)}
+
+    def _handle_at(self, x, y):
+        """The selected box's resize handle under (x, y), "move" inside it, else None"""
+        if self.selected_ann is None:
+            return None
+        tolerance = 6 / self.view_transform[2]  # Handles are about 12 screen pixels wide
+        for name, (hx, hy) in self._selection_handles().items():
+            if abs(x - hx) <= tolerance and abs(y - hy) <= tolerance:
+                return name
+        x1, y1, x2, y2 = core.normalized_box(self.selected_ann)
+        return "move" if x1 <= x <= x2 and y1 <= y <= y2 else None
+
+    def _edited_box(self, x, y):
+        """Box the selected annotation would have if the current drag ended at (x, y)"""
+        x1, y1, x2, y2 = core.normalized_box(self.selected_ann)
+        img_w, img_h = self._current_image().size
+        if self.edit_mode == "move":
+            dx = min(max(x - self.edit_start[0], -x1), img_w - x2)
+            dy = min(max(y - self.edit_start[1], -y1), img_h - y2)
+            return x1 + dx, y1 + dy, x2 + dx, y2 + dy
+        if "w" in self.edit_mode:
+            x1 = x
+        if "e" in self.edit_mode:
+            x2 = x
+        if "n" in self.edit_mode:
+            y1 = y
+        if "s" in self.edit_mode:
+            y2 = y
+        return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+    def _update_edit_preview(self, x, y):
+        x1, y1, x2, y2 = self._edited_box(x, y)
+        coords = self._to_canvas(x1, y1) + self._to_canvas(x2, y2)
+        self.canvas.delete("edit_preview")
+        self.canvas.create_rectangle(*coords, outline=self.theme["warning"], dash=(2, 2), width=2, tags="edit_preview")
+
+    def _finish_edit(self, x, y):
+        x1, y1, x2, y2 = self._edited_box(x, y)
+        self.edit_mode = None
+        self.canvas.delete("edit_preview")
+        if (x1, y1, x2, y2) != core.normalized_box(self.selected_ann) and x2 - x1 > 1 and y2 - y1 > 1:
+            self._replace_annotation(self.selected_ann, dict(self.selected_ann, points=[(x1, y1), (x2, y2)]))
+
+    def _replace_annotation(self, old, new):
+        """Swap an annotation of the current image for an edited copy, as one undo step.
+
+        Annotations are never mutated in place, which keeps saved snapshots valid.
+        """
+        img_name = self.image_files.name(self.current)
+        anns = self.annotations_per_image.get(img_name, [])
+        for i, ann in enumerate(anns):
+            if ann is old:
+                anns[i] = new
+                break
+        else:
+            return
+        grid = self._get_box_grid()
+        grid.remove(old)
+        grid.insert(new)
+        self.history.record("relabel" if new["label"] != old["label"] else "move", [(img_name, i, (old,), (new,))])
+        self.selected_ann = new
+        self._on_annotations_changed(img_name, box_grid_updated=True)
+        self.show_image(self.current)
+
+    def delete_selected_annotation(self):
+        if self.selected_ann is None or not self.image_files:
+            return
+        img_name = self.image_files.name(self.current)
+        anns = self.annotations_per_image.get(img_name, [])
+        for position, ann in enumerate(anns):
+            if ann is self.selected_ann:
+                del anns[position]
+                break
+        else:
+            return
+        self._get_box_grid().remove(self.selected_ann)
+        self.history.record("delete", [(img_name, position, (self.selected_ann,), ())])
+        self.selected_ann = None
+        self.hovered_ann = None
+        self._on_annotations_changed(img_name, box_grid_updated=True)
+        self.show_image(self.current)
+
+    def on_canvas_motion(self, event):
+        """Highlight the box under the cursor and show resize cursors over handles"""
+        if self._current_image() is None or self.current_points or self.edit_mode:
+            return
+        x, y = self.get_image_coords(event.x, event.y)
+        handle = self._handle_at(x, y)
+        self.canvas.config(cursor="fleur" if handle == "move" else "sizing" if handle else "")
+        hits = self._get_box_grid().hit(x, y)
+        hovered = hits[0] if hits else None
+        if hovered is not self.hovered_ann:
+            self.hovered_ann = hovered
+            self._draw_hover()
+
+    def _draw_hover(self):
+        self.canvas.delete("hover")
+        if self.hovered_ann is None or self.hovered_ann is self.selected_ann:
+            return
+        x1, y1, x2, y2 = core.normalized_box(self.hovered_ann)
+        self.canvas.create_rectangle(*self._to_canvas(x1, y1), *self._to_canvas(x2, y2),
+                                     outline=self.theme["light"], width=3, tags="hover")
+
+    def _draw_selection(self):
+        self.canvas.delete("selection")
+        if self.selected_ann is None:
+            return
+        x1, y1, x2, y2 = core.normalized_box(self.selected_ann)
+        self.canvas.create_rectangle(*self._to_canvas(x1, y1), *self._to_canvas(x2, y2),
+                                     outline=self.theme["warning"], width=2, tags="selection")
+        for hx, hy in self._selection_handles().values():
+            cx, cy = self._to_canvas(hx, hy)
+            self.canvas.create_rectangle(cx - 4, cy - 4, cx + 4, cy + 4, fill=self.theme["warning"],
+                                         outline="white", tags="selection")
+
+    def join_work_queue(self):
+        """Label this project together with other annotators through a shared, leased work queue"""
+        if not self.image_files or not self.o_path:
+            return
+        if self.work_queue:
+            messagebox.showinfo("Work Queue", f"Already working as {self.work_queue.annotator}")
+            return
+        name = simpledialog.askstring("Work Queue", "Annotator name (letters, digits, _ and -):", parent=self.root,
+                                      initialvalue=re.sub(r"[^A-Za-z0-9_-]", "_", getpass.getuser()))
+        if not name:
+            return
+        try:
+            self.work_queue = core.WorkQueue(self.o_path, name.strip(), lease_seconds=self.lease_minutes * 60,
+                                             offsets=self.queue_offsets)
+            self.work_queue.populate(self.image_files.names)
+        except Exception as e:
+            self.work_queue = None
+            messagebox.showerror("Error", f"Failed to join the work queue: {str(e)}")
+            return
+        # The edit journal is per project folder, which every annotator now shares; finished
+        # images are kept durable by the queue's shard files instead until leave_work_queue
+        self.history.close()
+        self.merge_queue()
+        self._renew_leases()
+        self._claim_next()
+
+    def leave_work_queue(self, resume_journal=True):
+        """Hand unfinished claims back to the queue, and go back to journaling edits"""
+        if not self.work_queue:
+            return
+        if self.lease_timer:
+            self.root.after_cancel(self.lease_timer)
+            self.lease_timer = None
+        try:
+            self.work_queue.release()
+            self.work_queue.close()
+        except Exception as e:
+            print(f"Error leaving the work queue: {str(e)}")
+        self.work_queue = None
+        self.statusBar.config(text="Left the work queue")
+        if resume_journal and self.journal_edits and self.o_path:
+            # Edits made in the queue were not journaled, so replay needs a project saved from here on;
+            # the autosave compacts the journal once it is written
+            self.history.open_journal(os.path.join(self.o_path, "edits.journal"), self.history.seq)
+            self.autosave()
+
+    def finish_queue_image(self):
+        """Submit the current image to the work queue and go to the next claimed one"""
+        if not self.work_queue or not self.image_files:
+            return
+        img_name = self.image_files.name(self.current)
+        if not self.work_queue.complete(img_name, self.annotations_per_image.get(img_name, [])):
+            messagebox.showwarning("Work Queue", f"{img_name} is not leased to you. Its lease may have "
+                                   "expired and been claimed by another annotator.")
+        self._claim_next()
+
+    def merge_queue(self):
+        """Pull in images other annotators have finished since the last merge"""
+        if not self.work_queue:
+            return
+        previous = self.work_queue.merge(self.annotations_per_image, self.get_label_color)
+        self.history.record("merge", [(img_name, 0, old, tuple(self.annotations_per_image[img_name]))
+                                      for img_name, old in previous.items()])
+        self._on_many_annotations_changed(previous)
+        if previous:
+            self.update_label_counts()
+            self.show_image(self.current)
+
+    def _claim_next(self):
+        """Show this annotator's next claimed image, claiming a new batch when none are left"""
+        claimed = self.work_queue.claimed()
+        if not claimed:
+            self.merge_queue()
+            claimed = self.work_queue.claim(self.queue_batch_size)
+        # Images missing from this annotator's input folder go straight back to the queue
+        unknown = [img_name for img_name in claimed if self.image_files.index_of(img_name) is None]
+        if unknown:
+            self.work_queue.release(unknown)
+            claimed = [img_name for img_name in claimed if self.image_files.index_of(img_name) is not None]
+        counts = self.work_queue.progress()
+        self.loadingStatusBar.config(text=f"Queue: {len(claimed)} claimed by {self.work_queue.annotator} | "
+                                          f"{counts['done']} done, {counts['todo']} to do")
+        if not claimed:
+            self.statusBar.config(text="Work queue finished: no images left to claim")
+            return
+        self.jump_to_image(self.image_files.index_of(claimed[0]))
+
+    def _renew_leases(self):
+        """Keep this annotator's claims alive while the session is open"""
+        self.lease_timer = None
+        if not self.work_queue:
+            return
+        try:
+            self.work_queue.renew()
+        except Exception as e:
+            print(f"Lease renewal error: {str(e)}")
+        self.lease_timer = self.root.after(self.work_queue.lease_seconds * 1000 // 3, self._renew_leases)
+
+    def jump_to_image(self, idx):
+        """Show the image at idx, or report that a jump query found nothing"""
+        if idx is None:
+            self.statusBar.config(text="No matching image found")
+            return
+        self.current = idx
+        self._prefetch_around(self.current)
+        self.show_image(self.current)
+
+    def jump_to_unannotated(self, step=1):
+        if self.nav_index:
+            self.jump_to_image(self.nav_index.next_unannotated(self.current, step))
+
+    def jump_to_label(self, label=None, step=1):
+        if self.nav_index:
+            label = label or self.current_label.get()
+            self.jump_to_image(self.nav_index.next_with_label(label, self.current, step))
+
+    def jump_to_min_boxes(self):
+        if not self.nav_index:
+            return
+        min_boxes = simpledialog.askinteger("Jump", "Show the next image with more than N boxes:",
+                                            parent=self.root, minvalue=0, initialvalue=0)
+        if min_boxes is not None:
+            self.jump_to_image(self.nav_index.next_with_min_boxes(min_boxes, self.current))
+
+    def jump_to_filename(self):
+        if not self.nav_index:
+            return
+        prefix = simpledialog.askstring("Find", "Filename starts with:", parent=self.root)
+        if prefix:
+            self.jump_to_image(self.nav_index.find_prefix(prefix))
+
+    def _on_annotations_changed(self, img_name, box_grid_updated=False):
+        """Keep derived indexes in sync after an image's annotations change"""
+        self.annotation_changes += 1
+        self.annotation_versions[img_name] = self.annotation_versions.get(img_name, 0) + 1
+        if self.rebuild_changes is not None:
+            self.rebuild_changes.add(img_name)
+        if not box_grid_updated and img_name == self.box_grid_image:
+            self.box_grid = None  # Rebuilt on the next hit test
+            self.selected_ann = None
+            self.hovered_ann = None
+        if self.nav_index is not None:
+            idx = self.image_files.index_of(img_name)
+            if idx is not None:
+                self.nav_index.update(idx, self.annotations_per_image.get(img_name, ()))
+        if self.stats is not None:
+            self.stats.update(img_name, self.annotations_per_image.get(img_name, ()))
+        if self.stats_window:
+            self.stats_window.refresh()
+
+    def _on_many_annotations_changed(self, img_names, indexes=None):
+        """_on_annotations_changed for an edit of many images at once.
+
+        indexes, a (NavigationIndex, DatasetStats) pair already built from the edited
+        annotations, is swapped in. Without one, an edit of more than
+        bulk_refresh_images images rebuilds both in one pass on a worker thread,
+        since updating them image by image would hold up the Tk thread.
+        """
+        if indexes is None and len(img_names) <= self.bulk_refresh_images:
+            for img_name in img_names:
+                self._on_annotations_changed(img_name)
+            return
+        self.annotation_changes += 1
+        for img_name in img_names:
+            self.annotation_versions[img_name] = self.annotation_versions.get(img_name, 0) + 1
+        if self.box_grid_image in img_names:
+            self.box_grid = None  # Rebuilt on the next hit test
+            self.selected_ann = None
+            self.hovered_ann = None
+        if indexes is not None:
+            if self.rebuild_changes is not None:
+                self.rebuild_superseded = True  # The running rebuild read the annotations before this edit
+            self._swap_indexes(*indexes)
+        elif self.nav_index is not None:
+            self._rebuild_indexes()
+
+    @staticmethod
+    def _build_indexes(annotations, image_files):
+        nav_index = core.NavigationIndex(image_files)
+        nav_index.rebuild(annotations)
+        stats = core.DatasetStats()
+        stats.rebuild(annotations, image_files)
+        return nav_index, stats
+
+    def _rebuild_indexes(self):
+        """Rebuild the NavigationIndex and DatasetStats on a worker thread, then swap them in.
+
+        Images edited meanwhile still update the old indexes, and are replayed onto
+        the new ones before the swap.
+        """
+        if self.rebuild_changes is not None:
+            self.rebuild_superseded = True
+            return
+        self.rebuild_changes = rebuild_changes = set()
+        annotations, image_files = self.annotations_per_image, self.image_files
+
+        def worker():
+            try:
+                indexes = self._build_indexes(annotations, image_files)
+            except Exception as e:
+                print(f"Index rebuild error: {e}")  # Also raised if images were added mid-read
+                indexes = None
+            self._post_to_tk(lambda: self._on_indexes_rebuilt(annotations, image_files, rebuild_changes, indexes))
+
+        self.loadingStatusBar.config(text="Updating statistics...")
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_indexes_rebuilt(self, annotations, image_files, rebuild_changes, indexes):
+        # A failed read is retried only if edits may have caused it
+        rerun = self.rebuild_superseded or (indexes is None and bool(rebuild_changes))
+        self.rebuild_changes, self.rebuild_superseded = None, False
+        if rerun and self.nav_index is not None:
+            self._rebuild_indexes()
+            return
+        if annotations is not self.annotations_per_image or image_files is not self.image_files or indexes is None:
+            return  # Another project was loaded meanwhile, with indexes of its own
+        nav_index, stats = indexes
+        for img_name in rebuild_changes:
+            # The worker may have read either version of these, so bring both up to date
+            anns = self.annotations_per_image.get(img_name, ())
+            idx = self.image_files.index_of(img_name)
+            if idx is not None:
+                nav_index.update(idx, anns)
+            stats.update(img_name, anns)
+        self._swap_indexes(nav_index, stats)
+        self.loadingStatusBar.config(text="Statistics updated")
+
+    def _swap_indexes(self, nav_index, stats):
+        self.nav_index, self.stats = nav_index, stats
+        self.update_label_counts()
+        if self.stats_window:
+            self.stats_window.refresh()
+
+    def build_duplicate_index(self):
+        """Hash the input folder in the background and cluster near-duplicate images"""
+        if not self.image_files:
+            return
+        index = core.DuplicateIndex(self.o_path)
+        image_files = self.image_files
+        
+        # Runs on the hashing thread, so progress and results go through _post_to_tk
+        def report(done, total):
+            self._post_to_tk(lambda: self.loadingStatusBar.config(text=f"Hashing images: {done}/{total}"))
+            
+        def worker():
+            try:
+                index.build(image_files, progress=report)
+            except Exception as e:
+                print(f"Duplicate index error: {e}")
+                message = f"Failed to find duplicates: {str(e)}"  # e is unbound once the except block ends
+                self._post_to_tk(lambda: messagebox.showerror("Error", message))
+                return
+            self._post_to_tk(lambda: self._on_duplicate_index_ready(index))
+            
+        self.loadingStatusBar.config(text="Hashing images...")
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_duplicate_index_ready(self, index):
+        self.duplicate_index = index
+        clusters = len(set(index.groups.values()))
+        redundant = sum(1 for name in index.groups if index.is_redundant(name))
+        self.loadingStatusBar.config(text=f"{clusters} duplicate clusters, {redundant} redundant images")
+        self.show_image(self.current)
 
     def navigate_image(self, step):
         if not self.image_files:
             return
             
         # Calculate new index with bounds checking
+        previous = self.current
         new_index = (self.current + step) % len(self.image_files)
+        
+        # Step over near-duplicates of an earlier image if requested
+        if self.skip_duplicates.get() and self.duplicate_index:
+            for _ in range(len(self.image_files)):
+                if not self.duplicate_index.is_redundant(self.image_files.name(new_index)):
+                    break
+                new_index = (new_index + step) % len(self.image_files)
         self.current = new_index
         
-        # Load batch of images around new index
-        self.load_image_batch(self.current)
+        # Re-centre prefetching on the new image, weighted toward the direction of travel
+        self._prefetch_around(self.current, 1 if step > 0 else -1)
+        
+        # Carry boxes forward onto an unlabeled next frame, once both frames are decoded
+        self.pending_propagation = None
+        if (self.auto_propagate.get() and new_index == previous + 1
+                and not self.annotations_per_image.get(self.image_files.name(new_index))):
+            if previous in self.images and new_index in self.images:
+                self.propagate_from_previous(refresh=False)
+            else:
+                self.pending_propagation = new_index
         
         # Show new image
         self.show_image(self.current)
@@ -1031,29 +2381,18 @@ Image Annotator Pro - Quick Help
             print(f"Warning: High memory usage: {mem_usage:.1f}MB")
 
     def load_images(self):
-        """Load image paths and initialize the first batch of images"""
-        # Get list of image files
-        extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
-        self.image_files = [os.path.join(self.i_path, f) for f in os.listdir(self.i_path)
-                           if f.lower().endswith(extensions)]
-        self.image_files.sort()
-        
-        if not self.image_files:
-            messagebox.showerror("Error", "No valid images found in the input directory")
-            return
-
-        self.current = 0
-        self.images = {}  # Dictionary to store loaded images
-        self.load_image_batch(self.current)  # Load initial batch
-        self.show_image(self.current)
-        self.statusBar.config(text=f"Image 1 of {len(self.image_files)}")
         """Load images with optimizations for handling large datasets"""
-        # Reset existing values
-        self.images = {}  # Change to dictionary for lazy loading
-        self.image_files = []
+        # Reset existing values; prefetch threads still holding the old cache fill that one, not this
+        self.leave_work_queue(resume_journal=False)
+        if self.prefetcher:
+            self.prefetcher.close()
+            self.prefetcher = None
+        self.pending_propagation = None
+        self.images.close()
+        self.images = core.ImageCache(self._decode_image)
+        self.image_files = core.DatasetIndex()
         self.current = 0
         self.resized_images_cache = {}
-        self.total_loaded = 0
         
         try:
             # Create progress window
@@ -1079,50 +2418,45 @@ Image Annotator Pro - Quick Help
             progress_bar = ttk.Progressbar(progress_frame, mode='determinate', length=200)
             progress_bar.grid(row=1, column=0)
             
-            valid_extensions = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
-            file_list = []
+            # Scan directory with progress update (the total is unknown until the scan ends)
+            progress_bar.config(mode='indeterminate')
             
-            # Scan directory with progress update
-            all_files = os.listdir(self.i_path)
-            for i, f in enumerate(all_files):
-                if os.path.isfile(os.path.join(self.i_path, f)) and f.lower().endswith(valid_extensions):
-                    file_list.append(f)
-                progress_bar['value'] = (i + 1) / len(all_files) * 100
+            def scan_progress(scanned):
+                progress_label.config(text=f"Scanning image files... {scanned}")
+                progress_bar.step()
                 progress_window.update()
-            # Sort files alphabetically
-            file_list.sort()
-            
-            # Create full paths
-            self.image_files = [os.path.join(self.i_path, f) for f in file_list]
+                
+            self.image_files = core.DatasetIndex.scan(self.i_path, progress=scan_progress)
+            progress_bar.config(mode='determinate')
             
             if not self.image_files:
                 messagebox.showwarning("Warning", "No valid images found in selected directory")
                 progress_window.destroy()
                 return
                 
-            # Update progress message
-            progress_label.config(text=f"Found {len(self.image_files)} images\nPreloading first few images...")
-            progress_window.update()
-            
-            # Preload first few images for faster initial display
-            for i in range(min(5, len(self.image_files))):
-                self._load_image(i)
-                progress_bar['value'] = (i + 1) / min(5, len(self.image_files)) * 100
-                progress_window.update()
-            
             progress_window.destroy()
             
-            # Start background loading
-            self.loading_thread = threading.Thread(target=self._background_loader,
-                                                daemon=True)
-            self.loading_thread.start()
+            # Decode the first images in the background; show_image draws a placeholder until they land
+            self.prefetcher = core.PrefetchScheduler(self.images, len(self.image_files),
+                                                     on_loaded=self._on_image_prefetched)
+            self._prefetch_around(0, 1)
             
             # Update UI
             self.root.update_idletasks()
             self.canvas.after(100, lambda: self.show_image(0))
             
-            # Try to load existing annotations
+            # Try to load existing annotations, plus any edits a crash kept from being saved
             self.try_load_existing_annotations()
+            self._open_edit_history()
+            self.overlay_cache = {}
+            self.proxy_sizes = {}
+            self.nav_index = core.NavigationIndex(self.image_files)
+            self.nav_index.rebuild(self.annotations_per_image)
+            self.stats = core.DatasetStats()
+            self.stats.rebuild(self.annotations_per_image, self.image_files)
+            self.update_label_counts()
+            if self.stats_window:
+                self.stats_window.refresh()
             
             # Start progress updater
             self._update_loading_progress()
@@ -1132,112 +2466,81 @@ Image Annotator Pro - Quick Help
             if 'progress_window' in locals():
                 progress_window.destroy()
 
-    def _load_image(self, index):
-        """Load a single image at the specified index with memory optimization"""
-        if index not in self.images and 0 <= index < len(self.image_files):
-            try:
-                # Check current memory usage
-                current_mem = self.calculate_memory_usage()
-                if current_mem > 2000:  # If over 2GB
-                    # Force cleanup of distant images
-                    self.cleanup_distant_images(index, buffer=50)  # Reduced buffer during high memory
-                
-                # Open image and convert to RGB to ensure it's loaded into memory
-                with Image.open(self.image_files[index]) as img:
-                    # Determine if we should downsample the image
-                    target_max_dim = 1920  # Max dimension for large images
-                    orig_w, orig_h = img.size
-                    scale = min(1.0, target_max_dim / max(orig_w, orig_h))
-                    
-                    if scale < 1.0:
-                        new_w = int(orig_w * scale)
-                        new_h = int(orig_h * scale)
-                        img = img.resize((new_w, new_h), Image.LANCZOS)
-                    
-                    # Convert to RGB if necessary
-                    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-                        rgb_img = img.convert('RGB')
-                    else:
-                        rgb_img = img.copy()
-                    
-                self.images[index] = rgb_img
-                self.total_loaded += 1
-                
-                # Clear resize cache if it's getting too large
-                if len(self.resized_images_cache) > 10:
-                    self.resized_images_cache.clear()
-                    
-                return rgb_img
-                
-            except Exception as e:
-                print(f"Error loading image {self.image_files[index]}: {e}")
-                return None
-                
-        return self.images.get(index)
+    def _decode_image(self, index):
+        return core.decode_proxy(*self.image_files.source(index))
 
-    def _background_loader(self):
-        """Background thread for loading remaining images with memory management"""
-        try:
-            # Initialize variables for adaptive batch loading
-            batch_size = 10
-            min_batch_size = 5
-            max_batch_size = 20
-            mem_threshold = 1500  # MB
-            
-            for i in range(0, len(self.image_files), batch_size):
-                if not hasattr(self, 'loading_thread'):
-                    break  # Stop if window is closed
-                
-                # Check memory usage and adjust batch size
-                current_mem = self.calculate_memory_usage()
-                if current_mem > mem_threshold:
-                    # Reduce batch size if memory usage is high
-                    batch_size = max(min_batch_size, batch_size - 5)
-                    # Force cleanup of distant images
-                    self.cleanup_distant_images(self.current, buffer=50)
-                    # Wait for memory to be freed
-                    time.sleep(0.5)
-                else:
-                    # Increase batch size if memory usage is low
-                    batch_size = min(max_batch_size, batch_size + 1)
-                
-                # Load next batch
-                batch_end = min(i + batch_size, len(self.image_files))
-                for j in range(i, batch_end):
-                    if j not in self.images:
-                        self._load_image(j)
-                        
-                        # Update progress in status bar
-                        if hasattr(self, 'loadingStatusBar'):
-                            self.root.after(0, lambda: self.loadingStatusBar.config(
-                                text=f"Loading images: {self.total_loaded}/{len(self.image_files)}"
-                            ))
-                
-                # Adaptive delay based on memory pressure
-                delay = 0.1 if current_mem < mem_threshold else 0.5
-                time.sleep(delay)
-                
-        except Exception as e:
-            print(f"Background loader error: {e}")
-            
-        finally:
-            # Update status when done
-            if hasattr(self, 'statusBar'):
-                self.root.after(0, lambda: self.statusBar.config(
-                    text=f"All {len(self.image_files)} images indexed"
-                ))
+    def _current_image(self):
+        """The current image if it has been decoded, else None"""
+        return self.images.get(self.current) if self.image_files else None
+
+    def _prefetch_around(self, index, direction=None):
+        """Point the prefetcher at index and drop decoded images outside its window"""
+        if not self.prefetcher:
+            return
+        self.prefetcher.focus(index, direction)
+        window = self.prefetcher.window(index)
+        # Keep a little slack around the window so stepping back and forth does not re-decode,
+        # less of it when memory is tight
+        slack = 8 if self.calculate_memory_usage() > 2000 else self.prefetcher.radius
+        self.images.evict_outside(window.start - slack, window.stop - 1 + slack)
+
+    def _on_image_prefetched(self, index):
+        """Prefetch thread callback: redraw if the image the user is waiting on just arrived"""
+        if index == self.current:
+            self._post_to_tk(lambda: self._show_prefetched(index))
+
+    def _show_prefetched(self, index):
+        if index != self.current or index not in self.images:
+            return
+        if self.pending_propagation == index and self.current - 1 in self.images:
+            self.pending_propagation = None
+            self.propagate_from_previous(refresh=False)
+        self.show_image(index)
+
+    def _loading_status(self):
+        pending = self.prefetcher.pending() if self.prefetcher else 0
+        status = f"{len(self.images)} images decoded"
+        return status + (f", {pending} queued" if pending else "")
 
     def _update_loading_progress(self):
-        """Update status bar with loading progress"""
-        if hasattr(self, 'loadingStatusBar') and self.total_loaded < len(self.image_files):
-            self.loadingStatusBar.config(text=f"Loading images: {self.total_loaded}/{len(self.image_files)}")
+        """Update status bar with prefetch progress until the queue drains"""
+        if not hasattr(self, 'loadingStatusBar'):
+            return
+        self.loadingStatusBar.config(text=self._loading_status())
+        if self.prefetcher and self.prefetcher.pending():
             self.root.after(1000, self._update_loading_progress)
-        elif hasattr(self, 'loadingStatusBar'):
-            self.loadingStatusBar.config(text="All images loaded")
+
+    def _open_edit_history(self):
+        """Start a fresh undo history and replay journaled edits the project file is missing"""
+        self.history.close()
+        self.history = core.EditHistory(self.undo_budget_mb * 1024 * 1024)
+        if not self.journal_edits or not self.o_path:
+            return
+        journal_path = os.path.join(self.o_path, "edits.journal")
+        try:
+            recovered, last_seq = core.replay_journal(journal_path, self.annotations_per_image,
+                                                      self.journal_seq, self.get_label_color)
+        except Exception as e:
+            print(f"Error replaying edit journal: {str(e)}")
+            messagebox.showwarning("Warning", f"Could not recover unsaved edits: {str(e)}")
+            recovered, last_seq = 0, self.journal_seq
+            try:
+                os.replace(journal_path, journal_path + ".bad")
+            except OSError as e:
+                # Appending to a journal that cannot be replayed would only add to the mess
+                print(f"Error setting aside the edit journal: {str(e)}")
+                self.loadingStatusBar.config(text="Edit journal disabled: the old journal could not be moved")
+                return
+        self.history.open_journal(journal_path, last_seq)
+        self.history.compact(self.journal_seq)
+        if recovered:
+            self.loadingStatusBar.config(text=f"Recovered {recovered} unsaved edits from the edit journal")
 
     def try_load_existing_annotations(self):
         # First clear any existing annotations to prevent duplicates
         self.annotations_per_image = {}
+        self.journal_seq = 0
+        self.queue_offsets = {}
         
         # Check for both CSV and JSON project files
         csv_path = os.path.join(self.o_path, "annotations.csv")
@@ -1246,12 +2549,13 @@ Image Annotator Pro - Quick Help
         # First try loading from project.json as it contains more metadata
         if os.path.exists(json_path):
             try:
-                with open(json_path, 'r') as f:
-                    project_data = json.load(f)
-                    self.annotations_per_image = project_data.get('annotations', {})
-                    self.label_colors = project_data.get('label_colors', {})
-                    print(f"Loaded {len(self.annotations_per_image)} annotated images from project file")
-                    return
+                project_data = core.read_project_json(json_path)
+                self.annotations_per_image = project_data.get('annotations', {})
+                self.label_colors = project_data.get('label_colors', {})
+                self.journal_seq = project_data.get('journal_seq', 0)
+                self.queue_offsets = project_data.get('queue_offsets', {})
+                print(f"Loaded {len(self.annotations_per_image)} annotated images from project file")
+                return
             except Exception as e:
                 print(f"Error loading project file: {str(e)}")
                 self.annotations_per_image = {}  # Reset annotations if error
@@ -1259,253 +2563,190 @@ Image Annotator Pro - Quick Help
         # Fall back to CSV if no project file or error loading it
         if os.path.exists(csv_path):
             try:
-                with open(csv_path, "r", newline="") as file:
-                    reader = DictReader(file)
-                    for row in reader:
-                        img_name = row["image"]
-                        x1 = float(row["x1"])
-                        y1 = float(row["y1"])
-                        x2 = float(row["x2"])
-                        y2 = float(row["y2"])
-                        label = row["label"]
-                        shape = row["shape"]
-                        
-                        # Create annotation
-                        color = self.get_label_color(label)
-                        ann = {
-                            "shape": shape,
-                            "points": [(x1, y1), (x2, y2)],
-                            "label": label,
-                            "color": color
-                        }
-                        
-                        # Add to annotations
-                        if img_name not in self.annotations_per_image:
-                            self.annotations_per_image[img_name] = []
-                        self.annotations_per_image[img_name].append(ann)
-                
+                self.annotations_per_image = core.read_annotations_csv(csv_path, self.get_label_color)
                 print(f"Loaded {len(self.annotations_per_image)} annotated images from CSV file")
+                return
             except Exception as e:
                 print(f"Error loading CSV annotations: {str(e)}")
                 messagebox.showwarning("Warning", f"Failed to load existing annotations: {str(e)}")
                 self.annotations_per_image = {}  # Reset annotations if error
+                return
+        
+        # Finally, seed the project from an existing YOLO labels/ directory
+        self.try_import_yolo_labels()
 
-    def save_annotations(self):
-        if not self.images:
-            messagebox.showwarning("Warning", "No images loaded")
+    def try_import_yolo_labels(self):
+        """Import annotations from YOLO label files next to the input or output folder"""
+        roots = [self.o_path, self.i_path]
+        if os.path.basename(os.path.normpath(self.i_path)) == "images":
+            roots.append(os.path.dirname(os.path.normpath(self.i_path)))
+        label_dirs, classes_path = core.find_yolo_labels(*roots)
+        if not label_dirs:
             return
             
         try:
-            # Prepare rows for CSV
-            rows = []
-            for img_name, anns in self.annotations_per_image.items():
-                for ann in anns:
-                    (x1, y1), (x2, y2) = ann["points"]
-                    rows.append({
-                        "image": img_name,
-                        "x1": x1,
-                        "y1": y1,
-                        "x2": x2,
-                        "y2": y2,
-                        "label": ann["label"],
-                        "shape": ann["shape"]
-                    })
-            
-            if not rows:
-                messagebox.showinfo("Info", "No annotations to save")
+            # Class IDs are defined by classes.txt, so it fixes the order of the label list
+            class_names = core.read_class_names(classes_path) if classes_path else list(self.label_list)
+            annotations = core.import_yolo_labels(self.image_files, label_dirs, class_names)
+            if not annotations:
                 return
                 
-            # Save to CSV using temporary file approach
-            csv_path = os.path.join(self.o_path, "annotations.csv")
-            temp_csv_path = csv_path + ".tmp"
-            
-            try:
-                fieldnames = ["image", "x1", "y1", "x2", "y2", "label", "shape"]
-                with open(temp_csv_path, "w", newline="") as file:
-                    writer = DictWriter(file, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(rows)
+            # Assign colors once per label rather than once per box
+            colors = {}
+            for anns in annotations.values():
+                for ann in anns:
+                    label = ann["label"]
+                    if label not in colors:
+                        colors[label] = self.get_label_color(label)
+                    ann["color"] = colors[label]
                     
-                # Only after successful write, replace the old file
-                if os.path.exists(csv_path):
-                    os.remove(csv_path)
-                os.rename(temp_csv_path, csv_path)
-                
-            except Exception as e:
-                # Clean up temp file if something went wrong
-                if os.path.exists(temp_csv_path):
-                    try:
-                        os.remove(temp_csv_path)
-                    except:
-                        pass
-                raise e
-                
-            # Save project file using temporary file approach
-            self.save_project_file()
-                
+            self.label_list = class_names + [label for label in self.label_list if label not in class_names]
+            self.label_list += sorted(label for label in colors if label not in self.label_list)
+            self.annotations_per_image = annotations
+            self.refresh_label_widgets()
+            print(f"Imported {len(annotations)} annotated images from YOLO labels")
+        except Exception as e:
+            print(f"Error importing YOLO labels: {str(e)}")
+            messagebox.showwarning("Warning", f"Failed to import YOLO labels: {str(e)}")
+            self.annotations_per_image = {}
+
+    def save_annotations(self):
+        if not self.image_files:
+            messagebox.showwarning("Warning", "No images loaded")
+            return
+            
+        # Every annotator in a work queue saves to the same folder, so include everyone's work
+        self.merge_queue()
+        snapshot = self._snapshot_project()
+        if not any(snapshot["annotations"].values()):
+            messagebox.showinfo("Info", "No annotations to save")
+            return
+            
+        csv_path = os.path.join(self.o_path, "annotations.csv")
+        
+        def on_done(count, error):
+            if error:
+                messagebox.showerror("Error", f"Failed to save annotations: {str(error)}")
+                return
             # Update status
+            self.history.compact(snapshot["journal_seq"])
             self.last_save_time = datetime.now()
             self.autosave_status.config(text=f"Last saved: {self.last_save_time.strftime('%H:%M:%S')}")
+            messagebox.showinfo("Saved", f"Saved {count} annotations to {csv_path}")
             
-            messagebox.showinfo("Saved", f"Saved {len(rows)} annotations to {csv_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save annotations: {str(e)}")
+        self.autosave_status.config(text="Saving...")
+        self.writer.submit(snapshot, csv_path, on_done)
+
+    def _post_to_tk(self, fn):
+        """Run fn on the Tk thread; safe to call from worker threads.
+
+        Tk must only be touched from the thread running mainloop, root.after
+        included, so workers queue fn for _drain_tk_calls instead.
+        """
+        self.tk_calls.put(fn)
+
+    def _drain_tk_calls(self, interval_ms=20):
+        """Run the callbacks queued by _post_to_tk, then poll again. Runs on the Tk thread"""
+        # Only what is queued now, so callbacks that post again wait for the next poll
+        for _ in range(self.tk_calls.qsize()):
+            fn = self.tk_calls.get_nowait()
+            try:
+                fn()
+            except Exception as e:
+                self.root.report_callback_exception(type(e), e, e.__traceback__)
+        self.root.after(interval_ms, self._drain_tk_calls)
+
+    def _snapshot_project(self):
+        """Copy the project state for the background writer.
 
-    def save_project_file(self):
-        # Create project data
-        project_data = {
+        Annotation dicts are never mutated after they are added, so copying each image's
+        list into a tuple is enough to isolate the snapshot from later edits.
+        """
+        return {
             "input_path": self.i_path,
             "output_path": self.o_path,
-            "labels": self.label_list,
-            "annotations": self.annotations_per_image,
-            "label_colors": self.label_colors,
+            "labels": list(self.label_list),
+            "annotations": {img_name: tuple(anns) for img_name, anns in self.annotations_per_image.items()},
+            "label_colors": dict(self.label_colors),
+            "val_split": self.val_split,
+            "anchor_count": self.anchor_count,
+            "anchor_imgsz": self.anchor_imgsz,
+            "train_imgsz": self.train_imgsz,
+            "resize_mode": self.resize_mode,
+            "export_image_format": self.export_image_format,
+            "undo_budget_mb": self.undo_budget_mb,
+            "journal_edits": self.journal_edits,
+            "journal_seq": self.history.seq,
+            "queue_offsets": dict(self.queue_offsets),
+            "detector": self.detector_spec,
+            "cursor": self.image_files.name(self.current) if self.image_files else None,
             "last_saved": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
-        
-        # Save as JSON using temporary file approach
-        project_path = os.path.join(self.o_path, "project.json")
-        temp_project_path = project_path + ".tmp"
-        
-        try:
-            # Save to temporary file first
-            with open(temp_project_path, "w") as f:
-                json.dump(project_data, f, indent=2)
-                
-            # Only after successful write, replace the old file
-            if os.path.exists(project_path):
-                os.remove(project_path)
-            os.rename(temp_project_path, project_path)
-            
-        except Exception as e:
-            # Clean up temp file if something went wrong
-            if os.path.exists(temp_project_path):
-                try:
-                    os.remove(temp_project_path)
-                except:
-                    pass
-            raise e
 
     def setup_autosave(self):
-        def autosave_worker():
-            while True:
-                interval = getattr(self, 'autosave_interval', 1)
-                time.sleep(interval * 60)  # Use user setting, default 1 min
-                if self.images and self.annotations_per_image:
-                    # Only save if there are annotations and they haven't been saved recently
-                    if not self.last_save_time or (datetime.now() - self.last_save_time).seconds > 30:
-                        self.autosave()
-
-        # Start autosave in a separate thread
-        self.autosave_timer = threading.Thread(target=autosave_worker, daemon=True)
-        self.autosave_timer.start()
+        """Schedule the next autosave on the Tk thread"""
+        if self.autosave_timer:
+            self.root.after_cancel(self.autosave_timer)
+        interval = getattr(self, 'autosave_interval', 1)
+        self.autosave_timer = self.root.after(interval * 60 * 1000, self._autosave_tick)
 
-    def autosave(self):
-        try:
-            # Skip if no annotations
-            any_annotations = any(self.annotations_per_image.values())
-            if not any_annotations:
-                return
+    def _autosave_tick(self):
+        self.autosave_timer = None
+        if self.image_files and self.annotations_per_image:
+            # Only save if there are annotations and they haven't been saved recently
+            if not self.last_save_time or (datetime.now() - self.last_save_time).seconds > 30:
+                self.autosave()
+        self.setup_autosave()
 
-            # Prepare rows for CSV            
-            rows = []
-            for img_name, anns in self.annotations_per_image.items():
-                for ann in anns:
-                    (x1, y1), (x2, y2) = ann["points"]
-                    rows.append({
-                        "image": img_name,
-                        "x1": x1,
-                        "y1": y1,
-                        "x2": x2,
-                        "y2": y2,
-                        "label": ann["label"],
-                        "shape": ann["shape"]
-                    })
-            
-            # Save to CSV
-            autosave_path = os.path.join(self.o_path, "annotations_autosave.csv")
-            fieldnames = ["image", "x1", "y1", "x2", "y2", "label", "shape"]
-            
-            # Use a temporary file to avoid file handle conflicts
-            temp_path = autosave_path + ".tmp"
-            try:
-                with open(temp_path, "w", newline="") as file:
-                    writer = DictWriter(file, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(rows)
-                
-                # Only after successful write, replace the old file
-                if os.path.exists(autosave_path):
-                    os.remove(autosave_path)
-                os.rename(temp_path, autosave_path)
-                
-            except Exception as e:
-                # Clean up temp file if something went wrong
-                if os.path.exists(temp_path):
-                    try:
-                        os.remove(temp_path)
-                    except:
-                        pass
-                raise e
-                
-            # Also save project file using temporary file approach
-            project_path = os.path.join(self.o_path, "project.json")
-            temp_project_path = project_path + ".tmp"
+    def autosave(self):
+        # Skip if no annotations
+        if not any(self.annotations_per_image.values()):
+            return
             
-            try:
-                # Create project data
-                project_data = {
-                    "input_path": self.i_path,
-                    "output_path": self.o_path,
-                    "labels": self.label_list,
-                    "annotations": self.annotations_per_image,
-                    "label_colors": self.label_colors,
-                    "last_saved": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                
-                # Save to temporary file first
-                with open(temp_project_path, "w") as f:
-                    json.dump(project_data, f, indent=2)
-                    
-                # Only after successful write, replace the old file
-                if os.path.exists(project_path):
-                    os.remove(project_path)
-                os.rename(temp_project_path, project_path)
-                
-            except Exception as e:
-                # Clean up temp file if something went wrong
-                if os.path.exists(temp_project_path):
-                    try:
-                        os.remove(temp_project_path)
-                    except:
-                        pass
-                raise e
-                
-            # Update status
+        self.merge_queue()
+        snapshot = self._snapshot_project()
+        
+        def on_done(count, error):
+            if error:
+                # Don't show error dialog for autosave failures to avoid interrupting the user
+                print(f"Autosave error: {error}")
+                return
+            self.history.compact(snapshot["journal_seq"])
             self.last_save_time = datetime.now()
             self.autosave_status.config(text=f"Auto-saved: {self.last_save_time.strftime('%H:%M:%S')}")
             
-        except Exception as e:
-            print(f"Autosave error: {e}")
-            # Don't show error dialog for autosave failures to avoid interrupting the user
+        autosave_path = os.path.join(self.o_path, "annotations_autosave.csv")
+        self.writer.submit(snapshot, autosave_path, on_done)
 
     def on_close(self):
         # Check if there are unsaved changes
+        discard_edits = False
         if self.annotations_per_image and (not self.last_save_time):
             result = messagebox.askyesnocancel("Save Changes", "Save changes before exiting?")
             if result is None:  # Cancel
                 return
             if result:  # Yes
                 self.save_annotations()
+            discard_edits = not result
+                
+        if self.thumbnail_grid:
+            self.thumbnail_grid.cache.close()
+        if self.preannotator:
+            self.preannotator.close()
+        self.leave_work_queue(resume_journal=False)
+            
+        # Let queued saves reach the disk before the window goes away. The edit journal
+        # stays behind unless the user chose not to save, so unsaved edits come back next time
+        self.writer.close(timeout=30)
+        self.history.close(discard=discard_edits)
                 
         # Cleanup resources
         try:
-            # Clear image cache
-            for img in self.images.values():
-                try:
-                    if hasattr(img, 'close'):
-                        img.close()
-                except:
-                    pass
+            # Stop the prefetch and loader threads and drop decoded images
+            if self.prefetcher:
+                self.prefetcher.close()
+            self.images.close()
+            self.images.clear()
                     
             # Clear resize cache
             for img in self.resized_images_cache.values():
@@ -1515,7 +2756,6 @@ Image Annotator Pro - Quick Help
                 except:
                     pass
                     
-            self.images.clear()
             self.resized_images_cache.clear()
             
             # Force garbage collection
@@ -1527,55 +2767,9 @@ Image Annotator Pro - Quick Help
             
         self.root.destroy()
 
-    def load_image_batch(self, center_idx, window_size=100):
-        """Load a batch of images around the given center index"""
-        # Calculate the range of indices to load
-        start_idx = max(0, center_idx - window_size // 2)
-        end_idx = min(len(self.image_files), center_idx + window_size // 2)
-        
-        # Clean up images that are far from current view
-        self.cleanup_distant_images(center_idx, buffer=window_size)
-        
-        # Load images in the window
-        for idx in range(start_idx, end_idx):
-            if idx not in self.images:
-                try:
-                    self._load_image(idx)
-                except Exception as e:
-                    print(f"Error loading image {self.image_files[idx]}: {str(e)}")
-                    
-    def cleanup_distant_images(self, center_idx, buffer=100):
-        """Remove images that are far from the current view"""
-        # Calculate the range of indices to keep
-        start_idx = max(0, center_idx - buffer // 2)
-        end_idx = min(len(self.image_files), center_idx + buffer // 2)
-        
-        # Get indices to remove
-        indices_to_remove = [idx for idx in self.images.keys() 
-                           if idx < start_idx or idx > end_idx]
-        
-        # Remove distant images
-        for idx in indices_to_remove:
-            try:
-                if hasattr(self.images[idx], 'close'):
-                    self.images[idx].close()
-                del self.images[idx]
-            except Exception as e:
-                print(f"Error cleaning up image {idx}: {str(e)}")
-                
     def calculate_memory_usage(self):
-        """Calculate approximate memory usage of loaded images in MB"""
-        total_bytes = 0
-        for img in self.images.values():
-            try:
-                if isinstance(img, Image.Image):
-                    # Calculate bytes per pixel (assuming RGB or RGBA)
-                    bytes_per_pixel = len(img.getbands())
-                    # Calculate total bytes
-                    total_bytes += img.width * img.height * bytes_per_pixel
-            except:
-                continue
-        return total_bytes / (1024 * 1024)  # Convert to MB
+        """Approximate memory usage of loaded images in MB, tracked by the cache as it fills"""
+        return self.images.nbytes / (1024 * 1024)  # Convert to MB
 
 def main():
     root = Tk()
@@ -1583,4 +2777,5 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Process pools in the frozen Windows build
     main()
\ No newline at end of file
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from annotator_core.anchors import anchor_fitness, best_anchor_iou, format_anchors_yaml, kmeans_anchors, wh_iou
+
+def clusters(sizes, n=500, seed=0):
+    """Box sizes scattered a few percent around each of the given (w, h)"""
+    rng = np.random.default_rng(seed)
+    return np.concatenate([np.array(size) * rng.uniform(0.95, 1.05, (n, 2)) for size in sizes])
+
+def test_wh_iou():
+    wh = np.array([[10.0, 10.0], [20.0, 5.0]])
+    iou = wh_iou(wh, np.array([[10.0, 10.0], [5.0, 20.0]]))
+    assert iou[0, 0] == 1.0
+    assert iou[1, 1] == pytest.approx(25 / 175)
+    assert best_anchor_iou(wh, np.array([[10.0, 10.0]]), chunk=1).tolist() == pytest.approx([1.0, 50 / 150])
+
+def test_kmeans_finds_separated_clusters():
+    sizes = [(8, 8), (30, 12), (12, 40), (60, 60), (150, 90), (300, 300)]
+    wh = clusters(sizes)
+    anchors = kmeans_anchors(wh, k=6)
+    assert anchors.shape == (6, 2)
+    assert (np.diff(anchors.prod(1)) > 0).all()  # Sorted by area
+    assert np.allclose(anchors, sorted(sizes, key=lambda s: s[0] * s[1]), rtol=0.05)
+    avg_iou, recall = anchor_fitness(wh, anchors)
+    assert avg_iou > 0.9 and recall == 1.0
+
+def test_kmeans_edge_cases():
+    assert kmeans_anchors([]) is None
+    assert kmeans_anchors([[0, 5], [3, 0]]) is None  # Degenerate boxes are dropped
+    anchors = kmeans_anchors([[10, 20]] * 50 + [[40, 40]] * 50, k=9)
+    assert anchors.tolist() == [[10, 20], [40, 40]]  # No more anchors than distinct sizes
+    assert anchor_fitness(np.zeros((0, 2)), anchors) == (0.0, 0.0)
+
+def test_format_anchors_yaml():
+    lines = format_anchors_yaml(np.arange(1, 19, dtype=float).reshape(9, 2), 0.71234, 0.98, 640)
+    assert lines[0] == "# Anchors at 640px: avg IoU 0.712, 98.0% of boxes above 0.5 IoU\n"
+    assert lines[2:] == ["  - [1,2, 3,4, 5,6]\n", "  - [7,8, 9,10, 11,12]\n", "  - [13,14, 15,16, 17,18]\n"]
+    assert format_anchors_yaml([[1.4, 2.6], [3, 4]], 0.5, 0.5, 320)[2:] == ["  - [1,3, 3,4]\n"]
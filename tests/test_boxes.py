@@ -0,0 +1,50 @@
+import random
+
+from annotator_core.boxes import BoxGrid, normalized_box
+
+def box(x1, y1, x2, y2):
+    return {"shape": "Rectangle", "points": [(x1, y1), (x2, y2)], "label": "a", "color": "#000"}
+
+def brute_hit(anns, x, y, tolerance=0.0):
+    hits = []
+    for ann in anns:
+        x1, y1, x2, y2 = normalized_box(ann)
+        if x1 - tolerance <= x <= x2 + tolerance and y1 - tolerance <= y <= y2 + tolerance:
+            hits.append(ann)
+    return hits
+
+def test_hit_returns_smallest_first():
+    outer, inner = box(0, 0, 100, 100), box(60, 40, 20, 30)  # Points in either order
+    grid = BoxGrid.build([outer, inner])
+    assert grid.hit(30, 35) == [inner, outer]
+    assert grid.hit(80, 80) == [outer]
+    assert grid.hit(101, 50) == [] and grid.hit(101, 50, tolerance=2) == [outer]
+
+def test_large_boxes_are_kept_out_of_cells():
+    huge = box(0, 0, 5000, 5000)
+    grid = BoxGrid(cell_size=16, max_cells=4)
+    grid.insert(huge)
+    assert grid.large == {id(huge)} and grid.cells == {}
+    assert grid.hit(4000, 10) == [huge]
+    grid.remove(huge)
+    assert grid.hit(4000, 10) == [] and grid.large == set()
+
+def test_matches_brute_force_through_edits():
+    rng = random.Random(0)
+    anns = []
+    for _ in range(150):
+        x, y = rng.uniform(0, 900), rng.uniform(0, 900)
+        anns.append(box(x, y, x + rng.uniform(1, 120), y + rng.uniform(1, 120)))
+    grid = BoxGrid.build(anns)
+    for _ in range(200):
+        if rng.random() < 0.3:
+            gone = anns.pop(rng.randrange(len(anns)))
+            grid.remove(gone)
+            grid.remove(gone)  # Removing twice is harmless
+        elif rng.random() < 0.5:
+            x, y = rng.uniform(0, 900), rng.uniform(0, 900)
+            anns.append(box(x, y, x + rng.uniform(1, 400), y + rng.uniform(1, 400)))
+            grid.insert(anns[-1])
+        x, y, tolerance = rng.uniform(-10, 1000), rng.uniform(-10, 1000), rng.choice([0.0, 3.0])
+        assert {id(a) for a in grid.hit(x, y, tolerance)} == {id(a) for a in brute_hit(anns, x, y, tolerance)}
+    assert all(cell for cell in grid.cells.values())  # Emptied cells are dropped
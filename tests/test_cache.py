@@ -0,0 +1,73 @@
+import threading
+
+from PIL import Image
+import pytest
+
+from annotator_core.cache import ImageCache
+
+def test_concurrent_loads_decode_once():
+    calls = []
+    release = threading.Event()
+
+    def loader(index):
+        calls.append(index)
+        release.wait(5)
+        return Image.new("RGB", (4, 2))
+
+    cache = ImageCache(loader)
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(cache.load(7))) for _ in range(8)]
+    for thread in waiters:
+        thread.start()
+    release.set()
+    for thread in waiters:
+        thread.join(5)
+    assert calls == [7]
+    assert len(results) == 8 and all(img is results[0] for img in results)
+    assert cache.loaded.value == 1 and cache.misses.value == 1
+    assert cache.nbytes == 4 * 2 * 3 and 7 in cache
+    assert cache.load(7) is results[0] and cache.hits.value == 1
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    calls = []
+    release = threading.Event()
+
+    def loader(index):
+        calls.append(index)
+        if len(calls) == 1:
+            release.wait(5)
+            raise OSError("truncated")
+        return Image.new("L", (1, 1))
+
+    cache = ImageCache(loader)
+    errors, loaded = [], []
+
+    def load():
+        try:
+            loaded.append(cache.load(3))
+        except OSError as e:
+            errors.append(e)
+
+    waiters = [threading.Thread(target=load) for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    release.set()
+    for thread in waiters:
+        thread.join(5)
+    # Threads that arrive after the failed flight has ended start a fresh load instead
+    assert errors and all(str(e) == "truncated" for e in errors)
+    assert len(errors) + len(loaded) == 4 and len(calls) == 1 + min(1, len(loaded))
+    assert cache.load(3).size == (1, 1) and cache.loaded.value == 1
+
+def test_eviction_keeps_byte_count():
+    cache = ImageCache(lambda index: Image.new("L", (index + 1, 1)))
+    cache.load_many(range(10))
+    assert len(cache) == 10 and cache.nbytes == sum(range(1, 11))
+    assert cache.evict_outside(3, 5) == 7
+    assert sorted(cache.keys()) == [3, 4, 5] and cache.nbytes == 4 + 5 + 6
+    cache.discard(4)
+    with pytest.raises(KeyError):
+        cache[4]
+    cache.clear()
+    assert cache.nbytes == 0 and len(cache) == 0
+    cache.close()
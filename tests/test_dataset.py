@@ -0,0 +1,38 @@
+import os
+
+from PIL import Image
+
+from annotator_core.dataset import DatasetIndex, assign_split, split_dataset
+
+def test_paths_are_rebuilt_from_shared_directories():
+    index = DatasetIndex(["/data/a/x.jpg", "/data/b/y.png", "/data/a/z.jpg"])
+    assert len(index) == 3
+    assert index.dirs == ["/data/a", "/data/b"]
+    assert list(index) == ["/data/a/x.jpg", "/data/b/y.png", "/data/a/z.jpg"]
+    assert index[1:] == ["/data/b/y.png", "/data/a/z.jpg"]
+    assert index.index_of("z.jpg") == 2 and index.index_of("missing.jpg") is None
+    assert index.source(0) == ("/data/a/x.jpg", 0)
+    assert index.export_name(1) == "y.png"
+
+def test_scan_sorts_and_expands_frames(tmp_path):
+    for name in ("b.jpg", "a.png", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    frames = [Image.new("L", (8, 8), value) for value in (0, 100, 200)]
+    frames[0].save(tmp_path / "c.tif", save_all=True, append_images=frames[1:])
+    os.mkdir(tmp_path / "sub.jpg")  # Directories are skipped even with an image extension
+
+    index = DatasetIndex.scan(str(tmp_path))
+    assert index.names == ["a.png", "b.jpg", "c.tif", "c.tif#1", "c.tif#2"]
+    assert index[3] == str(tmp_path / "c.tif")
+    assert index.source(4) == (str(tmp_path / "c.tif"), 2)
+    assert index.export_name(3) == "c.tif.frame00001.png"
+    assert index.index_of("c.tif#2") == 4
+
+def test_splits_are_deterministic_and_val_is_never_empty():
+    keys = [f"img{i}.jpg" for i in range(200)]
+    splits = split_dataset(keys, 0.2)
+    assert splits == split_dataset(reversed(keys), 0.2)
+    assert all(splits[key] == assign_split(key, 0.2) for key in keys)
+    assert 20 < list(splits.values()).count("val") < 60
+    assert list(split_dataset(["a", "b"], 0.01).values()).count("val") == 1
+    assert set(split_dataset(keys, 0).values()) == {"train"}
@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from annotator_core.dataset import DatasetIndex
+from annotator_core.duplicates import BKTree, DuplicateIndex, dhash_file, hamming_distance
+
+def picture(seed, size=(96, 64)):
+    """A smooth random picture, so small rescales keep its hash"""
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (4, 6), dtype=np.uint8)).resize(size, Image.BICUBIC)
+
+def test_bk_tree_range_query():
+    tree = BKTree()
+    for value, item in [(0b0000, "a"), (0b0001, "b"), (0b0011, "c"), (0b1111, "d"), (0b0000, "e")]:
+        tree.add(value, item)
+    assert sorted(tree.query(0b0000, 1)) == [(0, "a"), (0, "e"), (1, "b")]
+    assert sorted(item for _, item in tree.query(0b0111, 1)) == ["c", "d"]
+    assert hamming_distance(0b1010, 0b0101) == 4
+
+def test_near_duplicates_cluster(tmp_path):
+    folder = tmp_path / "in"
+    folder.mkdir()
+    picture(1).save(folder / "a.png")
+    picture(1).resize((48, 32)).save(folder / "b.png")  # Same picture, smaller
+    picture(2).save(folder / "c.png")
+    image_files = DatasetIndex.scan(str(folder))
+    assert hamming_distance(dhash_file(str(folder / "a.png")), dhash_file(str(folder / "b.png"))) <= 4
+
+    index = DuplicateIndex(str(tmp_path))
+    index.build(image_files)
+    assert index.groups == {"a.png": "a.png", "b.png": "a.png"}
+    assert index.duplicates_of("a.png") == ["b.png"]
+    assert index.is_redundant("b.png") and not index.is_redundant("a.png")
+    assert not index.is_redundant("c.png")
+    assert os.path.exists(os.path.join(str(tmp_path), DuplicateIndex.CACHE_NAME))
+
+    # Rebuilding, now from the hash cache, does not duplicate tree entries
+    index.build(image_files)
+    assert index.duplicates_of("a.png") == ["b.png"]
+    assert len(index.tree.query(index.hashes["c.png"], 0)) == 1
@@ -0,0 +1,153 @@
+import copy
+import json
+
+import pytest
+
+from annotator_core.history import EditHistory, apply_splices, edit_nbytes, replay_journal
+
+def box(label, x=0.0):
+    return {"shape": "Rectangle", "points": [(x, 0.0), (x + 10.0, 10.0)], "label": label, "color": "#000"}
+
+def color_for(label):
+    return "#123456"
+
+def plain(annotations):
+    """Annotations without colours, for comparing a replayed project with the live one"""
+    return {name: [{k: v for k, v in ann.items() if k != "color"} for ann in anns]
+            for name, anns in annotations.items()}
+
+def add(history, annotations, img_name, ann):
+    anns = annotations.setdefault(img_name, [])
+    anns.append(ann)
+    history.record("add", [(img_name, len(anns) - 1, (), (ann,))])
+
+def test_undo_redo_round_trip():
+    annotations = {}
+    history = EditHistory()
+    a, b = box("a"), box("b", 20.0)
+    add(history, annotations, "img.jpg", a)
+    add(history, annotations, "img.jpg", b)
+    assert history.undo(annotations) == ("add", {"img.jpg"}, None)
+    assert annotations["img.jpg"] == [a]
+    assert history.redo(annotations) == ("add", {"img.jpg"}, None)
+    assert annotations["img.jpg"][1] is b
+    history.undo(annotations)
+    history.undo(annotations)
+    assert annotations["img.jpg"] == []
+    assert history.undo(annotations) is None
+
+def test_record_clears_redo():
+    annotations = {}
+    history = EditHistory()
+    add(history, annotations, "img.jpg", box("a"))
+    history.undo(annotations)
+    add(history, annotations, "img.jpg", box("b"))
+    assert not history.can_redo
+
+def test_trim_drops_oldest_edits():
+    annotations = {}
+    history = EditHistory(max_bytes=3000)
+    for i in range(20):
+        add(history, annotations, "img.jpg", box("a", float(i)))
+    assert history.nbytes <= 3000
+    assert history.dropped == 20 - len(history)
+
+def test_edit_over_budget_clears_history():
+    annotations = {}
+    history = EditHistory(max_bytes=3000)
+    for i in range(3):
+        add(history, annotations, "img.jpg", box("a", float(i)))
+    splice = ("img.jpg", 0, tuple(annotations["img.jpg"]), tuple(box("b", float(i)) for i in range(50)))
+    assert edit_nbytes([splice]) > history.max_bytes
+    annotations["img.jpg"] = list(splice[3])
+    history.record("taxonomy", [splice])
+    assert len(history) == 0 and history.dropped == 4 and history.nbytes == 0
+    assert not history.can_undo
+
+def test_state_is_handed_back():
+    annotations = {"img.jpg": [box("a")]}
+    history = EditHistory()
+    old = annotations["img.jpg"]
+    annotations["img.jpg"] = [box("b")]
+    history.record("taxonomy", [("img.jpg", 0, old, tuple(annotations["img.jpg"]))], (["a"], ["b"]))
+    history.record("labels", [], (["b"], ["b", "c"]))
+    assert history.undo(annotations) == ("labels", set(), ["b"])
+    assert history.undo(annotations) == ("taxonomy", {"img.jpg"}, ["a"])
+    assert annotations["img.jpg"][0]["label"] == "a"
+    assert history.redo(annotations)[2] == ["b"]
+    history.record("noop", [])
+    assert history.can_redo and len(history) == 1  # An empty edit is not recorded
+
+def test_apply_splices_rolls_back_on_mismatch():
+    a, b = box("a"), box("b")
+    annotations = {"x": [a], "y": [b]}
+    with pytest.raises(ValueError):
+        apply_splices(annotations, [("x", 0, (a,), ()), ("y", 0, (box("b"),), ())])
+    assert annotations["x"] == [a] and annotations["x"][0] is a
+    assert annotations["y"][0] is b
+
+def test_journal_replays_unsaved_edits(tmp_path):
+    journal = str(tmp_path / "edits.journal")
+    saved = {"img.jpg": [box("a")]}
+    annotations = copy.deepcopy(saved)
+    history = EditHistory()
+    history.open_journal(journal)
+    add(history, annotations, "img.jpg", box("b", 5.0))
+    add(history, annotations, "other.jpg", box("c"))
+    history.undo(annotations)
+    old = annotations["img.jpg"]
+    annotations["img.jpg"] = []
+    history.record("clear", [("img.jpg", 0, old, ())])
+    history.close()
+
+    recovered = copy.deepcopy(saved)
+    count, last_seq = replay_journal(journal, recovered, 0, color_for)
+    assert (count, last_seq) == (4, history.seq)
+    assert plain(recovered) == plain(annotations)
+    assert all(ann["color"] == "#123456" for anns in recovered.values() for ann in anns)
+
+def test_journal_compact_keeps_unsaved_lines(tmp_path):
+    journal = str(tmp_path / "edits.journal")
+    annotations = {}
+    history = EditHistory()
+    history.open_journal(journal)
+    add(history, annotations, "img.jpg", box("a"))
+    saved_seq = history.seq
+    saved = copy.deepcopy(annotations)
+    add(history, annotations, "img.jpg", box("b"))
+    history.compact(saved_seq)
+    history.close()
+
+    with open(journal) as f:
+        assert [json.loads(line)[0] for line in f] == [saved_seq + 1]
+    count, _ = replay_journal(journal, saved, saved_seq, color_for)
+    assert count == 1
+    assert plain(saved) == plain(annotations)
+
+def test_journal_with_gap_is_rejected(tmp_path):
+    journal = str(tmp_path / "edits.journal")
+    history = EditHistory()
+    history.open_journal(journal, seq=5)
+    add(history, {}, "img.jpg", box("a"))
+    history.close()
+    annotations = {}
+    with pytest.raises(ValueError):
+        replay_journal(journal, annotations, 2, color_for)
+    assert annotations == {}
+
+def test_mismatched_journal_leaves_annotations_untouched(tmp_path):
+    journal = str(tmp_path / "edits.journal")
+    history = EditHistory()
+    history.open_journal(journal)
+    annotations = {"img.jpg": [box("a")]}
+    add(history, annotations, "img.jpg", box("b"))
+    anns = annotations["img.jpg"]
+    annotations["img.jpg"] = []
+    history.record("clear", [("img.jpg", 0, anns, ())])
+    history.close()
+
+    # Saved project has fewer boxes than the journal expects: the first splice fits, the second does not
+    saved = {"img.jpg": []}
+    with pytest.raises(ValueError):
+        replay_journal(journal, saved, 0, color_for)
+    assert saved == {"img.jpg": []}
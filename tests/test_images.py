@@ -0,0 +1,58 @@
+import threading
+
+from PIL import Image
+
+from annotator_core import images
+from annotator_core.images import load_frame
+
+def write_tiff(path, value, frames=5):
+    pages = [Image.new("L", (16, 16), value + 10 * j) for j in range(frames)]
+    pages[0].save(path, save_all=True, append_images=pages[1:])
+
+def write_gif(path, frames=40):
+    # Each frame moves a square over the last, so the file stores deltas that depend on earlier frames
+    pages = []
+    for j in range(frames):
+        page = Image.new("RGB", (16, 16), (40, 80, 120))
+        page.paste((250, 10 * j % 256, 0), (j % 12, j % 12, j % 12 + 4, j % 12 + 4))
+        pages.append(page)
+    pages[0].save(path, save_all=True, append_images=pages[1:], optimize=True)
+
+def test_gif_frames_read_backwards(tmp_path, monkeypatch):
+    path = str(tmp_path / "anim.gif")
+    write_gif(path)
+    with Image.open(path) as img:
+        expected = []
+        for j in range(img.n_frames):
+            img.seek(j)
+            expected.append(img.convert("RGB").tobytes())
+    # Snapshots every 4 frames, with room for 3 so the spacing has to widen on the way
+    monkeypatch.setattr(images, "GIF_CHECKPOINT_EVERY", 4)
+    monkeypatch.setattr(images, "GIF_CHECKPOINT_BYTES", 3 * 16 * 16 * 4)
+    order = [39] + list(range(38, -1, -1)) + [21, 20, 22, 3, 37, 36, 0, 5]
+    for j in order:
+        assert load_frame(path, j).convert("RGB").tobytes() == expected[j], j
+    reader = images._frame_readers[path]
+    assert reader.interval > 4 and 0 < len(reader.checkpoints) <= 3
+
+def test_load_frame_from_many_threads(tmp_path):
+    paths = [str(tmp_path / f"{i}.tif") for i in range(6)]
+    for i, path in enumerate(paths):
+        write_tiff(path, i)
+    errors = []
+
+    def work(k):
+        try:
+            for n in range(60):
+                i, frame = (k * 5 + n) % len(paths), n % 5
+                # Fewer open handles than files, so readers are evicted while others use them
+                assert load_frame(paths[i], frame, max_open=3).getpixel((0, 0)) == i + 10 * frame
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(k,)) for k in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
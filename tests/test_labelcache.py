@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from annotator_core.labelcache import LabelCache, cache_path, remove_label_caches, write_label_cache
+
+@pytest.fixture
+def split(tmp_path):
+    images_dir = tmp_path / "images" / "train"
+    labels_dir = tmp_path / "labels" / "train"
+    images_dir.mkdir(parents=True)
+    labels_dir.mkdir(parents=True)
+    names = ["a.jpg", "b.jpg", "ünï.png"]
+    rows = [[(0, 0.5, 0.5, 0.25, 0.25), (2, 0.1, 0.2, 0.3, 0.4)], [], [(1, 0.75, 0.25, 0.5, 0.5)]]
+    for name, (w, h), image_rows in zip(names, [(64, 48), (32, 32), (20, 10)], rows):
+        Image.new("RGB", (w, h)).save(images_dir / name)
+        with open(labels_dir / f"{os.path.splitext(name)[0]}.txt", "w") as f:
+            f.writelines(" ".join(map(str, row)) + "\n" for row in image_rows)
+    return str(tmp_path), str(images_dir), str(labels_dir), names, rows
+
+def test_round_trip(split):
+    o_path, images_dir, labels_dir, names, rows = split
+    path = cache_path(o_path, "train")
+    # Shapes may be given or left to be read from the image headers
+    write_label_cache(path, images_dir, labels_dir, names, [(64, 48), None, None], rows)
+
+    cache = LabelCache(path)
+    try:
+        assert len(cache) == 3
+        assert [cache.name(i) for i in range(3)] == names
+        assert cache.shapes.tolist() == [[64, 48], [32, 32], [20, 10]]
+        for i, image_rows in enumerate(rows):
+            classes, boxes = cache.labels(i)
+            assert classes.tolist() == [row[0] for row in image_rows]
+            np.testing.assert_allclose(boxes, np.array([row[1:] for row in image_rows]).reshape(-1, 4), rtol=1e-6)
+        assert cache.is_current(images_dir, labels_dir)
+
+        # Touching a label file changes the hash
+        label_path = os.path.join(labels_dir, "b.txt")
+        stat = os.stat(label_path)
+        os.utime(label_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert not cache.is_current(images_dir, labels_dir)
+    finally:
+        cache.close()
+
+def test_empty_split(tmp_path):
+    path = str(tmp_path / "val.labelcache")
+    write_label_cache(path, str(tmp_path), str(tmp_path), (), (), ())
+    cache = LabelCache(path)
+    assert len(cache) == 0 and len(cache.boxes) == 0
+    cache.close()
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "x.labelcache"
+    path.write_bytes(b"\0" * 128)
+    with pytest.raises(ValueError):
+        LabelCache(str(path))
+
+def test_remove_label_caches(split):
+    o_path, images_dir, labels_dir, names, rows = split
+    write_label_cache(cache_path(o_path, "train"), images_dir, labels_dir, names, [None] * 3, rows)
+    remove_label_caches(o_path)
+    assert not os.path.exists(cache_path(o_path, "train"))
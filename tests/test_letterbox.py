@@ -0,0 +1,45 @@
+from PIL import Image
+import pytest
+
+from annotator_core.images import proxy_size
+from annotator_core.letterbox import PAD_COLOR, letterbox_annotations, letterbox_file, letterbox_geometry
+
+def box(x1, y1, x2, y2):
+    return {"shape": "Rectangle", "points": [(x1, y1), (x2, y2)], "label": "a", "color": "#000"}
+
+def test_geometry():
+    assert letterbox_geometry(1920, 960, 640) == (640, 320, 0, 160, 640, 640)
+    assert letterbox_geometry(960, 1920, 640, "resize") == (320, 640, 0, 0, 320, 640)
+    assert letterbox_geometry(5000, 2, 320)[:2] == (320, 1)  # Never collapses to zero pixels
+
+@pytest.mark.parametrize("mode", ["letterbox", "resize"])
+def test_boxes_round_trip(mode):
+    anns = [box(10.0, 20.0, 300.5, 700.25), box(1919.0, 0.0, 0.0, 1079.0)]
+    geometry = letterbox_geometry(1920, 1080, 416, mode)
+    moved = letterbox_annotations(anns, 1920, 1080, geometry)
+    new_w, new_h, pad_x, pad_y, out_w, out_h = geometry
+    for ann, out in zip(anns, moved):
+        assert out["label"] == ann["label"] and out is not ann
+        for (x, y), (ox, oy) in zip(ann["points"], out["points"]):
+            assert 0 <= ox <= out_w and 0 <= oy <= out_h
+            assert ((ox - pad_x) * 1920 / new_w, (oy - pad_y) * 1080 / new_h) == (pytest.approx(x), pytest.approx(y))
+
+def test_boxes_land_on_the_letterboxed_pixels(tmp_path):
+    # The original is larger than its display proxy, which is the space annotations live in
+    src, dst = str(tmp_path / "src.png"), str(tmp_path / "out.png")
+    img = Image.new("RGB", (2400, 1000), (0, 0, 255))
+    img.paste((255, 0, 0), (600, 250, 900, 500))
+    img.save(src)
+    proxy_w, proxy_h = proxy_size(2400, 1000)
+    scale = proxy_w / 2400
+    ann = box(600 * scale, 250 * scale, 900 * scale, 500 * scale)
+    geometry = letterbox_geometry(proxy_w, proxy_h, 320)
+    letterbox_file(src, dst, geometry)
+    [(x1, y1), (x2, y2)] = letterbox_annotations([ann], proxy_w, proxy_h, geometry)[0]["points"]
+    with Image.open(dst) as out:
+        assert out.size == (320, 320)
+        assert out.getpixel((160, 2)) == PAD_COLOR and out.getpixel((160, 317)) == PAD_COLOR
+        red = lambda x, y: out.getpixel((round(x), round(y)))[0] > 200
+        assert red((x1 + x2) / 2, (y1 + y2) / 2)
+        assert red(x1 + 2, y1 + 2) and red(x2 - 2, y2 - 2)
+        assert not red(x1 - 3, y1 - 3) and not red(x2 + 3, y2 + 3)
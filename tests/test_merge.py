@@ -0,0 +1,103 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from annotator_core.merge import merge_projects, resolve_boxes
+from annotator_core.store import CSV_FIELDS
+
+def source(*boxes):
+    """(boxes, labels) of one source from (x1, y1, x2, y2, label) tuples"""
+    return np.array([box[:4] for box in boxes], np.float64).reshape(-1, 4), [box[4] for box in boxes]
+
+def resolved(per_source, policy):
+    return [(box.tolist(), label, size) for box, label, size in resolve_boxes(per_source, policy)]
+
+def test_union_counts_same_label_overlaps_once():
+    result = resolved([source((0, 0, 10, 10, "cat"), (50, 50, 60, 60, "dog")),
+                       source((1, 0, 11, 10, "cat"), (0, 0, 10, 10, "dog"))], "union")
+    assert result == [([0, 0, 10, 10], "cat", 2), ([50, 50, 60, 60], "dog", 1), ([0, 0, 10, 10], "dog", 1)]
+
+def test_prefer_keeps_earliest_source():
+    result = resolved([source((0, 0, 10, 10, "cat")),
+                       source((1, 0, 11, 10, "dog"), (50, 50, 60, 60, "dog"))], "prefer")
+    assert result == [([0, 0, 10, 10], "cat", 2), ([50, 50, 60, 60], "dog", 1)]
+
+def test_majority_averages_agreed_boxes():
+    result = resolved([source((0, 0, 10, 10, "cat"), (50, 50, 60, 60, "dog")),
+                       source((2, 0, 12, 10, "cat")),
+                       source((1, 0, 11, 10, "dog"))], "majority")
+    # The lone dog box is dropped; the tied label vote goes to the earlier sources' cat
+    assert result == [([1, 0, 11, 10], "cat", 3)]
+
+def test_majority_counts_sources_without_boxes():
+    result = resolve_boxes([source((0, 0, 10, 10, "cat")), source()], "majority")
+    assert result == []
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(CSV_FIELDS)
+        out.writerows(rows)
+
+def write_project(path, annotations, labels=("cat",)):
+    with open(path, "w") as f:
+        json.dump({"labels": list(labels), "label_colors": {"cat": "#111"}, "annotations": annotations}, f)
+
+def ann(x1, y1, x2, y2, label="cat"):
+    return {"shape": "Rectangle", "points": [[x1, y1], [x2, y2]], "label": label}
+
+@pytest.mark.parametrize("policy", ["union", "majority", "prefer"])
+def test_merge_projects_streams_sources(tmp_path, policy):
+    first = tmp_path / "first"
+    first.mkdir()
+    # Unsorted CSV, cut into runs of two rows
+    write_csv(first / "annotations.csv", [("b.jpg", 0, 0, 10.123456, 10, "cat", "Rectangle"),
+                                          ("a.jpg", 0, 0, 10, 10, "cat", "Rectangle"),
+                                          ("a.jpg", 20, 20, 30, 30, "cat", "Rectangle")])
+    write_project(first / "project.json", {"bg.jpg": []})
+    second = tmp_path / "second.json"
+    write_project(second, {"a.jpg": [ann(1, 0, 11, 10)], "b.jpg": [ann(0, 0, 10.123456, 10)], "bg.jpg": [],
+                           "c.jpg": [ann(5, 5, 6, 6, "dog")]})
+
+    out = tmp_path / "out"
+    summary = merge_projects([str(first), str(second)], str(out), policy=policy, chunk_rows=2)
+    with open(out / "project.json") as f:
+        project = json.load(f)
+    annotations = project["annotations"]
+    assert annotations["bg.jpg"] == []
+    assert summary["backgrounds"] == 1
+    assert annotations["b.jpg"][0]["points"] == [[0, 0], [10.123456, 10]]  # Full precision
+    assert project["labels"] == ["cat", "dog"]
+    a_boxes = [a["points"] for a in annotations["a.jpg"]]
+    if policy == "majority":
+        assert a_boxes == [[[0.5, 0], [10.5, 10]]]
+    else:
+        assert a_boxes == [[[0, 0], [10, 10]], [[20, 20], [30, 30]]]
+    assert [a["label"] for a in annotations["c.jpg"]] == ["dog"]
+    assert summary["images"] == 4
+
+def test_merged_project_keeps_settings_only(tmp_path, monkeypatch):
+    first, second = tmp_path / "first", tmp_path / "second"
+    for folder, rows in ((first, [("b.jpg", 0, 0, 5, 5, "cat"), ("a.jpg", 0, 0, 5, 5, "cat")]),
+                         (second, [("c.jpg", 0, 0, 5, 5, "dog"), ("a.jpg", 9, 9, 20, 20, "dog")])):
+        folder.mkdir()
+        # Both unsorted and named alike, so both are cut into runs in the same temp folder
+        write_csv(folder / "annotations.csv", [row + ("Rectangle",) for row in rows])
+    with open(first / "project.json", "w") as f:
+        json.dump({"input_path": "/data/in", "cursor": "b.jpg", "journal_seq": 12, "queue_offsets": {"s.jsonl": 5},
+                   "val_split": 0.1, "train_imgsz": 320, "labels": ["cat"], "annotations": {
+                       "b.jpg": [ann(0, 0, 5, 5)], "z.jpg": [], "a.jpg": [ann(0, 0, 5, 5)], "y.jpg": []}}, f, indent=2)
+    # Sources' project files are streamed, never loaded whole
+    monkeypatch.setattr(json, "load", lambda f: pytest.fail(f"{f.name} was loaded whole"))
+    out = tmp_path / "out"
+    summary = merge_projects([str(first), str(second)], str(out), chunk_rows=1)
+    monkeypatch.undo()
+    with open(out / "project.json") as f:
+        project = json.load(f)
+    assert set(project) == {"val_split", "train_imgsz", "output_path", "labels", "label_colors", "annotations"}
+    assert project["val_split"] == 0.1 and project["labels"] == ["cat", "dog"]
+    assert list(project["annotations"]) == ["a.jpg", "b.jpg", "c.jpg", "y.jpg", "z.jpg"]
+    assert [a["label"] for a in project["annotations"]["a.jpg"]] == ["cat", "dog"]
+    assert summary["backgrounds"] == 2 and summary["boxes_out"] == 4
@@ -0,0 +1,50 @@
+import random
+
+from annotator_core.dataset import DatasetIndex, NavigationIndex
+
+def box(label):
+    return {"shape": "Rectangle", "points": [(0.0, 0.0), (1.0, 1.0)], "label": label, "color": "#000"}
+
+def make(names, annotations):
+    nav = NavigationIndex(DatasetIndex([f"/in/{name}" for name in names]))
+    nav.rebuild(annotations)
+    return nav
+
+def test_jumps_wrap_around():
+    names = [f"{i}.jpg" for i in range(6)]
+    nav = make(names, {"1.jpg": [box("cat")], "3.jpg": [box("dog"), box("cat")], "gone.jpg": [box("cat")]})
+    assert nav.unannotated == [0, 2, 4, 5]
+    assert nav.next_unannotated(0) == 2 and nav.next_unannotated(5) == 0
+    assert nav.next_unannotated(0, -1) == 5
+    assert nav.next_with_label("cat", 3) == 1 and nav.next_with_label("cat", 3, -1) == 1
+    assert nav.next_with_label("dog", 3) == 3  # The only match wraps back onto itself
+    assert nav.next_with_label("cow", 0) is None
+    assert nav.next_with_min_boxes(1, 0) == 3 and nav.next_with_min_boxes(2, 0) is None
+
+def test_update_matches_rebuild():
+    rng = random.Random(0)
+    names = [f"{i:03d}.jpg" for i in range(60)]
+    annotations = {}
+    nav = make(names, annotations)
+    for _ in range(400):
+        name = rng.choice(names)
+        annotations[name] = [box(rng.choice("abc")) for _ in range(rng.choice([0, 0, 1, 2, 3, 5]))]
+        nav.update(nav.image_files.index_of(name), annotations[name])
+    fresh = make(names, annotations)
+    assert nav.box_counts == fresh.box_counts
+    assert nav.unannotated == fresh.unannotated
+    assert nav.count_images == fresh.count_images
+    assert {label: idx for label, idx in nav.label_images.items() if idx} == fresh.label_images
+    for start in range(0, 60, 7):
+        for step in (1, -1):
+            for min_boxes in (0, 1, 2, 4):
+                # Brute force: the first image in the step direction with enough boxes
+                expected = next((i % 60 for i in range(start + step, start + step * 61, step)
+                                 if nav.box_counts[i % 60] > min_boxes), None)
+                assert nav.next_with_min_boxes(min_boxes, start, step) == expected
+
+def test_find_prefix_on_unsorted_index():
+    nav = make(["b2.jpg", "a1.jpg", "b1.jpg", "c.jpg"], {})
+    assert nav.find_prefix("b") == 2
+    assert nav.find_prefix("c") == 3
+    assert nav.find_prefix("d") is None and nav.find_prefix("a2") is None
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from PIL import Image
+
+from annotator_core.cache import ImageCache
+from annotator_core.prefetch import PrefetchScheduler
+
+class Recorder:
+    """Loader that records the decode order and holds the first decode until released"""
+
+    def __init__(self):
+        self.order = []
+        self.release = threading.Event()
+        self.done = threading.Event()
+        self.expected = None
+
+    def load(self, index):
+        if not self.order:
+            self.release.wait(5)
+        self.order.append(index)
+        return Image.new("L", (1, 1))
+
+    def loaded(self, index):
+        if self.expected is not None and len(self.order) >= self.expected:
+            self.done.set()
+
+def scheduler(recorder, total=100, **kwargs):
+    return PrefetchScheduler(ImageCache(recorder.load), total, workers=1, on_loaded=recorder.loaded, **kwargs)
+
+def test_window_is_weighted_towards_travel():
+    recorder = Recorder()
+    prefetch = scheduler(recorder, radius=4, behind_weight=2.0)
+    assert list(prefetch.window(10, 1)) == list(range(8, 15))
+    assert list(prefetch.window(10, -1)) == list(range(6, 13))
+    assert list(prefetch.window(1, -1)) == [0, 1, 2, 3] and list(prefetch.window(99, 1)) == [97, 98, 99]
+    prefetch.close()
+
+def test_loads_in_order_of_weighted_distance():
+    recorder = Recorder()
+    prefetch = scheduler(recorder, radius=4, behind_weight=2.0)
+    recorder.expected = 7
+    prefetch.focus(10, 1)
+    recorder.release.set()
+    assert recorder.done.wait(5)
+    # Behind the direction of travel counts double: 9 ties with 12, and 8 with 14
+    assert recorder.order == [10, 11, 9, 12, 13, 8, 14]
+    prefetch.close()
+
+def test_refocus_replaces_the_queue():
+    recorder = Recorder()
+    prefetch = scheduler(recorder, radius=4, behind_weight=2.0)
+    prefetch.focus(10, 1)  # The worker takes 10 and blocks in the loader
+    while prefetch.pending() == 7:
+        time.sleep(0.001)
+    recorder.expected = 8
+    prefetch.focus(50)  # Inferred direction: moving forward
+    prefetch.focus(40)  # Now moving backwards
+    recorder.release.set()
+    assert recorder.done.wait(5)
+    assert recorder.order == [10, 40, 39, 38, 41, 37, 36, 42]
+    assert prefetch.direction == -1 and prefetch.pending() == 0
+    prefetch.close()
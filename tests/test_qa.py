@@ -0,0 +1,26 @@
+from annotator_core.qa import apply_fixes, validate_annotations
+
+def box(label, x1, y1, x2, y2):
+    return {"shape": "Rectangle", "points": [(x1, y1), (x2, y2)], "label": label, "color": "#000"}
+
+def test_checks_flag_each_problem():
+    annotations = {
+        "a.jpg": [box("cat", 10, 10, 5, 20), box("cat", 0, 0, 0.5, 10), box("cat", 90, 90, 120, 95)],
+        "b.jpg": [box("cat", 0, 0, 50, 50), box("cat", 0, 0, 50, 51), box("cow", 0, 0, 10, 10)],
+    }
+    report = validate_annotations(annotations, ["cat"], {"a.jpg": (100, 100), "b.jpg": (100, 100)})
+    assert report.issues["inverted"] == [("a.jpg", 0)]
+    assert report.issues["zero_area"] == [("a.jpg", 1)]
+    assert report.issues["out_of_bounds"] == [("a.jpg", 2)]
+    assert report.issues["duplicate"] == [("b.jpg", 1)]
+    assert report.issues["unknown_label"] == [("b.jpg", 2)] and report.unknown_labels == {"cow"}
+
+def test_unreadable_images_are_not_orphaned():
+    annotations = {"gone.jpg": [box("cat", 0, 0, 10, 10)], "broken.jpg": [box("cat", 0, 0, 10, 10)]}
+    sizes = {"gone.jpg": None, "broken.jpg": None}
+    report = validate_annotations(annotations, ["cat"], sizes, unreadable={"broken.jpg"})
+    assert report.issues["orphaned"] == [("gone.jpg", 0)]
+    assert report.issues["unreadable"] == [("broken.jpg", 0)]
+    assert report.issues["out_of_bounds"] == []
+    # Deleting orphaned boxes leaves those on unreadable images alone
+    assert apply_fixes(annotations, report, sizes, {"orphaned"}) == {"gone.jpg": []}
@@ -0,0 +1,57 @@
+import os
+import tarfile
+
+from annotator_core.shards import pack_shards, read_member, read_shard_index
+
+def make_export(o_path, counts):
+    """A YOLO export tree with counts[split] samples of distinct sizes per split"""
+    for split, count in counts.items():
+        os.makedirs(os.path.join(o_path, "images", split), exist_ok=True)
+        os.makedirs(os.path.join(o_path, "labels", split), exist_ok=True)
+        for i in range(count):
+            with open(os.path.join(o_path, "images", split, f"{split}.{i}.jpg"), "wb") as f:
+                f.write(bytes([i % 256]) * (700 + 300 * i))
+            if i % 3:  # Some background images have no label file
+                with open(os.path.join(o_path, "labels", split, f"{split}.{i}.txt"), "w") as f:
+                    f.write(f"0 0.5 0.5 0.{i} 0.{i}\n")
+
+def test_index_offsets_point_at_member_data(tmp_path):
+    o_path = str(tmp_path)
+    make_export(o_path, {"train": 7, "val": 3})
+    summary = pack_shards(o_path, shard_samples=3, metadata={"train.1": {"boxes": 1}})
+    assert summary["samples"] == 10
+    assert summary["shards"] == 3 + 1  # 7 train samples in threes, then 3 val
+
+    samples, keys = read_shard_index(o_path)
+    assert len(samples) == 10
+    # Dotted names get numeric keys, so WebDataset's split at the first dot is harmless
+    assert keys["train.1"] == "000000001" and keys["val.0"] == "000000007"
+    for name, key in keys.items():
+        split = name.split(".")[0]
+        members = samples[key]
+        with open(os.path.join(o_path, "images", split, f"{name}.jpg"), "rb") as f:
+            assert read_member(members[f"{key}.jpg"]) == f.read()
+        label_path = os.path.join(o_path, "labels", split, f"{name}.txt")
+        if os.path.exists(label_path):
+            with open(label_path, "rb") as f:
+                assert read_member(members[f"{key}.txt"]) == f.read()
+        else:
+            assert f"{key}.txt" not in members
+    assert read_member(samples["000000001"]["000000001.json"]) == b'{"boxes": 1}'
+
+    # The offsets agree with what tarfile itself finds
+    shard, _, _ = samples["000000004"]["000000004.jpg"]
+    with tarfile.open(shard) as tar:
+        for info in tar:
+            location = samples[info.name.split(".")[0]][info.name]
+            assert (location[1], location[2]) == (info.offset_data, info.size)
+
+def test_repack_removes_only_stale_shards(tmp_path):
+    o_path = str(tmp_path)
+    make_export(o_path, {"train": 6})
+    pack_shards(o_path, shard_samples=2)
+    shard_dir = os.path.join(o_path, "shards")
+    with open(os.path.join(shard_dir, "alice.jsonl"), "w") as f:
+        f.write("{}\n")  # A work queue shard sharing the folder
+    pack_shards(o_path, shard_samples=3)
+    assert sorted(os.listdir(shard_dir)) == ["alice.jsonl", "index.tsv", "train-000000.tar", "train-000001.tar"]
@@ -0,0 +1,52 @@
+import random
+
+from annotator_core.dataset import DatasetIndex
+from annotator_core.stats import DatasetStats, write_stats_csv
+
+def box(label, w=10.0, h=10.0):
+    return {"shape": "Rectangle", "points": [(5.0, 5.0), (5.0 + w, 5.0 + h)], "label": label, "color": "#000"}
+
+def make(names, annotations):
+    stats = DatasetStats()
+    stats.rebuild(annotations, DatasetIndex([f"/in/{name}" for name in names]))
+    return stats
+
+def test_report_counts():
+    annotations = {"a.jpg": [box("cat"), box("dog", 40.0, 10.0)], "b.jpg": [box("cat")], "c.jpg": []}
+    report = make(["a.jpg", "b.jpg", "c.jpg", "d.jpg"], annotations).report(["dog", "cow"])
+    assert report["images"] == 4 and report["annotated_images"] == 2 and report["coverage"] == 0.5
+    assert report["classes"] == {"dog": 1, "cow": 0, "cat": 2}  # Listed labels first, then the rest
+    assert report["boxes"] == 3 and report["boxes_per_image_mean"] == 0.75
+    assert report["boxes_per_image_counts"] == [2, 1, 1]
+    assert sum(report["box_size_counts"]) == sum(report["aspect_counts"]) == 3
+
+def test_unindexed_images_do_not_count_towards_coverage():
+    annotations = {"a.jpg": [box("cat")], "gone.jpg": [box("cat"), box("cat")], "gone2.jpg": [box("dog")]}
+    stats = make(["a.jpg"], annotations)
+    report = stats.report()
+    assert report["coverage"] == 1.0 and report["annotated_images"] == 1
+    assert report["boxes_per_image_counts"] == [0, 1] and report["boxes_per_image_mean"] == 1.0
+    assert stats.count("cat") == 3  # Class totals still see every box, for the taxonomy editor
+    stats.update("gone3.jpg", [box("cat")])
+    assert stats.report()["coverage"] == 1.0 and stats.count("cat") == 4
+
+def test_update_matches_rebuild():
+    rng = random.Random(0)
+    names = [f"{i:02d}.jpg" for i in range(30)]
+    annotations = {}
+    stats = make(names[:25], annotations)
+    for _ in range(200):
+        name = rng.choice(names)
+        annotations[name] = [box(rng.choice("abc"), rng.uniform(1, 300), rng.uniform(1, 300))
+                             for _ in range(rng.choice([0, 1, 2, 4]))]
+        stats.update(name, annotations[name])
+    fresh = make(names[:25], annotations)
+    assert stats.report(["a", "b", "c"]) == fresh.report(["a", "b", "c"])
+
+def test_csv_has_one_row_per_bin(tmp_path):
+    report = make(["a.jpg"], {"a.jpg": [box("cat")]}).report()
+    path = tmp_path / "stats.csv"
+    write_stats_csv(str(path), report)
+    rows = path.read_text().splitlines()
+    assert rows[0] == "section,key,value" and "class,cat,1" in rows
+    assert sum(row.startswith("box_size,") for row in rows) == len(report["box_size_counts"])
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from annotator_core.store import iter_project_annotations, read_project_settings
+
+PROJECT = {
+    "labels": ["cat", "dog"],
+    "annotations": {
+        "b.jpg": [{"shape": "Rectangle", "points": [[0.5, 1e-07], [1234567.25, -3]], "label": "café \"x\""}],
+        "a.jpg": [],
+        "c, d.jpg": [{"shape": "Rectangle", "points": [[1, 2], [3, 4]], "label": "{}"}] * 3,
+    },
+    "nested": {"annotations": [1, 2], "deep": [[], {}, None, True, False]},
+    "journal_seq": 1234567890,
+}
+
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 16])
+def test_project_file_is_streamed(tmp_path, indent, chunk_size):
+    path = tmp_path / "project.json"
+    path.write_text(json.dumps(PROJECT, indent=indent))
+    settings = read_project_settings(str(path), ["labels", "nested", "journal_seq", "annotations", "missing"],
+                                     chunk_size)
+    assert settings == {key: value for key, value in PROJECT.items() if key != "annotations"}
+    assert list(iter_project_annotations(str(path), chunk_size)) == list(PROJECT["annotations"].items())
+
+def test_truncated_project_file_is_an_error(tmp_path):
+    path = tmp_path / "project.json"
+    path.write_text(json.dumps(PROJECT)[:-20])
+    with pytest.raises(ValueError):
+        list(iter_project_annotations(str(path), 7))
@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from annotator_core.history import EditHistory, apply_splices
+from annotator_core.taxonomy import edit_taxonomy
+
+def box(label, x=0.0):
+    return {"shape": "Rectangle", "points": [(x, 0.0), (x + 10.0, 10.0)], "label": label, "color": f"#{label}"}
+
+def project():
+    return {
+        "a.jpg": [box("cat"), box("dog", 20.0)],
+        "b.jpg": [box("Cate")],
+        "c.jpg": [box("dog")],
+        "d.jpg": [],
+    }
+
+COLORS = {"cat": "#cat", "Cate": "#Cate", "dog": "#dog"}
+
+def new_color(label):
+    return "#new"
+
+def apply(annotations, edit, history, before):
+    """Swap the edited lists in and record them the way the GUI does"""
+    annotations.update(edit.annotations)
+    history.record("taxonomy", edit.splices, (before, (edit.label_list, edit.label_colors)))
+
+def labels(annotations):
+    return {name: [ann["label"] for ann in anns] for name, anns in annotations.items()}
+
+def test_merge_relabels_and_reexports_shifted_classes():
+    annotations = project()
+    edit = edit_taxonomy(annotations, ["cat", "Cate", "dog"], COLORS, {"Cate": "cat"}, new_color)
+    assert edit.label_list == ["cat", "dog"]
+    assert "Cate" not in edit.label_colors
+    assert labels(edit.annotations) == {"b.jpg": ["cat"]}
+    assert edit.annotations["b.jpg"][0]["color"] == "#cat"
+    # dog moved from class 2 to 1, so its images are re-exported though their boxes are unchanged
+    assert edit.reexport == {"a.jpg", "b.jpg", "c.jpg"}
+    assert (edit.relabeled, edit.deleted) == (1, 0)
+    assert labels(annotations)["b.jpg"] == ["Cate"]  # The input is not modified
+
+def test_rename_to_new_label_keeps_colour():
+    annotations = project()
+    edit = edit_taxonomy(annotations, ["cat", "Cate", "dog"], COLORS, {"dog": "hound"}, new_color)
+    assert edit.label_list == ["cat", "Cate", "hound"]
+    assert edit.label_colors["hound"] == "#dog"
+    assert labels(edit.annotations) == {"a.jpg": ["cat", "hound"], "c.jpg": ["hound"]}
+    assert edit.annotations["a.jpg"][0] is annotations["a.jpg"][0]  # Unchanged boxes are shared
+
+def test_delete_drops_boxes():
+    edit = edit_taxonomy(project(), ["cat", "Cate", "dog"], COLORS, {"dog": None}, new_color)
+    assert edit.label_list == ["cat", "Cate"]
+    assert labels(edit.annotations) == {"a.jpg": ["cat"], "c.jpg": []}
+    assert (edit.relabeled, edit.deleted) == (0, 2)
+
+def test_split_only_touches_selected_images():
+    edit = edit_taxonomy(project(), ["cat", "Cate", "dog"], COLORS, {"dog": "wolf"}, new_color, images={"c.jpg"})
+    assert edit.label_list == ["cat", "Cate", "dog", "wolf"]
+    assert edit.label_colors["wolf"] == "#new" and "dog" in edit.label_colors
+    assert labels(edit.annotations) == {"c.jpg": ["wolf"]}
+
+def test_empty_label_is_rejected():
+    with pytest.raises(ValueError):
+        edit_taxonomy(project(), ["cat"], COLORS, {"cat": ""}, new_color)
+
+def test_undo_restores_boxes_and_label_list():
+    annotations = project()
+    original = labels(annotations)
+    history = EditHistory()
+    before = (["cat", "Cate", "dog"], dict(COLORS))
+    edit = edit_taxonomy(annotations, *before, {"Cate": "cat", "dog": None}, new_color)
+    apply(annotations, edit, history, before)
+    assert labels(annotations) == {"a.jpg": ["cat"], "b.jpg": ["cat"], "c.jpg": [], "d.jpg": []}
+
+    kind, img_names, state = history.undo(annotations)
+    assert (kind, img_names) == ("taxonomy", {"a.jpg", "b.jpg", "c.jpg"})
+    assert labels(annotations) == original
+    assert state == before
+
+    kind, img_names, state = history.redo(annotations)
+    assert labels(annotations)["a.jpg"] == ["cat"]
+    assert state == (["cat"], {"cat": "#cat"})
+
+def test_splices_hold_only_changed_boxes():
+    rng = random.Random(0)
+    label_list = ["a", "b", "c", "d"]
+    for _ in range(50):
+        annotations = {f"{i}.jpg": [box(rng.choice(label_list), float(j)) for j in range(rng.randrange(8))]
+                       for i in range(6)}
+        mapping = {"a": rng.choice(["b", None]), "c": rng.choice(["e", None])}
+        images = rng.choice([None, {"1.jpg", "4.jpg"}])
+        edit = edit_taxonomy(annotations, label_list, {}, mapping, new_color, images)
+        replayed = {name: list(anns) for name, anns in annotations.items()}
+        apply_splices(replayed, edit.splices)
+        assert replayed == {**annotations, **edit.annotations}
+        for _, _, removed, inserted in edit.splices:
+            assert all(ann["label"] in mapping for ann in removed)
+            assert all(ann["label"] not in mapping for ann in inserted)
+        assert sum(len(removed) for _, _, removed, _ in edit.splices) == edit.relabeled + edit.deleted
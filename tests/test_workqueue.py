@@ -0,0 +1,133 @@
+import json
+import os
+
+import pytest
+
+from annotator_core.workqueue import WorkQueue
+
+def box(label):
+    return {"shape": "Rectangle", "points": [(0.0, 0.0), (10.0, 10.0)], "label": label, "color": "#000"}
+
+def color_for(label):
+    return "#123456"
+
+@pytest.fixture
+def queues(tmp_path):
+    alice = WorkQueue(str(tmp_path), "alice")
+    bob = WorkQueue(str(tmp_path), "bob")
+    alice.populate([f"{i}.jpg" for i in range(5)])
+    yield alice, bob
+    alice.close()
+    bob.close()
+
+@pytest.mark.parametrize("name", ["", "../x", "a b", ".hidden", "a/b", "ü"])
+def test_invalid_annotator_names(tmp_path, name):
+    with pytest.raises(ValueError):
+        WorkQueue(str(tmp_path), name)
+
+def test_claims_do_not_overlap(queues):
+    alice, bob = queues
+    assert alice.claim(2) == ["0.jpg", "1.jpg"]
+    assert bob.claim(2) == ["2.jpg", "3.jpg"]
+    assert alice.claimed() == ["0.jpg", "1.jpg"]
+    assert alice.progress() == {"todo": 1, "leased": 4, "done": 0}
+
+def test_expired_lease_is_reclaimed(queues):
+    alice, bob = queues
+    alice.lease_seconds = -1
+    alice.claim(1)
+    assert bob.claim(1) == ["0.jpg"]
+    assert not alice.complete("0.jpg", [box("cat")])  # Alice lost the lease
+    assert bob.complete("0.jpg", [box("dog")])
+
+def test_complete_and_merge(queues):
+    alice, bob = queues
+    alice.claim(1)
+    bob.claim(1)
+    assert alice.complete("0.jpg", [box("cat")])
+    assert bob.complete("1.jpg", [box("dog"), box("dog")])
+    assert alice.progress()["done"] == 2
+
+    old = [box("old")]
+    annotations = {"1.jpg": old}
+    previous = alice.merge(annotations, color_for)
+    # Alice's own completion is already in her annotations, so only Bob's image is merged
+    assert previous == {"1.jpg": old} and previous["1.jpg"] is old
+    assert [ann["label"] for ann in annotations["1.jpg"]] == ["dog", "dog"]
+    assert annotations["1.jpg"][0]["color"] == "#123456"
+    assert alice.merge(annotations, color_for) == {}  # Only lines added since the last merge are read
+
+def test_merge_keeps_latest_completion(queues):
+    alice, bob = queues
+    alice.claim(1)
+    assert alice.complete("0.jpg", [box("cat")])
+    # Re-queue the image by hand and let Bob finish it again
+    with alice._write():
+        alice.db.execute("UPDATE images SET state = 'todo' WHERE name = '0.jpg'")
+    assert bob.claim(1) == ["0.jpg"]
+    assert bob.complete("0.jpg", [box("dog")])
+    annotations = {}
+    carol = WorkQueue(bob.project_dir, "carol")
+    carol.merge(annotations, color_for)
+    carol.close()
+    assert [ann["label"] for ann in annotations["0.jpg"]] == ["dog"]
+
+def test_release_returns_claims(queues):
+    alice, bob = queues
+    alice.claim(3)
+    alice.release(["1.jpg"])
+    assert bob.claim(1) == ["1.jpg"]
+    alice.release()
+    assert alice.claimed() == []
+    assert alice.progress() == {"todo": 4, "leased": 1, "done": 0}
+
+def test_shard_is_written_outside_the_lock(queues, monkeypatch):
+    alice, bob = queues
+    alice.claim(1)
+    bob.db.execute("PRAGMA busy_timeout = 100")
+    claimed = []
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        claimed.extend(bob.claim(1))  # Would fail with "database is locked" if complete() held the lock
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    assert alice.complete("0.jpg", [box("cat")])
+    assert claimed == ["1.jpg"]
+
+def test_lease_lost_during_append_is_not_merged(queues, monkeypatch):
+    alice, bob = queues
+    alice.lease_seconds = -1
+    alice.claim(1)
+    assert bob.claim(1) == ["0.jpg"]
+    # Alice passed the first check just before her lease ran out; the second one catches it
+    monkeypatch.setattr(alice, "_holds_lease", lambda img_name, now: True)
+    assert not alice.complete("0.jpg", [box("cat")])
+    assert alice.progress()["done"] == 0
+    annotations = {}
+    carol = WorkQueue(bob.project_dir, "carol")
+    assert carol.merge(annotations, color_for) == {}  # Alice's line is in her shard, but never recorded
+    assert bob.complete("0.jpg", [box("dog")])
+    carol.merge(annotations, color_for)
+    carol.close()
+    assert [ann["label"] for ann in annotations["0.jpg"]] == ["dog"]
+
+def test_offsets_carry_over_to_a_new_session(queues):
+    alice, bob = queues
+    bob.claim(2)
+    assert bob.complete("0.jpg", [box("dog")])
+    annotations = {}
+    carol = WorkQueue(alice.project_dir, "carol")
+    assert set(carol.merge(annotations, color_for)) == {"0.jpg"}
+    saved = json.loads(json.dumps(carol.offsets))  # As written to and read back from the project file
+    carol.close()
+
+    assert bob.complete("1.jpg", [box("cat")])
+    carol = WorkQueue(alice.project_dir, "carol", offsets=saved)
+    assert set(carol.merge(annotations, color_for)) == {"1.jpg"}  # Only the line added since the save
+    assert saved == carol.offsets
+    carol.close()
+    fresh = WorkQueue(alice.project_dir, "carol")
+    assert set(fresh.merge({}, color_for)) == {"0.jpg", "1.jpg"}
+    fresh.close()
@@ -0,0 +1,17 @@
+from collections import Counter
+
+from annotator_core.yolo import label_rows
+
+def box(label, x1, y1, x2, y2):
+    return {"shape": "Rectangle", "points": [(x1, y1), (x2, y2)], "label": label, "color": "#000"}
+
+def test_label_rows_normalizes_boxes():
+    rows = label_rows([box("cat", 10, 20, 30, 60)], 100, 200, {"dog": 0, "cat": 1})
+    assert rows == [(1, 0.2, 0.2, 0.2, 0.2)]
+
+def test_label_rows_counts_skipped_labels():
+    skipped = Counter()
+    anns = [box("cat", 0, 0, 10, 10), box("Cate", 0, 0, 10, 10), box("Cate", 5, 5, 10, 10), box("cow", 0, 0, 1, 1)]
+    rows = label_rows(anns, 100, 100, {"cat": 0}, skipped)
+    assert [row[0] for row in rows] == [0]
+    assert skipped == {"Cate": 2, "cow": 1}